@@ -23,9 +23,12 @@ def main():
         Navigate to the different sections using the sidebar:
         - **Chat**: Interact with the RAG assistant to get information on mental health topics.
         - **User**: Manage user-related information and settings.
+        - **Admin**: Inspect per-stage latency, LLM calls and token usage.
         """
     )
 
 if __name__ == "__main__":
     logger.info("Starting Home.py")
+    from src.tracing import init_tracing
+    init_tracing("app")
     main()
\ No newline at end of file
@@ -0,0 +1,136 @@
+"""
+Import-time budget check of the app pages, scripts and shared modules.
+
+Every target is imported in a fresh interpreter with `python -X importtime`.
+Its import cost (everything it imports, minus what a bare interpreter
+imports) must stay within its budget, and it must not import any of its
+forbidden modules: the provider SDKs are only loaded by src.providers when a
+client is first created, and the light pages must not load LlamaIndex at all.
+Importing must also have no side effects: it is repeated once in an empty
+working directory, where it must not create files (the data/ stores and
+metrics are relative paths) or set LlamaIndex's global callback handler;
+tracing is only turned on by the entry points. The exit code is 1 when a
+target fails any of these checks. Run from the repository root:
+
+    python -m benchmarks.import_budget
+    python -m benchmarks.import_budget --scale 2  # slower machine
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from loguru import logger
+
+PROVIDER_SDKS = ("google.generativeai", "llama_index.llms.gemini", "llama_index.embeddings.gemini", "openai")
+
+# target: (budget in milliseconds, forbidden module prefixes). Targets ending in .py are
+# run as scripts under a name other than __main__, so only their imports execute.
+TARGETS = {
+    "Home.py": (600, PROVIDER_SDKS + ("llama_index",)),
+    "pages/user.py": (600, PROVIDER_SDKS + ("llama_index",)),
+    "pages/chat.py": (2500, PROVIDER_SDKS + ("src.conversation_engine", "src.resource_registry")),
+    "src.providers": (250, PROVIDER_SDKS + ("llama_index", "streamlit")),
+    "src.resource_registry": (2500, PROVIDER_SDKS),
+    "src.conversation_engine": (3000, PROVIDER_SDKS),
+    "src.ingest_pipeline": (3000, PROVIDER_SDKS + ("streamlit",)),
+    "build_data.py": (3000, PROVIDER_SDKS + ("streamlit",)),
+}
+
+
+def import_times(code: str) -> dict:
+    """
+    Cumulative import time in microseconds of every module imported by
+    running `code`, keyed by name as printed: nested imports are indented.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name[1:].rstrip()] = int(cumulative)
+    return times
+
+
+def import_code(target: str) -> str:
+    if target.endswith(".py"):
+        return f"import runpy; runpy.run_path({os.path.abspath(target)!r}, run_name='__import_budget__')"
+    return f"import {target}"
+
+
+def side_effects(target: str) -> list:
+    """
+    Side effects of importing `target` in a fresh interpreter whose working
+    directory is empty: the files it left there (also those written at exit)
+    and the LlamaIndex global handler it installed.
+    """
+    check = (
+        "\nimport sys\n"
+        "core = sys.modules.get('llama_index.core')\n"
+        "print(type(core.global_handler).__name__ if core and core.global_handler else '')"
+    )
+    with tempfile.TemporaryDirectory() as workdir:
+        result = subprocess.run(
+            [sys.executable, "-c", import_code(target) + check], capture_output=True, text=True, cwd=workdir,
+            env={**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")]))},
+        )
+        if result.returncode != 0:
+            raise RuntimeError(result.stderr.strip().splitlines()[-1])
+        effects = [f"sets llama_index.core.global_handler to {name}" for name in result.stdout.split()[-1:]]
+        for root, _, files in os.walk(workdir):
+            effects += [f"writes {os.path.relpath(os.path.join(root, name), workdir)}" for name in files]
+    return effects
+
+
+def measure(target: str, repeat: int) -> tuple:
+    """(best import cost in ms over `repeat` runs, names of all imported modules)."""
+    code = import_code(target)
+    baseline = set(import_times("pass"))
+    best, modules = None, set()
+    for _ in range(repeat):
+        times = import_times(code)
+        # Top-level entries only; nested imports are included in their importer's time
+        cost = sum(value for name, value in times.items() if not name.startswith(" ") and name not in baseline)
+        best = cost if best is None else min(best, cost)
+        modules = {name.strip() for name in times}
+    return best / 1000, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("targets", nargs="*", help="Targets to check. Defaults to all.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per target; the fastest counts.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplier applied to every budget.")
+    args = parser.parse_args()
+
+    failures = []
+    for target in args.targets or TARGETS:
+        budget, forbidden = TARGETS[target]
+        budget *= args.scale
+        cost, modules = measure(target, args.repeat)
+        leaked = sorted(name for name in modules if name.startswith(forbidden))
+        effects = side_effects(target)
+        status = "ok" if cost <= budget and not leaked and not effects else "FAIL"
+        logger.info(f"{target}: {cost:.0f} ms (budget {budget:.0f} ms) {status}")
+        if cost > budget:
+            failures.append(f"{target} takes {cost:.0f} ms to import, budget is {budget:.0f} ms")
+        if leaked:
+            failures.append(f"{target} imports {', '.join(leaked[:5])}")
+        if effects:
+            failures.append(f"{target} {', '.join(effects[:5])} on import")
+
+    for failure in failures:
+        logger.error(failure)
+    if failures:
+        sys.exit(1)
+    logger.success("All targets within their import budget.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Load test of the headless chat service (serve.py) with mock models.
+
+A synthetic corpus is ingested and indexed in a temporary directory with the
+deterministic stand-ins of src.mock_models, then the chat service is started
+with each requested number of worker processes and driven over HTTP by
+concurrent clients, each chatting as one of --users users. Reported per worker
+count:
+
+- throughput in completed turns per second
+- p50/p95/p99 time to first streamed token and total turn latency, as seen by the client
+- failed turns
+- model gateway metrics of the workers: mean query-embedding batch size,
+  p95 queueing delay and deduplicated requests
+
+Results are written as JSON. Run from the repository root:
+
+    python -m benchmarks.load_test --workers 1 4 --concurrency 16 --requests 200
+"""
+import argparse
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+from benchmarks.run_benchmarks import make_corpus, make_queries, percentiles
+
+
+def build_index(args):
+    from llama_index.core import Settings
+    from llama_index.core.node_parser import get_leaf_nodes
+    from src.index_builder import build_indexes
+    from src.ingest_pipeline import ingest_documents
+    from src.lexical_index import LexicalIndex
+    from src.mock_models import MockEmbedding, MockLLM
+
+    Settings.llm = MockLLM()
+    Settings.embed_model = MockEmbedding(dim=args.dim)
+    files = make_corpus(os.getcwd(), args.documents, args.words_per_document)
+    nodes = ingest_documents(
+        input_files=files, llm=Settings.llm, embed_model=Settings.embed_model,
+        requests_per_minute=1e9, tokens_per_minute=1e12
+    )
+    build_indexes(nodes, rebuild=True)
+    LexicalIndex.from_nodes(get_leaf_nodes(nodes)).persist()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def run_load(base_url: str, args) -> dict:
+    from src.chat_client import ChatClient
+
+    client = ChatClient(base_url)
+    prompts = make_queries(args.requests, seed=2)
+    first_token, total, failures = [], [], []
+
+    def turn(i: int):
+        start = time.perf_counter()
+        ttft = None
+        try:
+            for _ in client.stream_chat(f"user_{i % args.users}", "", prompts[i], {}):
+                if ttft is None:
+                    ttft = time.perf_counter() - start
+        except ConnectionError as e:
+            failures.append(str(e))
+            return
+        first_token.append(ttft if ttft is not None else time.perf_counter() - start)
+        total.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        list(executor.map(turn, range(args.requests)))
+    wall = time.perf_counter() - start
+    if failures:
+        logger.warning(f"{len(failures)} failed turns, e.g. {failures[0]}")
+    metrics = {"turns_per_s": round(len(total) / wall, 2), "failed_turns": len(failures)}
+    if total:
+        metrics.update({**percentiles(first_token, "ttft"), **percentiles(total, "turn")})
+    return metrics
+
+
+def gateway_metrics(workers: int) -> dict:
+    """Model gateway metrics exported by the chat workers when they stopped."""
+    from src.tracing import load_exported_metrics
+
+    exported = load_exported_metrics()
+    snapshots = [exported.get(f"chat_worker_{worker_id}", {}) for worker_id in range(workers)]
+    histograms = [h for snapshot in snapshots for h in snapshot.get("histograms", [])]
+    counters = [c for snapshot in snapshots for c in snapshot.get("counters", [])]
+    batches = [h for h in histograms if h["metric"] == "gateway_batch_size"]
+    delays = [h for h in histograms if h["metric"] == "gateway_queue_delay_seconds"]
+    count = sum(h["count"] for h in batches)
+    return {
+        "gateway_batch_size_mean": round(sum(h["sum"] for h in batches) / count, 2) if count else 0.0,
+        "gateway_queue_delay_p95_ms": round(max((h["p95"] for h in delays), default=0.0) * 1000, 2),
+        "gateway_deduplicated": sum(c["value"] for c in counters if c["metric"] == "gateway_deduplicated_total"),
+    }
+
+
+def bench_workers(workers: int, args) -> dict:
+    from src.chat_service import ChatService
+
+    mock = {
+        "llm": {"latency": args.llm_latency, "token_latency": args.token_latency, "tool_name": "dsm5"},
+        "embedding": {"dim": args.dim, "latency": args.embed_latency},
+        "gateway": {"requests_per_minute": args.gateway_rpm, "tokens_per_minute": args.gateway_rpm * 1000},
+    }
+    service = ChatService(workers=workers, mock=mock)
+    start = time.perf_counter()
+    service.start()
+    startup = time.perf_counter() - start
+    port = free_port()
+    server = threading.Thread(target=service.serve_forever, args=("127.0.0.1", port), daemon=True)
+    server.start()
+    time.sleep(0.2)
+    try:
+        metrics = run_load(f"http://127.0.0.1:{port}", args)
+    finally:
+        service.shutdown()
+        server.join()
+    return {"startup_s": round(startup, 3), **metrics, **gateway_metrics(workers)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4], help="Worker counts to compare.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients.")
+    parser.add_argument("--requests", type=int, default=200, help="Turns per worker count.")
+    parser.add_argument("--users", type=int, default=32, help="Distinct usernames the turns are spread over.")
+    parser.add_argument("--documents", type=int, default=8)
+    parser.add_argument("--words-per-document", type=int, default=3000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per mock LLM call.")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="Seconds per streamed word.")
+    parser.add_argument("--embed-latency", type=float, default=0.01, help="Seconds per mock embedding request.")
+    parser.add_argument(
+        "--gateway-rpm", type=float, default=1e6, help="Model gateway requests per minute of each worker."
+    )
+    parser.add_argument("--output", default="load_test_output.json")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+    cwd = os.getcwd()
+
+    metrics = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        # data/ paths in global_settings are relative, so the index and stores land in workdir
+        os.chdir(workdir)
+        try:
+            build_index(args)
+            for workers in args.workers:
+                for name, value in bench_workers(workers, args).items():
+                    metrics[f"workers_{workers}_{name}"] = value
+        finally:
+            os.chdir(cwd)
+
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+    for name, value in metrics.items():
+        logger.info(f"{name}: {value}")
+    with open(output, "w") as f:
+        json.dump({"config": config, "metrics": metrics}, f, indent=4)
+    logger.success(f"Load test results written to {output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Routing regression check of the small-talk intent router.
+
+Every case is a message, the assistant's previous reply and the route it
+must get. Messages that could be distress or an answer to the agent (a
+negation, how the user feels, a "yes" to a screening question) must reach
+the ReAct agent; plain greetings and thanks must stay small talk. The exit
+code is 1 when any case is routed differently. Run from the repository root:
+
+    python -m benchmarks.router_cases
+"""
+import sys
+from loguru import logger
+
+SCREENING_QUESTION = "Bạn có thường xuyên cảm thấy mất hứng thú với mọi việc không?"
+
+# (message, previous assistant reply, expected route)
+CASES = (
+    ("i'm not fine", None, "agent"),
+    ("not okay", None, "agent"),
+    ("i'm not okay", None, "agent"),
+    ("i don't feel good", None, "agent"),
+    ("i feel awful", None, "agent"),
+    ("tôi không khỏe", None, "agent"),
+    ("toi khong khoe", None, "agent"),
+    ("mình không ổn", None, "agent"),
+    ("chưa ổn lắm", None, "agent"),
+    ("hôm nay tệ quá", None, "agent"),
+    ("Hôm nay tôi đi làm về rất mệt", None, "agent"),
+    ("chán quá", None, "agent"),
+    ("dạ có", SCREENING_QUESTION, "agent"),
+    ("ừ", SCREENING_QUESTION, "agent"),
+    ("ok", None, "agent"),
+    ("vâng", None, "agent"),
+    ("mình ổn", None, "agent"),
+    ("tạm biệt nhé", None, "agent"),
+    ("xin chào", None, "small_talk"),
+    ("Chào bạn!", None, "small_talk"),
+    ("hello", None, "small_talk"),
+    ("bạn là ai?", None, "small_talk"),
+    ("cảm ơn nhé", "Rất vui được giúp bạn.", "small_talk"),
+    ("thank you", None, "small_talk"),
+    ("good morning", None, "small_talk"),
+)
+
+
+def main():
+    from src.intent_router import IntentRouter
+
+    router = IntentRouter()
+    failures = []
+    for message, previous_reply, expected in CASES:
+        route, margin = router.classify(message, previous_reply)
+        if route != expected:
+            failures.append(f"{message!r} (after {previous_reply!r}) routed to {route}, expected {expected} (margin {margin:.2f})")
+
+    for failure in failures:
+        logger.error(failure)
+    if failures:
+        sys.exit(1)
+    logger.success(f"All {len(CASES)} routing cases passed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+Offline performance benchmarks of the ingestion, indexing and chat paths.
+
+Gemini is replaced by the deterministic stand-ins of src.mock_models with a
+configurable artificial latency, so results are reproducible without API keys.
+Every run works in a temporary directory (index, caches, chat history) and
+measures:
+
+- ingestion throughput of ingest_documents (cold, then warm from the cache)
+- flat-chunk ingestion time with LLM and with local summaries, and the LLM
+  calls and embeddings avoided by local summaries and near-duplicate removal
+- build time of build_indexes and the lexical index, load time of the shared index
+- p50/p95/p99 latency of lexical search, the vector and dsm5 retrievers and the dsm5 query engine
+- context blocks and tokens the dsm5 retriever hands to synthesis per query
+- retrieval quality (hit rate and MRR at 3) and latency with and without reranking
+- end-to-end agent turn latency (time to first token and total) and LLM calls
+  per turn, for questions (ReAct agent) and small talk (direct reply after the
+  intent router, and the ReAct agent without it)
+
+Results are written as JSON. With --baseline they are compared against a
+stored run and the exit code is 1 when a metric regressed by more than
+--tolerance. Run from the repository root:
+
+    python -m benchmarks.run_benchmarks --output bench_output.json
+    python -m benchmarks.run_benchmarks --baseline benchmarks/baseline.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import numpy as np
+from loguru import logger
+
+# Metrics where a higher value is better; every other metric is a duration.
+HIGHER_IS_BETTER = ("_per_s", "_hit_rate", "_mrr", "_avoided")
+
+VOCABULARY = (
+    "anxiety depression mood disorder episode symptom criteria diagnosis patient sleep appetite "
+    "fatigue concentration worthlessness guilt panic attack fear worry avoidance trauma stress "
+    "memory intrusive nightmare irritability mania grandiosity impulsivity psychosis delusion "
+    "hallucination social functioning duration weeks months persistent severe mild moderate "
+    "onset childhood adolescence adult substance medication therapy risk suicide thoughts"
+).split()
+
+# Greetings and check-ins the intent router should answer without the agent
+SMALL_TALK_PROMPTS = (
+    "Chào bạn!", "xin chào, hôm nay bạn thế nào?", "Cảm ơn bạn nhé", "Hello, how are you?",
+    "rất vui được gặp bạn", "good morning", "bạn là ai vậy?", "thank you!",
+)
+
+
+def make_corpus(directory: str, documents: int, words_per_document: int, seed: int = 0) -> list:
+    """
+    Writes deterministic pseudo-clinical text files shaped like the DSM-5: a
+    heading per disorder, sections of paragraphs and lettered criteria.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for i in range(documents):
+        lines = [f"# Disorder {i}"]
+        for p in range(words_per_document // 48):
+            sentences = [" ".join(rng.choice(VOCABULARY) for _ in range(12)).capitalize() + "." for _ in range(4)]
+            if p % 6 == 0:
+                lines.append(f"## {'Diagnostic Criteria' if p % 12 == 0 else 'Diagnostic Features'} {p // 6}")
+            paragraph = " ".join(sentences)
+            if p % 12 < 6:
+                paragraph = f"{'ABCDEF'[p % 6]}. {paragraph}"
+            lines.append(paragraph)
+        path = os.path.join(directory, f"document_{i:03d}.txt")
+        with open(path, "w") as f:
+            f.write("\n".join(lines))
+        paths.append(path)
+    return paths
+
+
+def make_queries(n: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    return [f"What are the {' '.join(rng.sample(VOCABULARY, 4))} criteria?" for _ in range(n)]
+
+
+def percentiles(latencies: list, prefix: str) -> dict:
+    values = np.asarray(latencies) * 1000
+    return {f"{prefix}_p{p}_ms": round(float(np.percentile(values, p)), 3) for p in (50, 95, 99)}
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_ingestion(files: list, llm, embed_model, workers: int) -> tuple:
+    from src.ingest_pipeline import ingest_documents
+
+    # Rate limits are lifted: the benchmark measures the pipeline, not the provider quota.
+    options = dict(llm=llm, embed_model=embed_model, num_workers=workers,
+                   requests_per_minute=1e9, tokens_per_minute=1e12)
+    nodes, cold = timed(ingest_documents, input_files=files, **options)
+    _, warm = timed(ingest_documents, input_files=files, **options)
+    return nodes, {
+        "ingest_nodes": len(nodes),
+        "ingest_cold_s": round(cold, 3),
+        "ingest_cold_nodes_per_s": round(len(nodes) / cold, 2),
+        "ingest_warm_s": round(warm, 3),
+        "ingest_warm_nodes_per_s": round(len(nodes) / warm, 2),
+    }
+
+
+def bench_summary_modes(files: list, llm, embed_model, workers: int) -> dict:
+    """
+    Cold flat-chunk ingestion with LLM and with local TF-IDF summaries, over
+    the corpus plus a copy of its first file for dedup to drop.
+    """
+    import shutil
+    from src.ingest_pipeline import ingest_documents
+    from src.tracing import get_tracer
+
+    duplicate = os.path.abspath("duplicate_" + os.path.basename(files[0]))
+    shutil.copy(files[0], duplicate)
+    counters = get_tracer().counters
+    metrics = {}
+    for mode in ("llm", "local"):
+        before = dict(counters)
+        _, seconds = timed(
+            ingest_documents, input_files=files + [duplicate], llm=llm, embed_model=embed_model, num_workers=workers,
+            requests_per_minute=1e9, tokens_per_minute=1e12, chunking_mode="flat", summary_mode=mode
+        )
+        metrics[f"ingest_{mode}_summary_s"] = round(seconds, 3)
+        for label, name in (("summary_llm_calls", "llm_calls"), ("embeddings", "embeddings")):
+            key = ("ingest_avoided_total", label)
+            metrics[f"{mode}_summary_{name}_avoided"] = counters.get(key, 0) - before.get(key, 0)
+    return metrics
+
+
+def bench_index(nodes: list, llm, embed_model) -> tuple:
+    from llama_index.core.node_parser import get_leaf_nodes
+    from src.index_builder import build_indexes
+    from src.lexical_index import LexicalIndex
+    from src.resource_registry import ResourceRegistry
+    from src.global_settings import INDEX_STORAGE
+
+    vector_index, build_seconds = timed(build_indexes, nodes, rebuild=True)
+    lexical_index, lexical_seconds = timed(LexicalIndex.from_nodes, get_leaf_nodes(nodes))
+    lexical_index.persist()
+    registry = ResourceRegistry(INDEX_STORAGE, llm=llm, embed_model=embed_model)
+    resources, load_seconds = timed(registry.get)
+    return resources, {
+        "index_build_s": round(build_seconds, 3),
+        "lexical_build_s": round(lexical_seconds, 3),
+        "index_load_s": round(load_seconds, 3),
+    }
+
+
+def bench_retrieval(resources, queries: list) -> dict:
+    from llama_index.core.schema import MetadataMode
+    from llama_index.core.utils import get_tokenizer
+    from src.lexical_index import LexicalIndex
+    from src.retrieval import build_query_engine
+
+    lexical_index = LexicalIndex.load()
+    lexical_latencies = [timed(lexical_index.search, query)[1] for query in queries]
+    vector_retriever = resources.index.as_retriever(similarity_top_k=3)
+    vector_latencies = [timed(vector_retriever.retrieve, query)[1] for query in queries]
+    # The retriever of the dsm5 query engine, without the semantic cache in front
+    retriever = build_query_engine(resources.index, resources.llm).retriever
+    retrieve_latencies, blocks, tokens = [], [], []
+    tokenizer = get_tokenizer()
+    for query in queries:
+        hits, seconds = timed(retriever.retrieve, query)
+        retrieve_latencies.append(seconds)
+        blocks.append(len(hits))
+        tokens.append(sum(len(tokenizer(hit.node.get_content(metadata_mode=MetadataMode.LLM))) for hit in hits))
+    query_latencies = [timed(resources.query_engine.query, query)[1] for query in queries]
+    return {
+        **percentiles(lexical_latencies, "lexical_search"),
+        **percentiles(vector_latencies, "vector_retrieve"),
+        **percentiles(retrieve_latencies, "retrieve"),
+        **percentiles(query_latencies, "dsm5_query"),
+        "context_blocks_per_query": round(float(np.mean(blocks)), 2),
+        "context_tokens_per_query": round(float(np.mean(tokens)), 1),
+    }
+
+
+def bench_rerank(resources, queries: int, seed: int = 3) -> dict:
+    """
+    Compares vector, hybrid and hybrid + reranked top 3 on queries made of a
+    random span of words of one chunk, that chunk being the relevant answer.
+    Leaves are ranked without auto-merging, so hits are comparable node ids.
+    """
+    from llama_index.core.node_parser import get_leaf_nodes
+    from src.global_settings import RERANK_CANDIDATES, SIMILARITY_TOP_K
+    from src.reranker import RerankPostprocessor
+    from src.retrieval import build_retriever
+    from llama_index.core.schema import QueryBundle
+
+    rng = random.Random(seed)
+    # Node ids are random per run; content order keeps the sample reproducible
+    nodes = sorted(get_leaf_nodes(resources.index.docstore.docs.values()), key=lambda node: node.get_content())
+    samples = []
+    for node in rng.choices(nodes, k=queries):
+        words = node.get_content().split()
+        start = rng.randrange(max(1, len(words) - 10))
+        samples.append((" ".join(words[start:start + 10]), node.node_id))
+
+    vector = resources.index.as_retriever(similarity_top_k=SIMILARITY_TOP_K)
+    hybrid = build_retriever(resources.index, auto_merge=False)
+    candidates = build_retriever(resources.index, top_k=RERANK_CANDIDATES, auto_merge=False)
+    reranker = RerankPostprocessor(top_n=SIMILARITY_TOP_K)
+
+    ranks = {"vector": [], "hybrid": [], "rerank": []}
+    rerank_latencies = []
+    for query, relevant in samples:
+        ranked = {"vector": vector.retrieve(query), "hybrid": hybrid.retrieve(query)}
+        wide = candidates.retrieve(query)
+        ranked["rerank"], seconds = timed(reranker.postprocess_nodes, wide, QueryBundle(query))
+        rerank_latencies.append(seconds)
+        for name, hits in ranked.items():
+            ids = [hit.node.node_id for hit in hits]
+            ranks[name].append(ids.index(relevant) + 1 if relevant in ids else None)
+
+    metrics = percentiles(rerank_latencies, "rerank")
+    for name, values in ranks.items():
+        metrics[f"{name}_hit_rate"] = round(sum(rank is not None for rank in values) / len(values), 3)
+        metrics[f"{name}_mrr"] = round(sum(1 / rank for rank in values if rank) / len(values), 3)
+    return metrics
+
+
+def run_turns(agent, prompts: list, prefix: str) -> dict:
+    """Time to first token, total latency and LLM calls of one agent turn per prompt."""
+    from src.async_runner import iterate_async, run_async
+    from src.tracing import get_tracer
+
+    tracer = get_tracer()
+    first_token, total, llm_calls = [], [], 0
+    for prompt in prompts:
+        calls_before = tracer.counters.get(("llm_calls_total", "llm"), 0)
+        start = time.perf_counter()
+        response = run_async(agent.astream_chat(prompt))
+        for i, _ in enumerate(iterate_async(response.async_response_gen())):
+            if i == 0:
+                first_token.append(time.perf_counter() - start)
+        total.append(time.perf_counter() - start)
+        llm_calls += tracer.counters.get(("llm_calls_total", "llm"), 0) - calls_before
+    return {
+        **percentiles(first_token, f"{prefix}_ttft"),
+        **percentiles(total, f"{prefix}_turn"),
+        f"{prefix}_llm_calls_per_turn": round(llm_calls / len(prompts), 2),
+    }
+
+
+def bench_agent(resources, turns: int) -> dict:
+    from src.conversation_engine import create_agent
+    from src.chat_store import SQLiteChatStore
+    from src.global_settings import CHAT_STORE_DB
+
+    chat_store = SQLiteChatStore(db_path=CHAT_STORE_DB)
+    small_talk = [SMALL_TALK_PROMPTS[i % len(SMALL_TALK_PROMPTS)] for i in range(turns)]
+    routed = create_agent(resources.llm, resources.query_engine, chat_store, "benchmark", route_small_talk=True)
+    unrouted = create_agent(
+        resources.llm, resources.query_engine, chat_store, "benchmark_unrouted", route_small_talk=False
+    )
+    metrics = {
+        **run_turns(routed, make_queries(turns, seed=2), "agent"),
+        **run_turns(routed, small_talk, "small_talk"),
+        **run_turns(unrouted, small_talk, "small_talk_unrouted"),
+    }
+    chat_store.close()
+    return metrics
+
+
+def run(args) -> dict:
+    from llama_index.core import Settings
+    from src.mock_models import MockEmbedding, MockLLM
+    from src.tracing import init_tracing
+
+    # Hooks LlamaIndex before the models are created, so their LLM calls are counted
+    init_tracing()
+    llm = MockLLM(latency=args.llm_latency, token_latency=args.token_latency, tool_name="dsm5")
+    embed_model = MockEmbedding(dim=args.dim, latency=args.embed_latency)
+    Settings.llm = llm
+    Settings.embed_model = embed_model
+
+    metrics = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        files = [os.path.abspath(path) for path in args.files] if args.files else make_corpus(
+            workdir, args.documents, args.words_per_document
+        )
+        # data/ paths in global_settings are relative, so every store lands in workdir
+        os.chdir(workdir)
+        try:
+            nodes, results = bench_ingestion(files, llm, embed_model, args.workers)
+            metrics.update(results)
+            metrics.update(bench_summary_modes(files, llm, embed_model, args.workers))
+            resources, results = bench_index(nodes, llm, embed_model)
+            metrics.update(results)
+            metrics.update(bench_retrieval(resources, make_queries(args.queries)))
+            metrics.update(bench_rerank(resources, args.queries))
+            metrics.update(bench_agent(resources, args.turns))
+        finally:
+            os.chdir(args.cwd)
+    return metrics
+
+
+def compare(metrics: dict, baseline: dict, tolerance: float) -> list:
+    """Returns a description of every metric that is worse than the baseline by more than tolerance."""
+    regressions = []
+    for name, value in metrics.items():
+        reference = baseline.get(name)
+        if not reference or name == "ingest_nodes":
+            continue
+        change = (value - reference) / reference
+        if name.endswith(HIGHER_IS_BETTER):
+            change = -change
+        if change > tolerance:
+            regressions.append(f"{name}: {reference} -> {value} ({change:+.0%} worse)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--files", nargs="+", help="Documents to ingest. Defaults to a synthetic corpus.")
+    parser.add_argument("--documents", type=int, default=8)
+    parser.add_argument("--words-per-document", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per mock LLM call.")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="Seconds per streamed word.")
+    parser.add_argument("--embed-latency", type=float, default=0.01, help="Seconds per mock embedding request.")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--baseline", help="Stored results to compare against.")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results to --baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown.")
+    args = parser.parse_args()
+    args.cwd = os.getcwd()
+
+    from src.global_settings import CHUNKING_MODE
+
+    config = {key: value for key, value in vars(args).items() if key not in ("cwd", "output", "baseline", "save_baseline", "tolerance")}
+    config["chunking_mode"] = CHUNKING_MODE
+    metrics = run(args)
+    result = {"config": config, "metrics": metrics}
+    for name, value in metrics.items():
+        logger.info(f"{name}: {value}")
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=4)
+    logger.success(f"Benchmark results written to {args.output}.")
+
+    if not args.baseline:
+        return
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(result, f, indent=4)
+        logger.success(f"Baseline saved to {args.baseline}.")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline["config"] != config:
+        logger.warning("Baseline was recorded with a different configuration; comparison may be meaningless.")
+    regressions = compare(metrics, baseline["metrics"], args.tolerance)
+    for regression in regressions:
+        logger.error(f"Regression: {regression}")
+    if regressions:
+        sys.exit(1)
+    logger.success("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+# benchmarks/vector_store_backends.py
+"""
+Compares the "simple", "chroma" and "binary" vector store backends as the corpus grows.
+
+For every corpus size a store is built from synthetic normalized embeddings,
+then reopened in a fresh process that measures load time, resident memory,
+top-k query latency and recall at k against exact full-precision search. The
+binary backend is measured once per matrix dtype (binary-float32,
+binary-float16, binary-int8). Run from the repository root:
+
+    python -m benchmarks.vector_store_backends --sizes 2000 20000 100000
+    python -m benchmarks.vector_store_backends --backends simple binary-float16 binary-int8
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from loguru import logger
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB (Linux /proc, 0 elsewhere)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError):
+        return 0.0
+
+
+def random_embeddings(n: int, dim: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def import_backend(backend: str):
+    """Imports the backend modules so they are excluded from load time and memory."""
+    if backend == "simple":
+        import llama_index.core.vector_stores  # noqa: F401
+    elif backend.startswith("binary"):
+        import src.binary_vector_store  # noqa: F401
+    else:
+        import chromadb  # noqa: F401
+        import llama_index.vector_stores.chroma  # noqa: F401
+
+
+def open_store(backend: str, workdir: str):
+    if backend == "simple":
+        from llama_index.core.vector_stores import SimpleVectorStore
+        path = os.path.join(workdir, "vector_store.json")
+        if os.path.exists(path):
+            return SimpleVectorStore.from_persist_path(path)
+        return SimpleVectorStore()
+    if backend.startswith("binary"):
+        from src.binary_vector_store import BinaryVectorStore
+        path = os.path.join(workdir, "vector_store.json")
+        if os.path.exists(os.path.join(workdir, "vector_store", "ids.json")):
+            return BinaryVectorStore.from_persist_path(path)
+        return BinaryVectorStore(dtype=backend.split("-")[1])
+    import chromadb
+    from llama_index.vector_stores.chroma import ChromaVectorStore
+    client = chromadb.PersistentClient(path=os.path.join(workdir, "chroma"))
+    collection = client.get_or_create_collection("bench", metadata={"hnsw:space": "cosine"})
+    return ChromaVectorStore(chroma_collection=collection)
+
+
+def build(backend: str, size: int, dim: int, workdir: str):
+    from llama_index.core.schema import TextNode
+    store = open_store(backend, workdir)
+    embeddings = random_embeddings(size, dim, seed=0)
+    batch = 5000
+    for start in range(0, size, batch):
+        nodes = [
+            TextNode(id_=f"node-{i}", text=f"chunk {i}", embedding=embeddings[i].tolist())
+            for i in range(start, min(start + batch, size))
+        ]
+        store.add(nodes)
+    if backend == "simple" or backend.startswith("binary"):
+        store.persist(os.path.join(workdir, "vector_store.json"))
+
+
+def measure(backend: str, size: int, dim: int, queries: int, top_k: int, workdir: str) -> dict:
+    from llama_index.core.vector_stores import VectorStoreQuery
+    import_backend(backend)
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    store = open_store(backend, workdir)
+    load_seconds = time.perf_counter() - start
+    rss_loaded = current_rss_mb()
+
+    latencies, results = [], []
+    query_embeddings = random_embeddings(queries, dim, seed=1)
+    for query in query_embeddings:
+        start = time.perf_counter()
+        result = store.query(VectorStoreQuery(query_embedding=query.tolist(), similarity_top_k=top_k))
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(set(result.ids))
+    # Memory-mapped stores only become resident once queries have touched their pages
+    rss_queried = current_rss_mb()
+
+    # Exact top-k over the full-precision vectors the store was built from
+    exact = np.argsort(-(query_embeddings @ random_embeddings(size, dim, seed=0).T), axis=1)[:, :top_k]
+    recall = np.mean([
+        len(found & {f"node-{i}" for i in expected}) / top_k for found, expected in zip(results, exact)
+    ])
+
+    return {
+        "load_seconds": round(load_seconds, 4),
+        "rss_mb": round(rss_loaded, 1),
+        "rss_delta_mb": round(rss_loaded - rss_before, 1),
+        "rss_queried_delta_mb": round(rss_queried - rss_before, 1),
+        "query_p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "query_p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        f"recall_at_{top_k}": round(float(recall), 4),
+    }
+
+
+def run_phase(*args) -> str:
+    """Runs one phase in a fresh interpreter so memory numbers are isolated."""
+    cmd = [sys.executable, "-m", "benchmarks.vector_store_backends", "--phase", *map(str, args)]
+    return subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--backends", nargs="+", default=["simple", "chroma", "binary-float32", "binary-float16", "binary-int8"]
+    )
+    parser.add_argument("--sizes", nargs="+", type=int, default=[2000, 20000, 100000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--phase", nargs="+", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.phase:
+        phase, backend, size, workdir = args.phase
+        if phase == "build":
+            build(backend, int(size), args.dim, workdir)
+        else:
+            print(json.dumps(measure(backend, int(size), args.dim, args.queries, args.top_k, workdir)))
+        return
+
+    results = []
+    for size in args.sizes:
+        for backend in args.backends:
+            with tempfile.TemporaryDirectory() as workdir:
+                common = ["--dim", args.dim, "--queries", args.queries, "--top-k", args.top_k]
+                start = time.perf_counter()
+                run_phase("build", backend, size, workdir, *common)
+                build_seconds = time.perf_counter() - start
+                result = json.loads(run_phase("measure", backend, size, workdir, *common))
+            result.update(backend=backend, size=size, build_seconds=round(build_seconds, 2))
+            logger.info(result)
+            results.append(result)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=4)
+    logger.success(f"Benchmark results written to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
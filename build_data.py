@@ -1,19 +1,53 @@
 # build_data.py
 from loguru import logger
+from llama_index.core.node_parser import get_leaf_nodes
+from src.global_settings import FILES_PATH, VECTOR_STORE_BACKEND
 from src.index_builder import build_indexes
+from src.lexical_index import LexicalIndex
+from src.index_manifest import load_manifest, save_manifest, diff_files, stale_ref_doc_ids, update_manifest
 from src.ingest_pipeline import ingest_documents
+from src.mmap_store import export_mmap_store, source_version, store_path
+from src.providers import configure_settings
+from src.tracing import init_tracing
 
 def main():
     """
     Main function to run the data ingestion and index building process.
+    Only files whose content hash changed since the last build are re-ingested.
     """
+    init_tracing()
     logger.info("Starting data ingestion and index building...")
     try:
-        nodes = ingest_documents()
-        build_indexes(nodes)
+        manifest = load_manifest()
+        changed, removed, hashes = diff_files(manifest, FILES_PATH)
+        if not changed and not removed:
+            logger.success("Index is up to date. Nothing to ingest.")
+            return
+
+        rebuild = not manifest["files"]
+        logger.info(f"{len(changed)} new or changed files, {len(removed)} removed files.")
+        configure_settings()
+        nodes = ingest_documents(input_files=changed) if changed else []
+        vector_index = build_indexes(
+            nodes,
+            stale_ref_doc_ids=stale_ref_doc_ids(manifest, changed + removed),
+            rebuild=rebuild
+        )
+        # The lexical index is rebuilt from every indexed leaf in the docstore; it takes no LLM calls
+        leaves = get_leaf_nodes(vector_index.docstore.docs.values())
+        if len(leaves) < len(get_leaf_nodes(nodes)):
+            raise RuntimeError(
+                f"The docstore holds {len(leaves)} leaf nodes, fewer than the {len(get_leaf_nodes(nodes))} just "
+                "ingested; the lexical index would miss them. Rebuild the index from scratch."
+            )
+        LexicalIndex.from_nodes(leaves).persist()
+        save_manifest(update_manifest(manifest, nodes, changed, removed, hashes))
+        if VECTOR_STORE_BACKEND != "chroma":
+            # Memory-mapped by the chat service workers instead of parsing the JSON stores
+            export_mmap_store(vector_index.storage_context, store_path(), source=source_version())
         logger.success("Data ingestion and index building completed successfully.")
     except Exception as e:
         logger.error(f"An error occurred during data processing: {e}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,71 @@
+# convert_vector_store.py
+"""
+Converts the persisted vector store to the binary (NumPy) format.
+
+The JSON float lists of the "simple" backend (default__vector_store.json) are
+normalized, quantized to --dtype and written as contiguous arrays next to it,
+in default__vector_store/. An existing binary store is re-quantized when no
+JSON store is left or the binary store was updated after the JSON one, which
+is then stale (build_data.py only updates the binary store). The index is loaded the same way afterwards; nothing is
+re-embedded. Run from the repository root:
+
+    python convert_vector_store.py --dtype int8
+    python convert_vector_store.py --dtype float16 --remove-json
+"""
+import argparse
+import os
+import time
+from loguru import logger
+from src.binary_vector_store import DTYPES, JSON_VECTOR_STORE, BinaryVectorStore, json_is_current
+from src.global_settings import INDEX_STORAGE, VECTOR_STORE_DTYPE
+
+
+def directory_size_mb(path: str) -> float:
+    if os.path.isfile(path):
+        return os.path.getsize(path) / 1024 ** 2
+    return sum(
+        os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files
+    ) / 1024 ** 2
+
+
+def convert(persist_dir: str, dtype: str) -> BinaryVectorStore:
+    json_path = os.path.join(persist_dir, JSON_VECTOR_STORE)
+    binary_dir = os.path.splitext(json_path)[0]
+    start = time.perf_counter()
+    if json_is_current(persist_dir):
+        store = BinaryVectorStore.from_json(json_path, dtype)
+        source = f"{json_path} ({directory_size_mb(json_path):.1f} MB)"
+    elif os.path.exists(os.path.join(binary_dir, "ids.json")):
+        # No current full-precision source: requantize the stored vectors
+        current = BinaryVectorStore.from_persist_path(json_path)
+        ids, vectors = current.vectors()
+        store = BinaryVectorStore.from_vectors(ids, current.ref_doc_ids(), vectors, dtype)
+        source = f"{binary_dir} ({current.dtype})"
+    else:
+        raise FileNotFoundError(f"No vector store in {persist_dir}. Run build_data.py first.")
+    store.persist(json_path)
+    logger.success(
+        f"Converted {store.size} vectors from {source} to {dtype} in {binary_dir} "
+        f"({directory_size_mb(binary_dir):.1f} MB) in {time.perf_counter() - start:.2f}s."
+    )
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--persist-dir", default=INDEX_STORAGE)
+    parser.add_argument("--dtype", choices=sorted(DTYPES), default=VECTOR_STORE_DTYPE)
+    parser.add_argument("--remove-json", action="store_true", help="Delete the JSON vector store after converting.")
+    args = parser.parse_args()
+
+    convert(args.persist_dir, args.dtype)
+    json_path = os.path.join(args.persist_dir, JSON_VECTOR_STORE)
+    if args.remove_json and os.path.exists(json_path):
+        os.remove(json_path)
+        logger.info(f"Removed {json_path}.")
+    if args.dtype != VECTOR_STORE_DTYPE:
+        logger.warning(f"VECTOR_STORE_DTYPE is {VECTOR_STORE_DTYPE}; set it to {args.dtype} so rebuilds keep this format.")
+
+
+if __name__ == "__main__":
+    main()
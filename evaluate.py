@@ -1,60 +1,237 @@
-import openai
-from llama_index.core import Settings, Document, VectorStoreIndex
-# from llama_index.llms.openai import OpenAI
-from llama_index.llms.gemini import Gemini
-from llama_index.core.node_parser import TokenTextSplitter
+# evaluate.py
+"""
+Evaluates the dsm5 query engine over the persisted DSM-5 index.
+
+Questions (with reference answers) are generated once from a sample of index
+chunks and cached in EVAL_QUESTIONS_FILE. Each question is then answered by
+the dsm5 query engine and judged by the correctness, faithfulness and
+relevancy evaluators, at most `--workers` questions at a time. Every finished
+question is appended to EVAL_RESULTS_FILE, so an interrupted run resumes with
+the remaining questions only. Run from the repository root:
+
+    python evaluate.py --num-chunks 30 --workers 4
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import random
+import time
+from typing import Any, Dict, List, Optional
+import pandas as pd
+from loguru import logger
+from llama_index.core.callbacks import CBEventType
+from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+from llama_index.core.callbacks.token_counting import TokenCounter, get_llm_token_counts
 from llama_index.core.evaluation import (
-    BatchEvalRunner,
     CorrectnessEvaluator,
     FaithfulnessEvaluator,
     RelevancyEvaluator
 )
 from llama_index.core.llama_dataset.generator import RagDatasetGenerator
-import asyncio
-import pandas as pd
-import nest_asyncio
+from llama_index.core.node_parser import get_leaf_nodes
 from tqdm.asyncio import tqdm_asyncio
+from src.global_settings import (
+    INDEX_STORAGE, EVAL_QUESTIONS_FILE, EVAL_RESULTS_FILE, EVAL_REPORT_FILE, EVAL_WORKERS
+)
+from src.rate_limit import aretry_with_backoff
+from src.resource_registry import ResourceRegistry
+from src.tracing import init_tracing
 
+# Token counters of the question being processed by the current asyncio task
+_usage: contextvars.ContextVar[Optional[Dict[str, int]]] = contextvars.ContextVar("eval_usage", default=None)
 
-def setup_openai(api_key: str, model: str = "models/gemini-1.5-flash", temperature : float = 0.2 ):
-    openai.api_key = api_key
-    Settings.llm = Gemini(model=model, temperature= temperature)
 
-#Split text into smaller chunks for processing
-def create_document_and_splitter(text : str, chunk_size: int =20 , chunk_overlap : int = 5, separator : str = " "):
-    doc = Document(text= text)
-    splitter = TokenTextSplitter(
-        chunk_size = chunk_size,
-        chunk_overlap = chunk_overlap,
-        separator = separator
-    )
+class TokenUsageHandler(BaseCallbackHandler):
+    """
+    Adds the prompt and completion tokens of every LLM call to the counters
+    of the current task, so concurrent questions are accounted separately.
+    """
+
+    def __init__(self):
+        super().__init__(event_starts_to_ignore=[], event_ends_to_ignore=[])
+        self._counter = TokenCounter()
 
-    nodes = splitter.get_nodes_from_documents([doc])
-    return nodes
-
-#Create a vector store index and a query engine
-def create_vector_store_index(nodes):
-    vector_index = VectorStoreIndex(nodes)
-    query_engine = vector_index.as_query_engine()
-    return query_engine
-
-def generate_questions(nodes, num_questions_per_chunk: int = 1):
-    dataset_generator = RagDatasetGenerator(nodes, num_questions_per_chunk = num_questions_per_chunk)
-    eval_questions = dataset_generator.generate_questions_from_nodes()
-    return eval_questions.to.pandas()
-
-async def evaluate_async(query_engine, df):
-    correctness_evaluator = CorrectnessEvaluator()
-    faithfulness_evaluator = FaithfulnessEvaluator()
-    relevancy_evaluator = RelevancyEvaluator()
-
-    runner = BatchEvalRunner(
-        {
-            "correctness": correctness_evaluator,
-            "faithfulness": faithfulness_evaluator,
-            "relevancy" : relevancy_evaluator
-       },
-       show_progress = True
+    def on_event_start(self, event_type, payload=None, event_id: str = "", parent_id: str = "", **kwargs: Any) -> str:
+        return event_id
+
+    def on_event_end(self, event_type, payload=None, event_id: str = "", **kwargs: Any) -> None:
+        usage = _usage.get()
+        if event_type != CBEventType.LLM or payload is None or usage is None:
+            return
+        counts = get_llm_token_counts(self._counter, payload, event_id)
+        usage[f"{usage['phase']}_prompt_tokens"] += counts.prompt_token_count
+        usage[f"{usage['phase']}_completion_tokens"] += counts.completion_token_count
+
+    def start_trace(self, trace_id: Optional[str] = None) -> None:
+        pass
+
+    def end_trace(self, trace_id: Optional[str] = None, trace_map: Optional[Dict[str, List[str]]] = None) -> None:
+        pass
+
+
+def load_resources(mock: bool = False):
+    """
+    Loads the dsm5 query engine with Gemini, or with the local mock models.
+    The semantic cache is left out: cached answers would skew latency, tokens
+    and scores, and eval answers must not end up in the production cache.
+    """
+    if mock:
+        from src.mock_models import MockEmbedding, MockLLM
+        return ResourceRegistry(
+            INDEX_STORAGE, llm=MockLLM(), embed_model=MockEmbedding(), semantic_cache=False
+        ).get()
+    from src.providers import get_google_api_key
+    api_key = get_google_api_key()
+    if not api_key:
+        raise EnvironmentError("GOOGLE_API_KEY must be set to run the evaluation.")
+    return ResourceRegistry(INDEX_STORAGE, semantic_cache=False).get(api_key)
+
+
+def generate_questions(index, llm, num_chunks: int, num_questions_per_chunk: int = 1, seed: int = 0) -> List[dict]:
+    """
+    Returns the evaluation questions, generating them from `num_chunks` random
+    index chunks on the first run and reading EVAL_QUESTIONS_FILE afterwards.
+    """
+    if os.path.exists(EVAL_QUESTIONS_FILE):
+        with open(EVAL_QUESTIONS_FILE, "r") as f:
+            questions = json.load(f)
+        logger.info(f"Loaded {len(questions)} cached questions from {EVAL_QUESTIONS_FILE}.")
+        return questions
+
+    nodes = sorted(get_leaf_nodes(index.docstore.docs.values()), key=lambda node: node.node_id)
+    nodes = random.Random(seed).sample(nodes, min(num_chunks, len(nodes)))
+    dataset_generator = RagDatasetGenerator(
+        nodes, llm=llm, num_questions_per_chunk=num_questions_per_chunk, show_progress=True
     )
+    dataset = dataset_generator.generate_dataset_from_nodes()
+    questions = [
+        {"id": i, "query": example.query, "reference_answer": example.reference_answer}
+        for i, example in enumerate(dataset.examples)
+    ]
+    os.makedirs(os.path.dirname(EVAL_QUESTIONS_FILE), exist_ok=True)
+    with open(EVAL_QUESTIONS_FILE, "w") as f:
+        json.dump(questions, f, ensure_ascii=False, indent=4)
+    logger.success(f"Generated {len(questions)} questions into {EVAL_QUESTIONS_FILE}.")
+    return questions
+
+
+def load_checkpoint() -> Dict[int, dict]:
+    """Results of the questions finished by previous runs, by question id."""
+    results = {}
+    if os.path.exists(EVAL_RESULTS_FILE):
+        with open(EVAL_RESULTS_FILE, "r") as f:
+            for line in f:
+                try:
+                    result = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # a line cut short by an interrupted run
+                results[result["id"]] = result
+    return results
+
+
+async def evaluate_question(question: dict, query_engine, evaluators: dict) -> dict:
+    """Answers one question and runs every evaluator on the answer."""
+    usage = {"phase": "query"}
+    for phase in ("query", "eval"):
+        usage[f"{phase}_prompt_tokens"] = usage[f"{phase}_completion_tokens"] = 0
+    _usage.set(usage)
+
+    start = time.perf_counter()
+    response = await aretry_with_backoff(lambda: query_engine.aquery(question["query"]))
+    latency = time.perf_counter() - start
+
+    usage["phase"] = "eval"
+    results = await asyncio.gather(*[
+        aretry_with_backoff(lambda evaluator=evaluator: evaluator.aevaluate_response(
+            query=question["query"], response=response, reference=question["reference_answer"]
+        ))
+        for evaluator in evaluators.values()
+    ])
+    del usage["phase"]
+    return {
+        "id": question["id"],
+        "query": question["query"],
+        "response": str(response),
+        "latency_s": round(latency, 3),
+        **usage,
+        **{
+            name: {"score": result.score, "passing": result.passing, "feedback": result.feedback}
+            for name, result in zip(evaluators, results)
+        },
+    }
+
+
+async def evaluate_async(query_engine, llm, questions: List[dict], workers: int = EVAL_WORKERS) -> List[dict]:
+    """
+    Evaluates the questions missing from the checkpoint, at most `workers` at a
+    time, appending each finished question to EVAL_RESULTS_FILE.
+    """
+    evaluators = {
+        "correctness": CorrectnessEvaluator(llm=llm),
+        "faithfulness": FaithfulnessEvaluator(llm=llm),
+        "relevancy": RelevancyEvaluator(llm=llm),
+    }
+    done = load_checkpoint()
+    pending = [question for question in questions if question["id"] not in done]
+    logger.info(f"{len(done)} questions already evaluated, {len(pending)} to go.")
+
+    semaphore = asyncio.Semaphore(workers)
+    os.makedirs(os.path.dirname(EVAL_RESULTS_FILE), exist_ok=True)
+    with open(EVAL_RESULTS_FILE, "a") as checkpoint:
+
+        async def worker(question: dict):
+            async with semaphore:
+                try:
+                    result = await evaluate_question(question, query_engine, evaluators)
+                except Exception as e:
+                    logger.error(f"Question {question['id']} failed, it will be retried on the next run: {e}")
+                    return
+            checkpoint.write(json.dumps(result, ensure_ascii=False) + "\n")
+            checkpoint.flush()
+            done[result["id"]] = result
+
+        await tqdm_asyncio.gather(*[worker(question) for question in pending])
+    return [done[question["id"]] for question in questions if question["id"] in done]
+
+
+def build_report(results: List[dict]) -> pd.DataFrame:
+    """Per-question report, written to EVAL_REPORT_FILE, with a logged summary."""
+    df = pd.json_normalize(results)
+    df.to_csv(EVAL_REPORT_FILE, index=False)
+
+    summary = {
+        "questions": len(df),
+        "latency_p50_s": round(df["latency_s"].quantile(0.5), 3),
+        "latency_p95_s": round(df["latency_s"].quantile(0.95), 3),
+        "query_tokens": int(df["query_prompt_tokens"].sum() + df["query_completion_tokens"].sum()),
+        "eval_tokens": int(df["eval_prompt_tokens"].sum() + df["eval_completion_tokens"].sum()),
+    }
+    for name in ("correctness", "faithfulness", "relevancy"):
+        summary[f"{name}_mean_score"] = round(df[f"{name}.score"].mean(), 3)
+        summary[f"{name}_pass_rate"] = round(df[f"{name}.passing"].astype(float).mean(), 3)
+    logger.info(f"Evaluation summary: {json.dumps(summary, indent=4)}")
+    logger.success(f"Per-question report written to {EVAL_REPORT_FILE}.")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--num-chunks", type=int, default=30, help="Index chunks to generate questions from.")
+    parser.add_argument("--questions-per-chunk", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=EVAL_WORKERS, help="Questions evaluated concurrently.")
+    parser.add_argument("--mock", action="store_true", help="Use the local mock models instead of Gemini.")
+    args = parser.parse_args()
+
+    init_tracing()
+    resources = load_resources(args.mock)
+    resources.llm.callback_manager.add_handler(TokenUsageHandler())
+    questions = generate_questions(resources.index, resources.llm, args.num_chunks, args.questions_per_chunk)
+    results = asyncio.run(evaluate_async(resources.query_engine, resources.llm, questions, args.workers))
+    if results:
+        build_report(results)
+
 
-    return evaluate_async
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# pages/admin.py
+import pandas as pd
+import streamlit as st
+from loguru import logger
+from src.resource_registry import get_registry
+from src.tracing import init_tracing, load_exported_metrics
+
+def show_metrics(metrics: dict):
+    """Displays the histograms, counters and recent spans of one metrics snapshot."""
+    histograms = pd.DataFrame(metrics["histograms"])
+    if histograms.empty:
+        st.info("No spans recorded yet.")
+    else:
+        st.subheader("Stage latency (seconds)")
+        st.dataframe(
+            histograms[["metric", "label", "count", "mean", "p50", "p95", "p99", "sum"]],
+            use_container_width=True,
+            hide_index=True
+        )
+        spans = histograms[histograms["metric"] == "span_duration_seconds"]
+        if not spans.empty:
+            st.bar_chart(spans.set_index("label")["p95"])
+
+    if metrics["counters"]:
+        st.subheader("LLM calls and tokens")
+        st.dataframe(pd.DataFrame(metrics["counters"]), use_container_width=True, hide_index=True)
+
+    if metrics["recent_spans"]:
+        st.subheader("Recent spans")
+        st.dataframe(pd.DataFrame(metrics["recent_spans"][::-1]), use_container_width=True, hide_index=True)
+
+def main():
+    """Main function for the Streamlit admin page."""
+    st.title("📊 Performance Metrics")
+    tracer = init_tracing("app")
+
+    live_tab, exported_tab = st.tabs(["This server", "Exported by other processes"])
+    with live_tab:
+        cache_metrics = get_registry().semantic_cache_metrics()
+        if cache_metrics:
+            st.subheader("Semantic cache")
+            st.json(cache_metrics)
+        show_metrics(tracer.snapshot())
+        st.download_button(
+            "Download Prometheus metrics",
+            tracer.prometheus_text(),
+            file_name="metrics.prom",
+            mime="text/plain"
+        )
+
+    with exported_tab:
+        exported = load_exported_metrics()
+        if not exported:
+            st.info("No exported metrics files found.")
+        for process, metrics in exported.items():
+            with st.expander(process):
+                show_metrics(metrics)
+
+if __name__ == "__main__":
+    logger.info("Starting admin.py")
+    main()
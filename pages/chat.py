@@ -1,10 +1,11 @@
 # pages/chat.py
 import streamlit as st
 from loguru import logger
-from src.conversation_engine import initialize_chatbox, load_chat_store
-from src.global_settings import SCORES_FILE, CONVERSATION_FILE
-import os
-import json
+from src.chat_client import ChatClient
+from src.global_settings import CHAT_API_URL
+from src.async_runner import run_async, iterate_async
+from src.tracing import get_tracer, init_tracing, span
+import time
 
 def get_session_info():
     """Retrieves or initializes session information for the chat."""
@@ -16,12 +17,92 @@ def get_session_info():
     user_info = st.session_state.user_info
     return username, user_info
 
+def get_session_agent(chat_store, username, user_info):
+    """
+    Returns the agent cached for this session. It is rebuilt only when the user
+    or their profile changes or the shared index on disk was updated; the index
+    itself is shared.
+    """
+    from src.resource_registry import storage_signature
+
+    agent_key = (username, user_info, storage_signature())
+    if st.session_state.get("agent_key") != agent_key or st.session_state.get("agent") is None:
+        from src.conversation_engine import initialize_chatbox
+
+        st.session_state.agent = initialize_chatbox(chat_store=chat_store, username=username, user_info=user_info)
+        st.session_state.agent_key = agent_key
+    return st.session_state.agent
+
+def timed_stream(token_gen, turn_start: float, timings: dict):
+    """Yields the streamed tokens, recording the time to the first one in timings["ttft"]."""
+    for token in token_gen:
+        if "ttft" not in timings:
+            timings["ttft"] = time.perf_counter() - turn_start
+        yield token
+
 def handle_user_input(agent, prompt):
-    """Handles user input and generates a response from the agent."""
-    with st.spinner("Generating response..."):
-        response = agent.chat(prompt)
-        st.session_state.messages.append({"role": "assistant", "content": response.response})
-        st.session_state.messages.append({"role": "assistant", "content": response.tool_calls[0].tool_call_data.kwargs["score"]}) # this need to be verify with conversation engine
+    """
+    Streams the agent's answer into the chat as it is generated. The turn runs
+    on the background event loop (astream_chat, async retrieval); chat history
+    and score writes are queued to background writers, so nothing here waits on disk.
+    """
+    turn_start = time.perf_counter()
+    timings = {}
+    with span("chat_turn"), st.chat_message("assistant"):
+        # The ReAct reasoning and tool calls run before the final answer starts streaming
+        with st.spinner("Generating response..."):
+            response = run_async(agent.astream_chat(prompt))
+        tokens = iterate_async(response.async_response_gen())
+        content = st.write_stream(timed_stream(tokens, turn_start, timings))
+    log_turn(turn_start, timings)
+
+    # The agent memory queues the finished message for the chat store once the stream ends
+    from src.conversation_engine import get_saved_scores
+
+    show_reply(content, get_saved_scores(response))
+
+def handle_remote_input(client: ChatClient, username, user_info, prompt):
+    """
+    Streams the answer of the chat service into the chat. The agent and its
+    memory live in the service worker that serves this user.
+    """
+    turn_start = time.perf_counter()
+    timings = {}
+    result = {}
+    with span("chat_turn"), st.chat_message("assistant"):
+        try:
+            tokens = client.stream_chat(username, user_info, prompt, result)
+            content = st.write_stream(timed_stream(tokens, turn_start, timings))
+        except ConnectionError as e:
+            logger.error(f"Chat service request failed: {e}")
+            st.error("The chat service is unavailable. Please try again later.")
+            return
+    log_turn(turn_start, timings)
+    show_reply(content, result.get("scores", []))
+
+def log_turn(turn_start: float, timings: dict):
+    total = time.perf_counter() - turn_start
+    get_tracer().observe("chat_ttft_seconds", "chat_turn", timings.get("ttft", total))
+    logger.info(f"Chat turn latency: time to first token {timings.get('ttft', total):.2f}s, total {total:.2f}s")
+
+def show_reply(content, scores):
+    """Adds the streamed answer and the scores saved during the turn to the session history."""
+    st.session_state.messages.append({"role": "assistant", "content": content})
+    for score in scores:
+        st.session_state.messages.append({"role": "assistant", "content": score})
+        with st.chat_message("assistant"):
+            st.markdown(score)
+
+def load_history(username):
+    """Past messages of the user, from the chat service when CHAT_API_URL is set."""
+    if CHAT_API_URL:
+        return ChatClient().history(username)
+    from src.conversation_engine import load_chat_store
+
+    return [
+        {"role": message.role, "content": message.content}
+        for message in load_chat_store().get_messages(username)
+    ]
 
 def main():
     """Main function for the Streamlit chat page."""
@@ -29,20 +110,30 @@ def main():
     if not username:
         return
 
+    init_tracing("app")
     st.title(f"🧠 Chat with the Mental Health Assistant")
     st.markdown(f"**Logged in as**: `{username}`")
 
-    # Load chat history from file
-    chat_store = load_chat_store()
-    agent = initialize_chatbox(chat_store=chat_store, container=None, username=username, user_info=user_info)
-    
+    # With CHAT_API_URL set, the agent runs in the chat service and this page is only its client,
+    # so the agent, index and model modules are only imported on the local path
+    agent = None
+    if not CHAT_API_URL:
+        from src.conversation_engine import load_chat_store
+
+        # Shared chat store; history is read per user
+        agent = get_session_agent(load_chat_store(), username, user_info)
+        if agent is None:
+            return
+
     # Initialize chat history in session state
     if "messages" not in st.session_state:
-        st.session_state.messages = []
-        # Restore past messages from chat store
-        if username in chat_store.chat_dicts:
-            for message in chat_store.chat_dicts[username]:
-                st.session_state.messages.append({"role": message.role, "content": message.content})
+        # Restore past messages from the chat store
+        try:
+            st.session_state.messages = load_history(username)
+        except ConnectionError as e:
+            logger.error(f"Could not load chat history: {e}")
+            st.error("The chat service is unavailable. Please try again later.")
+            return
 
     # Display chat messages
     for message in st.session_state.messages:
@@ -55,7 +146,10 @@ def main():
         with st.chat_message("user"):
             st.markdown(prompt)
         st.session_state.messages.append({"role": "user", "content": prompt})
-        handle_user_input(agent, prompt)
+        if CHAT_API_URL:
+            handle_remote_input(ChatClient(), username, user_info, prompt)
+        else:
+            handle_user_input(agent, prompt)
 
 if __name__ == "__main__":
     logger.info("Starting chat.py")
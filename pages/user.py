@@ -1,21 +1,7 @@
 # pages/user.py
 import streamlit as st
-import yaml
 from loguru import logger
-from src.global_settings import USERS_FILE
-import os
-
-def load_users():
-    """Loads user data from the YAML file."""
-    if not os.path.exists(USERS_FILE):
-        return {}
-    with open(USERS_FILE, "r") as f:
-        return yaml.safe_load(f) or {}
-
-def save_users(users_data):
-    """Saves user data to the YAML file."""
-    with open(USERS_FILE, "w") as f:
-        yaml.dump(users_data, f, indent=4)
+from src.user_store import get_user_store
 
 def login_form():
     """Displays the login form."""
@@ -26,17 +12,13 @@ def login_form():
         submitted = st.form_submit_button("Login")
         
         if submitted:
-            users_data = load_users()
-            if username not in users_data:
-                users_data[username] = {"info": user_info}
-                save_users(users_data)
-                st.session_state.username = username
-                st.session_state.user_info = user_info
+            # One indexed lookup, or one atomic insert for a new user
+            user, created = get_user_store().get_or_create(username, user_info)
+            st.session_state.username = username
+            st.session_state.user_info = user["info"]
+            if created:
                 st.success(f"New user `{username}` created and logged in!")
-                logger.info(f"New user created: {username}")
             else:
-                st.session_state.username = username
-                st.session_state.user_info = users_data[username]["info"]
                 st.success(f"Welcome back, `{username}`!")
                 logger.info(f"User logged in: {username}")
 
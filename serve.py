@@ -0,0 +1,36 @@
+# serve.py
+import argparse
+from loguru import logger
+from src.chat_service import ChatService
+from src.global_settings import CHAT_API_HOST, CHAT_API_PORT, CHAT_WORKERS, INDEX_STORAGE
+
+def main():
+    """
+    Runs the headless chat API: a pool of worker processes sharing the
+    memory-mapped index, with every user pinned to one worker. Point the
+    Streamlit app at it by setting CHAT_API_URL.
+    """
+    parser = argparse.ArgumentParser(description="Headless multi-worker chat API.")
+    parser.add_argument("--host", default=CHAT_API_HOST)
+    parser.add_argument("--port", type=int, default=CHAT_API_PORT)
+    parser.add_argument("--workers", type=int, default=CHAT_WORKERS)
+    parser.add_argument("--persist-dir", default=INDEX_STORAGE)
+    parser.add_argument("--mock", action="store_true", help="Use the local mock models instead of the provider.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Seconds per mock LLM call.")
+    parser.add_argument("--token-latency", type=float, default=0.002, help="Seconds per streamed mock word.")
+    parser.add_argument("--dim", type=int, default=256, help="Mock embedding dimension; must match the index.")
+    args = parser.parse_args()
+
+    mock = None
+    if args.mock:
+        mock = {
+            "llm": {"latency": args.llm_latency, "token_latency": args.token_latency, "tool_name": "dsm5"},
+            "embedding": {"dim": args.dim},
+        }
+    service = ChatService(workers=args.workers, persist_dir=args.persist_dir, mock=mock)
+    service.start()
+    logger.info("Press Ctrl+C to stop.")
+    service.serve_forever(args.host, args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# src/async_runner.py
+import asyncio
+import threading
+from typing import AsyncIterator, Awaitable, Iterator, Optional, TypeVar
+from loguru import logger
+
+T = TypeVar("T")
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """
+    Returns the process-wide event loop running on a background thread.
+
+    Streamlit runs each script on its own thread without a loop, and async
+    clients (Gemini, httpx) are bound to the loop they were first used on, so
+    every agent turn is scheduled on this one long-lived loop.
+    """
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="async-runner", daemon=True).start()
+                logger.info("Started background event loop.")
+                _loop = loop
+    return _loop
+
+
+def run_async(coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """Runs a coroutine on the background loop and waits for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result(timeout)
+
+
+def iterate_async(agen: AsyncIterator[T]) -> Iterator[T]:
+    """Iterates an async generator from synchronous code, one item at a time."""
+    while True:
+        try:
+            yield run_async(agen.__anext__())
+        except StopAsyncIteration:
+            return
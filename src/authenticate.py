@@ -1,15 +1,16 @@
 # src/authenticate.py
 from loguru import logger
 import os
+from src.user_store import get_user_store
 
 def authenticate_user(username: str, password: str) -> bool:
     """
-    Minimal authentication function. 
+    Minimal authentication function: the user must exist in the user store.
     Can be expanded to include password hashing and secure storage.
     """
-    logger.warning("Authentication is not yet fully implemented. Using a placeholder.")
+    logger.warning("Authentication is not yet fully implemented. Passwords are not checked.")
     # This is a placeholder; real-world apps should not use this logic.
-    return username is not None and len(username) > 0
+    return bool(username) and get_user_store().get(username) is not None
 
 def check_session_status():
     """
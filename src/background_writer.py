@@ -0,0 +1,108 @@
+# src/background_writer.py
+import atexit
+import queue
+import sqlite3
+import threading
+import time
+from typing import List, Sequence, Tuple
+from loguru import logger
+from src.tracing import get_tracer
+
+# One write job: statements that must be applied together, each (sql, params).
+Job = Sequence[Tuple[str, tuple]]
+
+_CLOSE = object()
+
+
+class BackgroundWriter:
+    """
+    Applies queued SQLite write jobs on a single writer thread.
+
+    Jobs are applied in submission order. Up to `batch_size` jobs that are
+    already waiting are committed in one transaction, so a burst of writes
+    costs one commit instead of one per row. If a batch fails, its jobs are
+    retried one by one, so a single bad job can't lose the rest of the batch.
+    Queued jobs are drained on close(), which also runs at interpreter exit.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, lock: threading.Lock, name: str, batch_size: int = 100):
+        """
+        Args:
+            conn (sqlite3.Connection): Autocommit connection from src.sqlite_utils.connect.
+            lock (threading.Lock): The lock that serializes access to the connection.
+            name (str): Name of the writer thread, used in log messages.
+            batch_size (int): Maximum number of jobs committed in one transaction.
+        """
+        self.name = name
+        self.batch_size = batch_size
+        self._conn = conn
+        self._lock = lock
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self._closed_lock = threading.Lock()  # no job can be queued behind the close sentinel
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, job: Job) -> None:
+        """Queues a write job and returns immediately."""
+        with self._closed_lock:
+            if self._closed:
+                raise RuntimeError(f"{self.name} is closed.")
+            self._queue.put(list(job))
+
+    def flush(self) -> None:
+        """Blocks until every job submitted so far has been applied."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Applies the queued jobs and stops the writer thread. Safe to call twice."""
+        with self._closed_lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_CLOSE)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            batch: List[Job] = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            jobs = [job for job in batch if job is not _CLOSE]
+            try:
+                if jobs:
+                    self._apply(jobs)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(jobs) < len(batch):
+                return
+
+    def _apply(self, jobs: List[Job]):
+        try:
+            self._commit(jobs)
+        except sqlite3.Error as e:
+            logger.warning(f"{self.name}: batch of {len(jobs)} writes failed ({e}), retrying one by one.")
+            for job in jobs:
+                try:
+                    self._commit([job])
+                except sqlite3.Error as e:
+                    logger.error(f"{self.name}: dropped write {job[0][0]!r}: {e}")
+
+    def _commit(self, jobs: List[Job]):
+        start = time.perf_counter()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for job in jobs:
+                    for sql, params in job:
+                        self._conn.execute(sql, params)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        get_tracer().observe("writer_commit_seconds", self.name, time.perf_counter() - start)
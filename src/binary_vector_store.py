@@ -0,0 +1,286 @@
+# src/binary_vector_store.py
+import json
+import os
+import shutil
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from loguru import logger
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (
+    BasePydanticVectorStore, VectorStoreQuery, VectorStoreQueryResult
+)
+from src.global_settings import VECTOR_STORE_DTYPE
+
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+SCORE_BLOCK_ROWS = 2048  # rows converted to float32 at a time when scoring a quantized matrix; stays in cache
+JSON_VECTOR_STORE = "default__vector_store.json"
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    L2-normalizes vectors and stores them as dtype. int8 rows get a symmetric
+    scale each, (codes, scales) with vector ≈ codes * scale; other dtypes have
+    no scales.
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"Unknown vector dtype '{dtype}'. Use one of {sorted(DTYPES)}.")
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    vectors = vectors / np.where(norms == 0, 1, norms)
+    if dtype != "int8":
+        return vectors.astype(DTYPES[dtype]), None
+    if not len(vectors):
+        return vectors.astype(np.int8), np.zeros(0, dtype=np.float32)
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def dequantize(codes: np.ndarray, scales: Optional[np.ndarray]) -> np.ndarray:
+    vectors = np.asarray(codes, dtype=np.float32)
+    return vectors * scales[:, None] if scales is not None else vectors
+
+
+def cosine_scores(codes: np.ndarray, scales: Optional[np.ndarray], query: List[float]) -> np.ndarray:
+    """
+    Cosine similarity of the query to every stored row. Quantized matrices are
+    converted to float32 block by block, so the temporary copy stays small.
+    """
+    query = np.asarray(query, dtype=np.float32)
+    query = query / (np.linalg.norm(query) or 1.0)
+    if codes.dtype == np.float32:
+        scores = codes @ query
+    else:
+        scores = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            scores[start:start + SCORE_BLOCK_ROWS] = codes[start:start + SCORE_BLOCK_ROWS].astype(np.float32) @ query
+    return scores * scales if scales is not None else scores
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def replace_dir(tmp_dir: str, target_dir: str):
+    """Swaps a fully written directory into place. Open memory maps keep the old files."""
+    old_dir = target_dir + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(target_dir):
+        os.replace(target_dir, old_dir)
+    os.replace(tmp_dir, target_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+class BinaryVectorStore(BasePydanticVectorStore):
+    """
+    Vector store persisted as contiguous NumPy arrays instead of JSON float lists.
+
+    Vectors are normalized and kept as one float32, float16 or int8 matrix
+    (int8 with a scale per row); node ids and ref doc ids are kept in row
+    order, with an id-to-row mapping built at load time. A persisted store is
+    memory-mapped when loaded, so nothing is parsed and the pages are shared
+    between processes. Queries are one vectorized scan over the matrix.
+    Nodes added or deleted after loading are applied in memory and written out
+    by persist().
+
+    Files, in a directory named after the path StorageContext.persist passes:
+        vectors.npy, scales.npy (int8 only), ids.json ({"dtype", "ids", "ref_doc_ids"})
+    """
+
+    stores_text: bool = False
+    dtype: str = Field(default=VECTOR_STORE_DTYPE, description="float32, float16 or int8.")
+    _ids: List[str] = PrivateAttr(default_factory=list)
+    _ref_doc_ids: List[str] = PrivateAttr(default_factory=list)
+    _rows: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _codes: Optional[np.ndarray] = PrivateAttr(default=None)
+    _scales: Optional[np.ndarray] = PrivateAttr(default=None)
+    _added: List[Tuple[np.ndarray, Optional[np.ndarray]]] = PrivateAttr(default_factory=list)
+    _deleted: Set[int] = PrivateAttr(default_factory=set)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "BinaryVectorStore"
+
+    @property
+    def client(self) -> None:
+        return None
+
+    @property
+    def size(self) -> int:
+        """Number of stored vectors. Not __len__: an empty store must stay truthy for StorageContext."""
+        return len(self._ids) - len(self._deleted)
+
+    def _compact(self):
+        """Applies pending additions and deletions to the matrix."""
+        if not self._added and not self._deleted:
+            return
+        parts = ([(self._codes, self._scales)] if self._codes is not None else []) + self._added
+        codes = np.concatenate([part[0] for part in parts])
+        scales = np.concatenate([part[1] for part in parts]) if self.dtype == "int8" else None
+        if self._deleted:
+            keep = np.setdiff1d(np.arange(len(self._ids)), np.fromiter(self._deleted, dtype=np.int64))
+            codes = codes[keep]
+            scales = scales[keep] if scales is not None else None
+            self._ids = [self._ids[i] for i in keep]
+            self._ref_doc_ids = [self._ref_doc_ids[i] for i in keep]
+            self._rows = {node_id: row for row, node_id in enumerate(self._ids)}
+        self._codes, self._scales = codes, scales
+        self._added, self._deleted = [], set()
+
+    def add(self, nodes: Sequence[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+        replaced = [node.node_id for node in nodes if node.node_id in self._rows]
+        if replaced:
+            self.delete_nodes(replaced)
+            self._compact()
+        self._added.append(quantize(np.asarray([node.get_embedding() for node in nodes]), self.dtype))
+        for node in nodes:
+            self._rows[node.node_id] = len(self._ids)
+            self._ids.append(node.node_id)
+            self._ref_doc_ids.append(node.ref_doc_id or "None")
+        return [node.node_id for node in nodes]
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        self._deleted.update(row for row, ref in enumerate(self._ref_doc_ids) if ref == ref_doc_id)
+
+    def delete_nodes(self, node_ids: Optional[List[str]] = None, filters=None, **delete_kwargs: Any) -> None:
+        if filters is not None:
+            raise ValueError("BinaryVectorStore does not support metadata filters.")
+        self._deleted.update(self._rows[node_id] for node_id in node_ids or [] if node_id in self._rows)
+
+    def clear(self) -> None:
+        self._ids, self._ref_doc_ids, self._rows = [], [], {}
+        self._codes = self._scales = None
+        self._added, self._deleted = [], set()
+
+    def get(self, text_id: str) -> List[float]:
+        """The stored (normalized, dequantized) embedding of a node."""
+        self._compact()
+        row = self._rows[text_id]
+        scales = self._scales[row:row + 1] if self._scales is not None else None
+        return dequantize(self._codes[row:row + 1], scales)[0].tolist()
+
+    def vectors(self) -> Tuple[List[str], np.ndarray]:
+        """(node ids, float32 matrix of their normalized embeddings), in row order."""
+        self._compact()
+        if self._codes is None:
+            return [], np.zeros((0, 0), dtype=np.float32)
+        return list(self._ids), dequantize(self._codes, self._scales)
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.filters is not None:
+            raise ValueError("BinaryVectorStore does not support metadata filters.")
+        self._compact()
+        if self._codes is None or not self._ids:
+            return VectorStoreQueryResult(nodes=None, similarities=[], ids=[])
+        scores = cosine_scores(self._codes, self._scales, query.query_embedding)
+        if query.node_ids or query.doc_ids:
+            allowed = np.zeros(len(scores), dtype=bool)
+            allowed[[self._rows[node_id] for node_id in query.node_ids or [] if node_id in self._rows]] = True
+            if query.doc_ids:
+                allowed |= np.isin(np.asarray(self._ref_doc_ids), query.doc_ids)
+            scores = np.where(allowed, scores, -np.inf)
+        rows = [row for row in top_k(scores, query.similarity_top_k) if np.isfinite(scores[row])]
+        return VectorStoreQueryResult(
+            nodes=None, similarities=[float(scores[row]) for row in rows], ids=[self._ids[row] for row in rows]
+        )
+
+    def persist(self, persist_path: str, fs=None) -> None:
+        """Writes the arrays next to persist_path (its name without extension), replacing them atomically."""
+        self._compact()
+        store_dir = os.path.splitext(persist_path)[0]
+        tmp_dir = store_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        codes = self._codes if self._codes is not None else np.zeros((0, 0), dtype=DTYPES[self.dtype])
+        np.save(os.path.join(tmp_dir, "vectors.npy"), codes)
+        if self._scales is not None:
+            np.save(os.path.join(tmp_dir, "scales.npy"), self._scales)
+        with open(os.path.join(tmp_dir, "ids.json"), "w") as f:
+            json.dump({"dtype": self.dtype, "ids": self._ids, "ref_doc_ids": self._ref_doc_ids}, f)
+        replace_dir(tmp_dir, store_dir)
+
+    @classmethod
+    def from_persist_path(cls, persist_path: str, mmap: bool = True) -> "BinaryVectorStore":
+        """Loads a persisted store, memory-mapped read-only by default."""
+        store_dir = os.path.splitext(persist_path)[0]
+        with open(os.path.join(store_dir, "ids.json")) as f:
+            data = json.load(f)
+        store = cls(dtype=data["dtype"])
+        mmap_mode = "r" if mmap else None
+        store._ids, store._ref_doc_ids = data["ids"], data["ref_doc_ids"]
+        store._rows = {node_id: row for row, node_id in enumerate(store._ids)}
+        if store._ids:
+            store._codes = np.load(os.path.join(store_dir, "vectors.npy"), mmap_mode=mmap_mode)
+            if store.dtype == "int8":
+                store._scales = np.load(os.path.join(store_dir, "scales.npy"), mmap_mode=mmap_mode)
+        return store
+
+    @classmethod
+    def from_vectors(cls, ids: List[str], ref_doc_ids: List[str], vectors: np.ndarray,
+                     dtype: str = VECTOR_STORE_DTYPE) -> "BinaryVectorStore":
+        """Builds a store from full-precision vectors, one row per id."""
+        store = cls(dtype=dtype)
+        if ids:
+            store._ids, store._ref_doc_ids = list(ids), list(ref_doc_ids)
+            store._rows = {node_id: row for row, node_id in enumerate(store._ids)}
+            store._codes, store._scales = quantize(vectors, dtype)
+        return store
+
+    @classmethod
+    def from_json(cls, json_path: str, dtype: str = VECTOR_STORE_DTYPE) -> "BinaryVectorStore":
+        """Converts a persisted SimpleVectorStore (JSON float lists)."""
+        with open(json_path) as f:
+            data = json.load(f)
+        embeddings: Dict[str, List[float]] = data.get("embedding_dict", {})
+        ref_doc_ids = data.get("text_id_to_ref_doc_id", {})
+        ids = list(embeddings)
+        return cls.from_vectors(
+            ids, [ref_doc_ids.get(node_id, "None") for node_id in ids], np.asarray(list(embeddings.values())), dtype
+        )
+
+    def ref_doc_ids(self) -> List[str]:
+        """Ref doc id of every row, in row order."""
+        self._compact()
+        return list(self._ref_doc_ids)
+
+
+def json_is_current(persist_dir: str) -> bool:
+    """
+    Whether the JSON vector store in persist_dir holds the current vectors:
+    it exists, and no binary store was persisted after it. The JSON file is
+    kept after a conversion, so it is stale once the binary store was updated.
+    """
+    json_path = os.path.join(persist_dir, JSON_VECTOR_STORE)
+    ids_path = os.path.join(os.path.splitext(json_path)[0], "ids.json")
+    if not os.path.exists(json_path):
+        return False
+    return not os.path.exists(ids_path) or os.stat(json_path).st_mtime_ns > os.stat(ids_path).st_mtime_ns
+
+
+def load_binary_vector_store(persist_dir: str, dtype: str = VECTOR_STORE_DTYPE) -> BinaryVectorStore:
+    """
+    Loads the binary vector store persisted in persist_dir. A JSON vector
+    store persisted by the "simple" backend is converted and written next to
+    it when there is no binary store yet or the JSON one is newer; an empty
+    store is returned when there is neither.
+    """
+    json_path = os.path.join(persist_dir, JSON_VECTOR_STORE)
+    if not json_is_current(persist_dir) and os.path.exists(os.path.join(os.path.splitext(json_path)[0], "ids.json")):
+        store = BinaryVectorStore.from_persist_path(json_path)
+        if store.dtype != dtype:
+            logger.warning(f"Vector store in {persist_dir} is {store.dtype}, not {dtype}; rebuild or convert it to change it.")
+        return store
+    if not os.path.exists(json_path):
+        return BinaryVectorStore(dtype=dtype)
+    logger.info(f"Converting {json_path} to the binary {dtype} vector store.")
+    store = BinaryVectorStore.from_json(json_path, dtype)
+    store.persist(json_path)
+    return BinaryVectorStore.from_persist_path(json_path)
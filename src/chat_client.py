@@ -0,0 +1,60 @@
+# src/chat_client.py
+import json
+from typing import Iterator, List
+from urllib.parse import quote
+from urllib.request import Request, urlopen
+from src.global_settings import CHAT_API_URL, CHAT_API_TIMEOUT
+
+
+class ChatClient:
+    """
+    Client of the headless chat service (src.chat_service, started by serve.py).
+    Only the standard library is used, so a page using it loads no models.
+
+    Raises:
+        ConnectionError: When the service can't be reached or reports an error.
+    """
+
+    def __init__(self, base_url: str = CHAT_API_URL, timeout: float = CHAT_API_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _get(self, path: str) -> dict:
+        try:
+            with urlopen(self.base_url + path, timeout=self.timeout) as response:
+                return json.load(response)
+        except OSError as e:  # URLError, timeouts and resets while reading
+            raise ConnectionError(f"Chat service at {self.base_url} is unavailable: {e}") from e
+
+    def health(self) -> dict:
+        return self._get("/health")
+
+    def history(self, username: str) -> List[dict]:
+        """Past messages of a user as {"role", "content"} dicts, oldest first."""
+        return self._get(f"/history?username={quote(username)}")["messages"]
+
+    def stream_chat(self, username: str, user_info: str, message: str, result: dict) -> Iterator[str]:
+        """
+        Sends one chat turn and yields the reply tokens as they are streamed.
+        The fields of the final event (the saved "scores") are stored in result.
+        """
+        body = json.dumps({"username": username, "user_info": user_info, "message": message}).encode("utf-8")
+        request = Request(
+            self.base_url + "/chat", data=body, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                for line in response:
+                    event = json.loads(line)
+                    if "token" in event:
+                        yield event["token"]
+                    elif "error" in event:
+                        raise ConnectionError(f"Chat service error: {event['error']}")
+                    else:
+                        result.update(event)
+                        return
+        except ConnectionError:
+            raise
+        except OSError as e:  # URLError, timeouts and resets while streaming
+            raise ConnectionError(f"Chat service at {self.base_url} is unavailable: {e}") from e
+        raise ConnectionError("Chat service closed the reply before it was complete.")
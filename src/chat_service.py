@@ -0,0 +1,336 @@
+# src/chat_service.py
+import asyncio
+import json
+import multiprocessing
+import queue
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import Future, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Set
+from urllib.parse import parse_qs, urlparse
+from loguru import logger
+from src.global_settings import (
+    INDEX_STORAGE, CHAT_API_HOST, CHAT_API_PORT, CHAT_WORKERS, CHAT_API_TIMEOUT, CHAT_WORKER_DRAIN_TIMEOUT
+)
+
+
+def worker_for(username: str, workers: int) -> int:
+    """Worker that serves a user. Stable across restarts, unlike hash()."""
+    return zlib.crc32(username.encode("utf-8")) % workers
+
+
+def _worker_models(mock: Optional[dict]):
+    if mock is None:
+        return None, None  # provider clients, created by the registry on first use
+    from src.global_settings import GATEWAY_ENABLED
+    from src.mock_models import MockEmbedding, MockLLM
+    llm, embed_model = MockLLM(**mock.get("llm", {})), MockEmbedding(**mock.get("embedding", {}))
+    if GATEWAY_ENABLED:
+        from src.model_gateway import ModelGateway, set_gateway
+        # Mock models have no provider quota; the limits come with the mock config
+        gateway = ModelGateway(**mock.get("gateway", {}))
+        set_gateway(gateway)
+        llm, embed_model = gateway.llm(llm), gateway.embed_model(embed_model)
+    return llm, embed_model
+
+
+def _worker_main(worker_id: int, persist_dir: str, mock: Optional[dict], requests, results):
+    """
+    Chat worker process. It maps the index export read-only, keeps one agent
+    per user it serves and runs the turns of different users concurrently on
+    its event loop; the turns of one user run in order.
+
+    Requests are (request_id, kind, payload) tuples; every request is answered
+    on `results` with "token" events and a final "done" or "error" event. On
+    the None sentinel, running turns get CHAT_WORKER_DRAIN_TIMEOUT seconds to
+    finish before the chat store and the score ledger are flushed and closed.
+    """
+    from llama_index.core import Settings
+    from src.async_runner import get_event_loop
+    from src.conversation_engine import get_saved_scores, initialize_chatbox, load_chat_store
+    from src.resource_registry import ResourceRegistry, get_registry, set_registry
+    from src.score_ledger import close_score_ledger
+    from src.tracing import init_tracing, span
+
+    tracer = init_tracing(f"chat_worker_{worker_id}")
+    llm, embed_model = _worker_models(mock)
+    if llm is not None:
+        Settings.llm, Settings.embed_model = llm, embed_model
+    set_registry(ResourceRegistry(persist_dir, llm=llm, embed_model=embed_model, index_format="mmap"))
+    chat_store = load_chat_store()
+    try:
+        get_registry().get()
+        results.put((None, "ready", worker_id))
+    except Exception as e:
+        logger.error(f"[worker {worker_id}] Could not load the index: {e}")
+        results.put((None, "error", f"worker {worker_id}: {e}"))
+        return
+
+    loop = get_event_loop()
+    agents: Dict[str, tuple] = {}  # username -> ((index version, user info), agent)
+    user_locks: Dict[str, asyncio.Lock] = {}
+    turns: Set[Future] = set()
+
+    def get_agent(username: str, user_info: str):
+        # A profile updated since the agent was built gets a new system prompt
+        key = (get_registry().get().version, user_info)
+        cached = agents.get(username)
+        if cached is None or cached[0] != key:
+            agent = initialize_chatbox(chat_store=chat_store, username=username, user_info=user_info)
+            if agent is None:
+                return None
+            agents[username] = cached = (key, agent)
+        return cached[1]
+
+    async def chat_turn(request_id: str, username: str, agent, message: str):
+        async with user_locks.setdefault(username, asyncio.Lock()):
+            start = time.perf_counter()
+            try:
+                with span("chat_turn"):
+                    response = await agent.astream_chat(message)
+                    ttft = None
+                    async for token in response.async_response_gen():
+                        if ttft is None:
+                            ttft = time.perf_counter() - start
+                            tracer.observe("chat_ttft_seconds", "chat_service", ttft)
+                        results.put((request_id, "token", token))
+                results.put((request_id, "done", {"scores": get_saved_scores(response)}))
+            except Exception as e:
+                logger.error(f"[worker {worker_id}] Chat turn failed: {e}")
+                results.put((request_id, "error", str(e)))
+
+    while True:
+        request = requests.get()
+        if request is None:
+            break
+        request_id, kind, payload = request
+        username = payload["username"]
+        try:
+            if kind == "history":
+                messages = [
+                    {"role": message.role.value, "content": message.content}
+                    for message in chat_store.get_messages(username)
+                ]
+                results.put((request_id, "done", {"messages": messages}))
+                continue
+            agent = get_agent(username, payload.get("user_info", ""))
+            if agent is None:
+                results.put((request_id, "error", "The chat agent could not be initialized."))
+                continue
+            turn = asyncio.run_coroutine_threadsafe(chat_turn(request_id, username, agent, payload["message"]), loop)
+            turns.add(turn)
+            turn.add_done_callback(turns.discard)
+        except Exception as e:
+            logger.error(f"[worker {worker_id}] Request failed: {e}")
+            results.put((request_id, "error", str(e)))
+
+    # Turns still running write to the chat store and the ledger, so they finish first
+    _, unfinished = wait(set(turns), timeout=CHAT_WORKER_DRAIN_TIMEOUT)
+    if unfinished:
+        logger.warning(f"[worker {worker_id}] Stopping with {len(unfinished)} chat turns unfinished.")
+    chat_store.close()
+    close_score_ledger()
+    tracer.export()
+
+
+class ChatService:
+    """
+    Headless chat API in front of a pool of worker processes.
+
+    The index is exported once to a memory-mapped store (src.mmap_store) that
+    every worker maps read-only, so N workers share one copy of the vectors
+    and nodes. Requests are routed by username, so a user's agent and chat
+    memory live in exactly one worker and their turns never race.
+
+    Endpoints:
+        POST /chat {"username", "user_info", "message"}: the reply as NDJSON
+            events, {"token": ...} per streamed token and a final
+            {"done": true, "scores": [...]} or {"error": ...}
+        GET /history?username=...: {"messages": [{"role", "content"}, ...]}
+        GET /health: worker liveness
+    """
+
+    def __init__(self, workers: int = CHAT_WORKERS, persist_dir: str = INDEX_STORAGE, mock: Optional[dict] = None):
+        self.workers = workers
+        self.persist_dir = persist_dir
+        self.mock = mock
+        self._context = multiprocessing.get_context("spawn")
+        self._processes: List = []
+        self._requests: List = []
+        self._results = None
+        self._pending: Dict[str, queue.Queue] = {}
+        self._pending_lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def start(self, timeout: float = 300):
+        """Exports the index if needed, then starts the workers and waits until each has loaded it."""
+        from src.mmap_store import ensure_mmap_store
+
+        ensure_mmap_store(self.persist_dir)
+        self._results = self._context.Queue()
+        for worker_id in range(self.workers):
+            requests = self._context.Queue()
+            process = self._context.Process(
+                target=_worker_main,
+                args=(worker_id, self.persist_dir, self.mock, requests, self._results),
+                name=f"chat-worker-{worker_id}",
+                daemon=True,
+            )
+            process.start()
+            self._requests.append(requests)
+            self._processes.append(process)
+
+        ready = 0
+        while ready < self.workers:
+            request_id, kind, payload = self._results.get(timeout=timeout)
+            if kind == "error":
+                self.stop()
+                raise RuntimeError(f"Chat worker failed to start: {payload}")
+            ready += 1
+        threading.Thread(target=self._collect, name="chat-results", daemon=True).start()
+        logger.success(f"{self.workers} chat workers ready.")
+
+    def _collect(self):
+        """Hands every worker event to the request waiting for it."""
+        while True:
+            try:
+                request_id, kind, payload = self._results.get()
+            except (EOFError, OSError):
+                return
+            with self._pending_lock:
+                events = self._pending.get(request_id)
+            if events is not None:
+                events.put((kind, payload))
+
+    def submit(self, kind: str, payload: dict):
+        """
+        Routes a request to the worker of payload["username"] and yields its
+        events as (kind, payload) until the final "done" or "error".
+        """
+        request_id = uuid.uuid4().hex
+        events: queue.Queue = queue.Queue()
+        with self._pending_lock:
+            self._pending[request_id] = events
+        try:
+            self._requests[worker_for(payload["username"], self.workers)].put((request_id, kind, payload))
+            while True:
+                try:
+                    kind, data = events.get(timeout=CHAT_API_TIMEOUT)
+                except queue.Empty:
+                    yield "error", f"No response from the chat worker within {CHAT_API_TIMEOUT}s."
+                    return
+                yield kind, data
+                if kind != "token":
+                    return
+        finally:
+            with self._pending_lock:
+                self._pending.pop(request_id, None)
+
+    def health(self) -> dict:
+        alive = [process.is_alive() for process in self._processes]
+        with self._pending_lock:
+            pending = len(self._pending)
+        return {"status": "ok" if all(alive) else "degraded", "workers": alive, "pending": pending}
+
+    def serve_forever(self, host: str = CHAT_API_HOST, port: int = CHAT_API_PORT):
+        """Serves the HTTP API until interrupted, then stops the workers."""
+        self._server = ThreadingHTTPServer((host, port), _ChatRequestHandler)
+        self._server.daemon_threads = True
+        self._server.chat_service = self
+        logger.info(f"Chat API listening on http://{host}:{self._server.server_address[1]}.")
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._server.server_close()
+            self.stop()
+
+    def shutdown(self):
+        """Stops serve_forever from another thread."""
+        if self._server is not None:
+            self._server.shutdown()
+
+    def stop(self, timeout: float = CHAT_WORKER_DRAIN_TIMEOUT + 30):
+        """
+        Asks the workers to finish their running turns and flush their stores,
+        and terminates those still running after `timeout` seconds.
+        """
+        for requests in self._requests:
+            requests.put(None)
+        deadline = time.monotonic() + timeout
+        for process in self._processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning(f"{process.name} did not stop within {timeout:.0f}s; terminating it.")
+                process.terminate()
+        self._processes, self._requests = [], []
+        logger.info("Chat workers stopped.")
+
+
+def _event(kind: str, data) -> dict:
+    if kind == "token":
+        return {"token": data}
+    if kind == "done":
+        return {"done": True, **data}
+    return {"error": data}
+
+
+class _ChatRequestHandler(BaseHTTPRequestHandler):
+    def _send_json(self, status: int, body: dict):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/health":
+            self._send_json(200, self.server.chat_service.health())
+        elif url.path == "/history":
+            username = parse_qs(url.query).get("username", [""])[0]
+            if not username:
+                self._send_json(400, {"error": "username is required"})
+                return
+            for kind, data in self.server.chat_service.submit("history", {"username": username}):
+                if kind == "done":
+                    self._send_json(200, data)
+                else:
+                    self._send_json(500, {"error": data})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if urlparse(self.path).path != "/chat":
+            self._send_json(404, {"error": "not found"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"error": "invalid JSON"})
+            return
+        if not body.get("username") or not body.get("message"):
+            self._send_json(400, {"error": "username and message are required"})
+            return
+
+        # Events are streamed as they arrive; the end of the body is the end of the reply
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        payload = {key: body.get(key, "") for key in ("username", "user_info", "message")}
+        for kind, data in self.server.chat_service.submit("chat", payload):
+            try:
+                self.wfile.write(json.dumps(_event(kind, data), ensure_ascii=False).encode("utf-8") + b"\n")
+                self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                # The worker finishes the turn anyway, so the chat memory stays complete
+                return
+
+    def log_message(self, format, *args):
+        logger.debug(f"[chat api] {format % args}")
@@ -0,0 +1,236 @@
+# src/chat_store.py
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+from loguru import logger
+from llama_index.core.bridge.pydantic import PrivateAttr
+from llama_index.core.llms import ChatMessage
+from llama_index.core.storage.chat_store import SimpleChatStore
+from llama_index.core.storage.chat_store.base import BaseChatStore
+from src.background_writer import BackgroundWriter
+from src.global_settings import CHAT_STORE_CACHE_KEYS
+from src.sqlite_utils import connect
+
+
+def _dump(message: ChatMessage) -> str:
+    return json.dumps(message.model_dump(), ensure_ascii=False)
+
+
+def _load(payload: str) -> ChatMessage:
+    return ChatMessage.model_validate(json.loads(payload))
+
+
+class SQLiteChatStore(BaseChatStore):
+    """
+    Chat store keeping one row per message in a SQLite table indexed by user key.
+
+    Implements the same interface as SimpleChatStore, but add_message appends a
+    single row instead of rewriting the whole history, so persistence cost does
+    not grow with the number of users or messages.
+
+    Writes go through a background writer: the history of a key is kept in
+    memory once read, updated immediately, and the matching SQL is applied in
+    order on the writer thread, so a chat turn never waits for the database.
+    At most `cache_keys` histories are kept, least recently used dropped first.
+    set_messages with a list extending the stored history (as the agent does
+    every turn) only inserts the new messages.
+    """
+
+    db_path: str
+    cache_keys: int = CHAT_STORE_CACHE_KEYS
+    _conn = PrivateAttr()
+    _lock = PrivateAttr()
+    _writer = PrivateAttr()
+    _cache = PrivateAttr()
+    _cache_lock = PrivateAttr()
+
+    def __init__(self, db_path: str, **kwargs):
+        super().__init__(db_path=db_path, **kwargs)
+        self._lock = threading.Lock()
+        self._conn = connect(db_path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " chat_key TEXT NOT NULL,"
+            " message TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_messages_key ON messages (chat_key, id)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY)"
+        )
+        self._writer = BackgroundWriter(self._conn, self._lock, name="chat-store-writer")
+        self._cache: "OrderedDict[str, List[ChatMessage]]" = OrderedDict()
+        self._cache_lock = threading.RLock()
+
+    @classmethod
+    def class_name(cls) -> str:
+        """Get class name."""
+        return "SQLiteChatStore"
+
+    def _history(self, key: str) -> List[ChatMessage]:
+        """The cached history of a key, read from the database on first use. Call under _cache_lock."""
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        # Writes of a key dropped from the cache may still be queued
+        self._writer.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT message FROM messages WHERE chat_key = ? ORDER BY id", (key,)
+            ).fetchall()
+        return self._cache_history(key, [_load(row[0]) for row in rows])
+
+    def _cache_history(self, key: str, messages: List[ChatMessage]) -> List[ChatMessage]:
+        self._cache[key] = messages
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_keys:
+            self._cache.popitem(last=False)
+        return messages
+
+    def set_messages(self, key: str, messages: List[ChatMessage]) -> None:
+        """
+        Replace all messages for a key. If they extend the stored history only
+        the new ones are inserted; otherwise the rows are replaced in one transaction.
+        """
+        with self._cache_lock:
+            stored = self._history(key)
+            if len(messages) >= len(stored) and all(
+                new is old or new == old for new, old in zip(messages, stored)
+            ):
+                tail = messages[len(stored):]
+                if tail:
+                    stored.extend(tail)
+                    self._writer.submit(
+                        [("INSERT INTO messages (chat_key, message) VALUES (?, ?)", (key, _dump(message)))
+                         for message in tail]
+                    )
+                return
+            self._cache_history(key, list(messages))
+            self._writer.submit(
+                [("DELETE FROM messages WHERE chat_key = ?", (key,))]
+                + [("INSERT INTO messages (chat_key, message) VALUES (?, ?)", (key, _dump(message)))
+                   for message in messages]
+            )
+
+    def get_messages(self, key: str) -> List[ChatMessage]:
+        """Get messages for a key, oldest first."""
+        with self._cache_lock:
+            return list(self._history(key))
+
+    def add_message(self, key: str, message: ChatMessage, idx: Optional[int] = None) -> None:
+        """Append a message for a key. Inserting at a position falls back to set_messages."""
+        with self._cache_lock:
+            if idx is not None:
+                messages = list(self._history(key))
+                messages.insert(idx, message)
+                self.set_messages(key, messages)
+                return
+            self._history(key).append(message)
+            self._writer.submit(
+                [("INSERT INTO messages (chat_key, message) VALUES (?, ?)", (key, _dump(message)))]
+            )
+
+    def delete_messages(self, key: str) -> Optional[List[ChatMessage]]:
+        """Delete messages for a key."""
+        with self._cache_lock:
+            messages = self._history(key)
+            if not messages:
+                return None
+            self._cache[key] = []
+            self._writer.submit([("DELETE FROM messages WHERE chat_key = ?", (key,))])
+        return messages
+
+    def delete_message(self, key: str, idx: int) -> Optional[ChatMessage]:
+        """Delete specific message for a key."""
+        with self._cache_lock:
+            messages = self._history(key)
+            if idx >= len(messages):
+                return None
+            self._writer.submit([(
+                "DELETE FROM messages WHERE id ="
+                " (SELECT id FROM messages WHERE chat_key = ? ORDER BY id LIMIT 1 OFFSET ?)",
+                (key, idx),
+            )])
+            return messages.pop(idx)
+
+    def delete_last_message(self, key: str) -> Optional[ChatMessage]:
+        """Delete last message for a key."""
+        with self._cache_lock:
+            messages = self._history(key)
+            if not messages:
+                return None
+            self._writer.submit([(
+                "DELETE FROM messages WHERE id ="
+                " (SELECT id FROM messages WHERE chat_key = ? ORDER BY id DESC LIMIT 1)",
+                (key,),
+            )])
+            return messages.pop()
+
+    def get_keys(self) -> List[str]:
+        """Get all keys."""
+        self._writer.flush()
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT chat_key FROM messages").fetchall()
+        return [row[0] for row in rows]
+
+    def persist(self, persist_path: Optional[str] = None, **kwargs) -> None:
+        """Kept for SimpleChatStore compatibility: waits until queued writes are applied."""
+        self._writer.flush()
+
+    def close(self) -> None:
+        """Applies queued writes and closes the database."""
+        self._writer.close()
+        with self._lock:
+            self._conn.close()
+
+    def migrate_from_json(self, json_path: str) -> int:
+        """
+        Imports a SimpleChatStore JSON file once. The migration is recorded in
+        the database, and the JSON file is renamed so it is never re-read.
+        The record is checked again inside the transaction, so when several
+        processes start at once only one of them imports the file.
+
+        Returns:
+            int: Number of imported messages.
+        """
+        with self._lock:
+            done = self._conn.execute(
+                "SELECT 1 FROM migrations WHERE name = ?", (json_path,)
+            ).fetchone()
+        if done or not os.path.exists(json_path) or os.path.getsize(json_path) == 0:
+            return 0
+
+        try:
+            legacy = SimpleChatStore.from_persist_path(json_path)
+        except (json.JSONDecodeError, ValueError) as e:
+            logger.warning(f"Could not decode JSON from {json_path}: {e}. Skipping migration.")
+            return 0
+
+        rows = [
+            (key, _dump(message))
+            for key in legacy.get_keys()
+            for message in legacy.get_messages(key)
+        ]
+        self._writer.flush()
+        with self._cache_lock, self._lock:
+            self._cache.clear()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._conn.execute("SELECT 1 FROM migrations WHERE name = ?", (json_path,)).fetchone():
+                    self._conn.execute("ROLLBACK")
+                    return 0  # migrated by another process since the first check
+                self._conn.executemany(
+                    "INSERT INTO messages (chat_key, message) VALUES (?, ?)", rows
+                )
+                self._conn.execute("INSERT INTO migrations (name) VALUES (?)", (json_path,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        os.replace(json_path, json_path + ".migrated")
+        logger.success(f"Migrated {len(rows)} messages from {json_path} to {self.db_path}.")
+        return len(rows)
@@ -1,40 +1,46 @@
 # src/conversation_engine.py
-import os
-import json
+import threading
+from typing import List, Optional
 from datetime import datetime
 from loguru import logger
 import streamlit as st
-from llama_index.core import load_index_from_storage, StorageContext, Settings
-from llama_index.core.memory import ChatMemoryBuffer
 from llama_index.core.tools import QueryEngineTool, ToolMetadata, FunctionTool
-from llama_index.core.storage.chat_store import SimpleChatStore
-from llama_index.llms.gemini import Gemini
 from llama_index.core.agent import ReActAgent  # Changed agent class to ReActAgent
-from src.global_settings import INDEX_STORAGE, CONVERSATION_FILE, SCORES_FILE
-from src.prompts import CUSTORM_AGENT_SYSTEM_TEMPLATE
-import openai # Retained, as the OpenAIAgent might rely on global OpenAI config, though ReActAgent is preferred here.
+from llama_index.core.chat_engine import SimpleChatEngine
+from src.global_settings import CONVERSATION_FILE, CHAT_STORE_DB, ROUTER_ENABLED
+from src.intent_router import RoutedAgent
+from src.chat_store import SQLiteChatStore
+from src.summary_memory import RollingSummaryMemory
+from src.providers import MissingAPIKeyError
+from src.resource_registry import get_registry
+from src.score_ledger import get_score_ledger
+from src.prompts import CUSTORM_AGENT_SYSTEM_TEMPLATE, CUSTORM_SMALL_TALK_SYSTEM_TEMPLATE
+from src.tracing import traced
 
-def load_chat_store() -> SimpleChatStore:
+_chat_store: Optional[SQLiteChatStore] = None
+_chat_store_lock = threading.Lock()
+
+@traced()
+def load_chat_store() -> SQLiteChatStore:
     """
-    Loads chat history from a JSON file. If the file is not found or is empty,
-    it initializes a new SimpleChatStore.
+    Returns the process-wide chat store backed by CHAT_STORE_DB.
+    On first use the legacy CONVERSATION_FILE JSON is migrated into it once.
+    Messages are read per user key, so nothing is deserialized up front.
     """
-    if os.path.exists(CONVERSATION_FILE) and os.path.getsize(CONVERSATION_FILE) > 0:
-        try:
-            chat_store: SimpleChatStore = SimpleChatStore.from_persist_path(CONVERSATION_FILE)
-            logger.info("Chat store loaded successfully.")
-        except json.JSONDecodeError:
-            logger.warning(f"Could not decode JSON from {CONVERSATION_FILE}. Initializing a new chat store.")
-            chat_store = SimpleChatStore()
-    else:
-        logger.info("No existing chat history found. Initializing a new chat store.")
-        chat_store = SimpleChatStore()
-    
-    return chat_store
+    global _chat_store
+    if _chat_store is None:
+        with _chat_store_lock:
+            if _chat_store is None:
+                chat_store = SQLiteChatStore(db_path=CHAT_STORE_DB)
+                chat_store.migrate_from_json(CONVERSATION_FILE)
+                logger.info("Chat store loaded successfully.")
+                _chat_store = chat_store
+    return _chat_store
 
-def save_score(score: str, content: str, total_guess: str, usename: str):
+@traced()
+def save_score(score: str, content: str, total_guess: str, usename: str) -> str:
     """
-    Writes a new score entry to the scores.json file.
+    Writes a new score entry to the score ledger.
     
     Args:
         score (str): Score of the user's mental health.
@@ -43,111 +49,113 @@ def save_score(score: str, content: str, total_guess: str, usename: str):
         usename (str): The user's username.
     """
     current_time: str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    new_entry: dict = {
-        "usename": usename,
-        "Time": current_time,
-        "Score": score,
-        "Content": content,
-        "Total guess": total_guess
-    }
-    
-    try:
-        if os.path.exists(SCORES_FILE) and os.path.getsize(SCORES_FILE) > 0:
-            with open(SCORES_FILE, "r") as f:
-                data: list = json.load(f)
-        else:
-            data = []
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        logger.error(f"Error loading scores file: {e}. Starting with an empty list.")
-        data = []
+    # Queued on the ledger's background writer so the chat turn is not blocked.
+    get_score_ledger().submit(
+        username=usename,
+        time=current_time,
+        score=score,
+        content=content,
+        total_guess=total_guess
+    )
+    logger.info(f"New score for user '{usename}' queued for saving.")
+    return f"Score '{score}' saved for user '{usename}' at {current_time}."
 
-    data.append(new_entry)
+def create_agent(
+    llm, query_engine, chat_store: SQLiteChatStore, username: str, user_info: str = "",
+    route_small_talk: bool = ROUTER_ENABLED
+):
+    """
+    Builds the ReAct agent of one user around the shared LLM and dsm5 query engine.
 
-    try:
-        with open(SCORES_FILE, "w") as f:
-            json.dump(data, f, indent=4)
-        logger.info(f"New score for user '{usename}' saved successfully.")
-    except Exception as e:
-        logger.error(f"Failed to save score to file: {e}")
+    Args:
+        llm: The LLM driving the agent.
+        query_engine: The query engine behind the dsm5 tool.
+        chat_store (SQLiteChatStore): The chat store for managing conversation history.
+        username (str): The user whose history is used as memory.
+        user_info (str): Additional information about the user for the system prompts.
+        route_small_talk (bool): Answer small talk with one direct LLM call instead of the agent.
+
+    Returns:
+        The configured chat agent: a RoutedAgent with route_small_talk, otherwise the ReActAgent.
+    """
+    # Per-user memory is the only thing built for every session. Older turns are
+    # compacted into a stored running summary, so the prompt stays bounded.
+    memory: RollingSummaryMemory = RollingSummaryMemory.from_defaults(
+        chat_store=chat_store,
+        chat_store_key=username,
+        llm=llm
+    )
+
+    dsm5_tool: QueryEngineTool = QueryEngineTool(
+        query_engine=query_engine,
+        metadata=ToolMetadata(
+            name="dsm5",
+            description=(
+                "Cung cấp các thông tin liên quan đến các bệnh "
+                "tâm thần theo tiêu chuẩn DSM5. Sử dụng câu hỏi văn bản thuần túy chi tiết làm đầu vào cho công cụ"
+            ),
+        )
+    )
+
+    save_tool: FunctionTool = FunctionTool.from_defaults(fn=save_score)
+
+    # Initialize the ReActAgent (compatible with Gemini)
+    # ReActAgent doesn't take 'system_prompt'; the instructions go into its ReAct system header as context
+    agent = ReActAgent.from_tools(
+        tools=[dsm5_tool, save_tool],
+        llm=llm,
+        memory=memory,
+        verbose=True,
+        context=CUSTORM_AGENT_SYSTEM_TEMPLATE.format(user_info=user_info or ""),
+    )
+    if not route_small_talk:
+        return agent
+
+    # Greetings and check-ins (Step 1 of the system prompt) need no tools: one LLM call over the same
+    # memory, with only the Step 1 instructions, so it never attempts the diagnosis or score steps
+    small_talk_engine = SimpleChatEngine.from_defaults(
+        llm=llm,
+        memory=memory,
+        system_prompt=CUSTORM_SMALL_TALK_SYSTEM_TEMPLATE.format(user_info=user_info or "")
+    )
+    return RoutedAgent(agent, small_talk_engine)
 
-def initialize_chatbox(chat_store: SimpleChatStore, username: str, user_info: str):
+@traced()
+def initialize_chatbox(chat_store: SQLiteChatStore, username: str, user_info: str):
     """
     Initializes and returns a chat agent with access to a document index and a scoring tool.
     
     Args:
-        chat_store (SimpleChatStore): The chat store for managing conversation history.
+        chat_store (SQLiteChatStore): The chat store for managing conversation history.
         username (str): The current user's username.
         user_info (str): Additional information about the user for context.
         
     Returns:
-        ReActAgent: The configured chat agent.
+        The configured chat agent (see create_agent).
     """
     try:
-        # Access API key from Streamlit secrets (safe inside the Streamlit context)
-        try:
-            google_api_key = st.secrets.google.GOOGLE_API_KEY
-        except AttributeError:
-            logger.error("Google API key not found in Streamlit secrets. Cannot initialize chat.")
-            st.error("API keys are not configured. Please contact the administrator.")
-            return None
-        
-        # Set up LlamaIndex LLM instance
-        llm_instance = Gemini(
-            model="gemini-1.5-flash", # Corrected model name format
-            temperature=0.2, 
-            api_key=google_api_key
-        )
-        Settings.llm = llm_instance # Set global LLM
+        # Shared, process-wide LLM, index and query engine (loaded once, reloaded on change).
+        # The provider looks up its API key in the environment or Streamlit secrets on first use.
+        resources = get_registry().get()
+        llm_instance = resources.llm
 
-        memory: ChatMemoryBuffer = ChatMemoryBuffer.from_defaults(
-            token_limit=3000,
-            chat_store=chat_store,
-            chat_store_key=username
-        )
-        
-        storage_context: StorageContext = StorageContext.from_defaults(
-            persist_dir=INDEX_STORAGE
-        )
-
-        index = load_index_from_storage(
-            storage_context, index_id="vector"
-        )
-        logger.info("Index loaded from storage.")
-
-        dsm5_engine = index.as_query_engine(
-            similarity_top_k=3
-        )
-
-        dsm5_tool: QueryEngineTool = QueryEngineTool(
-            query_engine=dsm5_engine,
-            metadata=ToolMetadata(
-                name="dsm5",
-                description=(
-                    "Cung cấp các thông tin liên quan đến các bệnh "
-                    "tâm thần theo tiêu chuẩn DSM5. Sử dụng câu hỏi văn bản thuần túy chi tiết làm đầu vào cho công cụ"
-                ),
-            )
-        )
-
-        save_tool: FunctionTool = FunctionTool.from_defaults(fn=save_score)
-
-        # Initialize the ReActAgent (compatible with Gemini)
-        agent = ReActAgent.from_tools(
-            tools=[dsm5_tool, save_tool],
-            llm=llm_instance,
-            memory=memory,
-            verbose=True,
-            # Note: ReActAgent doesn't take 'system_prompt' directly; it should be part of the initial chat history or prompt template.
-            # Using the system prompt to seed the chat history might be necessary for full effect.
-        )
-        
-        # Manually setting system instruction for ReActAgent is often done via chat history or LLM prompt template
-        # For simplicity, we assume the CUSTORM_AGENT_SYSTEM_TEMPLATE content will be part of the first prompt by the user or pre-appended in a more complex setup.
-        
+        agent = create_agent(llm_instance, resources.query_engine, chat_store, username, user_info)
         logger.info("Chat agent initialized.")
         return agent
 
+    except MissingAPIKeyError as e:
+        logger.error(f"{e} Set GOOGLE_API_KEY in the environment or Streamlit secrets. Cannot initialize chat.")
+        st.error("API keys are not configured. Please contact the administrator.")
+        return None
     except Exception as e:
         logger.error(f"Failed to initialize chatbox: {e}")
         st.error("An error occurred while initializing the chat service. Please try again later.")
-        return None
\ No newline at end of file
+        return None
+
+def get_saved_scores(response) -> List[str]:
+    """Returns the scores the agent saved with the save_score tool during a turn."""
+    return [
+        source.raw_input["kwargs"]["score"]
+        for source in response.sources
+        if source.tool_name == "save_score" and "score" in source.raw_input.get("kwargs", {})
+    ]
@@ -0,0 +1,90 @@
+# src/dedup.py
+import re
+import zlib
+from typing import Any, Dict, List, Sequence, Tuple
+import numpy as np
+from loguru import logger
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.schema import BaseNode, MetadataMode, TransformComponent
+from src.global_settings import DEDUP_THRESHOLD, DEDUP_NUM_PERM, DEDUP_SHINGLE_SIZE
+
+_WORD = re.compile(r"\w+")
+_PRIME = (1 << 31) - 1
+
+
+def lsh_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """(bands, rows) with bands * rows <= num_perm whose LSH threshold (1/bands)^(1/rows) is closest to threshold."""
+    return min(
+        ((bands, num_perm // bands) for bands in range(1, num_perm + 1)),
+        key=lambda option: abs((1 / option[0]) ** (1 / option[1]) - threshold)
+    )
+
+
+class MinHashDeduplicator(TransformComponent):
+    """
+    Drops near-duplicate chunks (repeated boilerplate, the same passage in two
+    files) before any summary or embedding work is spent on them.
+
+    Each chunk is reduced to a MinHash signature of its word shingles; LSH
+    banding finds candidate pairs without comparing every pair, and a
+    candidate is dropped when the estimated Jaccard similarity with an earlier
+    kept chunk reaches `threshold`. The first occurrence is kept.
+
+    Chunks are only compared within the same heading path
+    (`metadata["section"]`, set by the hierarchical parser): the same
+    criterion text under two disorders is not a duplicate, and a leaf is
+    never dropped in favour of one under another parent.
+    """
+
+    threshold: float = Field(default=DEDUP_THRESHOLD, gt=0, le=1)
+    num_perm: int = Field(default=DEDUP_NUM_PERM, gt=0)
+    shingle_size: int = Field(default=DEDUP_SHINGLE_SIZE, gt=0)
+    seed: int = 1
+    _dropped: int = PrivateAttr(default=0)
+    _permutations: Any = PrivateAttr(default=None)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MinHashDeduplicator"
+
+    @property
+    def dropped(self) -> int:
+        """Chunks dropped by the last call."""
+        return self._dropped
+
+    def signature(self, text: str) -> np.ndarray:
+        """MinHash signature of the word shingles of a text."""
+        words = _WORD.findall(text.lower())
+        size = min(self.shingle_size, len(words)) or 1
+        shingles = {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64)
+        if self._permutations is None:
+            # Universal hashes (a * x + b) mod p, all below 2^31 so products fit in uint64
+            rng = np.random.default_rng(self.seed)
+            self._permutations = (
+                rng.integers(1, _PRIME, self.num_perm, dtype=np.uint64)[:, None],
+                rng.integers(0, _PRIME, self.num_perm, dtype=np.uint64)[:, None],
+            )
+        a, b = self._permutations
+        return ((a * (hashes[None, :] % _PRIME) + b) % _PRIME).min(axis=1)
+
+    def __call__(self, nodes: Sequence[BaseNode], **kwargs: Any) -> List[BaseNode]:
+        bands, rows = lsh_bands(self.num_perm, self.threshold)
+        buckets: List[Dict[Tuple[str, bytes], List[int]]] = [{} for _ in range(bands)]
+        kept: List[BaseNode] = []
+        signatures: List[np.ndarray] = []
+        for node in nodes:
+            signature = self.signature(node.get_content(metadata_mode=MetadataMode.NONE))
+            section = str(node.metadata.get("section", ""))
+            keys = [(section, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(bands)]
+            candidates = {i for band, key in enumerate(keys) for i in buckets[band].get(key, ())}
+            if any(np.mean(signatures[i] == signature) >= self.threshold for i in candidates):
+                continue
+            for band, key in enumerate(keys):
+                buckets[band].setdefault(key, []).append(len(kept))
+            kept.append(node)
+            signatures.append(signature)
+
+        self._dropped = len(nodes) - len(kept)
+        logger.info(f"[dedup] dropped {self._dropped} of {len(nodes)} chunks as near-duplicates.")
+        return kept
@@ -1,8 +1,48 @@
 # global_settings.py
 
+# Model providers, imported and constructed on first use by src/providers.py: "gemini" or "mock"
+LLM_PROVIDER = "gemini"
+CHAT_LLM_MODEL = "gemini-1.5-flash"
+INGEST_LLM_MODEL = "gemini-2.0-flash"
+EMBED_MODEL = "embedding-001"
+
+# Model gateway (src/model_gateway.py): every LLM and embedding call of a process shares one rate
+# limit, chat ahead of ingestion, and concurrent query embeddings are sent as micro-batches.
+# The limits are per process; each chat worker of serve.py has its own gateway.
+GATEWAY_ENABLED = True
+GATEWAY_REQUESTS_PER_MINUTE = 600
+GATEWAY_TOKENS_PER_MINUTE = 4000000
+GATEWAY_CHAT_RESERVE = 0.2  # share of the request burst ingestion leaves free for chat
+GATEWAY_BATCH_WINDOW_MS = 10  # how long a query embedding waits for others to batch with
+GATEWAY_MAX_BATCH_SIZE = 32
+GATEWAY_MAX_RETRIES = 3
+
 # Cache files
-CACHE_FILE = "data/cache/pipeline_cache.json"
-CONVERSATION_FILE = "data/cache/chat_history.json"
+CACHE_FILE = "data/cache/pipeline_cache.db"
+INGEST_CACHE_MAX_MB = 512
+
+# Semantic answer cache in front of the dsm5 query engine
+SEMANTIC_CACHE_DB = "data/cache/semantic_cache.db"
+SEMANTIC_CACHE_THRESHOLD = 0.92  # cosine similarity needed to reuse an answer
+SEMANTIC_CACHE_TTL_SECONDS = 7 * 24 * 3600
+SEMANTIC_CACHE_MAX_ENTRIES = 2000
+CONVERSATION_FILE = "data/cache/chat_history.json"  # legacy, migrated into CHAT_STORE_DB
+CHAT_STORE_DB = "data/cache/chat_history.db"
+CHAT_STORE_CACHE_KEYS = 1000  # user histories kept in memory per process, least recently used dropped first
+
+# Chat memory: prompt budget for history, and when older turns are compacted into a running summary.
+# The summary plus the unsummarized history must fit the limit: TRIGGER + SUMMARY <= LIMIT.
+MEMORY_TOKEN_LIMIT = 3000
+MEMORY_SUMMARY_TOKENS = 600  # length asked of the running summary
+MEMORY_SUMMARY_TRIGGER_TOKENS = 2400  # unsummarized history size that triggers compaction
+MEMORY_RECENT_TOKENS = 1500  # most recent history always kept verbatim
+
+# Chat routing (src/intent_router.py): small talk (greetings, thanks, check-ins) gets one direct
+# LLM call with the chat memory instead of the ReAct agent. Anything uncertain goes to the agent.
+ROUTER_ENABLED = True
+ROUTER_MAX_WORDS = 12  # longer messages always go to the agent
+ROUTER_MIN_SIMILARITY = 0.45  # to the nearest small-talk example
+ROUTER_MARGIN = 0.1  # over the nearest agent example
 
 # Storage paths
 STORAGE_PATH = "data/ingestion_storage/"
@@ -10,7 +50,80 @@ FILES_PATH = [
     "data/dsm5.docx"
 ]
 INDEX_STORAGE = "data/index_storage"
+INDEX_MANIFEST = "data/index_storage/manifest.json"  # content hash and doc ids per indexed file
+LEXICAL_INDEX_FILE = "data/index_storage/lexical_index.npz"  # BM25 inverted index over the same nodes
+MMAP_STORE_DIR = "data/index_storage/mmap"  # binary export of vectors and nodes mapped by the chat workers
+
+# Chunking: "flat" 512-token chunks, or "hierarchical" heading-aware section → block (criterion) → leaf
+# nodes. Only leaves are indexed; a parent replaces its leaves at retrieval time once more than
+# AUTO_MERGE_RATIO of them are retrieved. Changing the mode rebuilds the index.
+CHUNKING_MODE = "hierarchical"
+HIERARCHY_CHUNK_SIZES = (2048, 512, 128)  # token limits of sections, blocks and leaves
+AUTO_MERGE_RATIO = 0.5
+AUTO_MERGE_LEAF_TOP_K = 6  # leaves retrieved before merging
+
+# dsm5 retrieval: nodes sent to synthesis, candidates per retriever and reciprocal rank fusion constant
+SIMILARITY_TOP_K = 3
+HYBRID_CANDIDATES = 10
+RRF_K = 60
+
+# Optional reranking: retrieve RERANK_CANDIDATES nodes and keep the SIMILARITY_TOP_K best.
+# A cross-encoder saved at RERANKER_MODEL_PATH is used if present, lexical overlap otherwise.
+RERANK_ENABLED = False
+RERANK_CANDIDATES = 12
+RERANKER_MODEL_PATH = "data/models/reranker"
+
+# Ingestion throughput: worker count, embedding batch size and provider rate limits
+INGEST_WORKERS = 4
+EMBED_BATCH_SIZE = 64
+INGEST_REQUESTS_PER_MINUTE = 60
+INGEST_TOKENS_PER_MINUTE = 1000000
+INGEST_MAX_RETRIES = 5
+
+# Ingestion summaries of the embedded chunks, the leaves in hierarchical mode: "llm" (one
+# SummaryExtractor call per chunk), "local" (extractive TF-IDF sentences, no LLM) or "none"
+SUMMARY_MODE = "llm"
+LOCAL_SUMMARY_SENTENCES = 2
+
+# Near-duplicate chunks are dropped before summaries and embeddings (MinHash over word shingles + LSH)
+DEDUP_ENABLED = True
+DEDUP_THRESHOLD = 0.9  # estimated Jaccard similarity at which a chunk counts as a duplicate
+DEDUP_NUM_PERM = 128
+DEDUP_SHINGLE_SIZE = 5  # words
+
+# Vector store backend: "binary" (NumPy arrays, memory-mapped on load), "simple" (in-memory,
+# persisted as JSON) or "chroma" (persistent HNSW). A "simple" JSON store is converted to
+# "binary" the first time it is loaded.
+VECTOR_STORE_BACKEND = "binary"
+# Matrix of the binary store and the mmap export: "float32", "float16" (half the size, same top-k
+# in practice) or "int8" (a quarter of the size and the fastest scan, slightly lower recall)
+VECTOR_STORE_DTYPE = "float16"
+CHROMA_PATH = "data/chroma"
+CHROMA_COLLECTION = "dsm5"
+
+# Headless chat service (serve.py): worker processes behind one HTTP port; users are pinned
+# to a worker by username. With CHAT_API_URL set, the chat page is a client of the service.
+CHAT_API_URL = ""  # e.g. "http://127.0.0.1:8600"
+CHAT_API_HOST = "127.0.0.1"
+CHAT_API_PORT = 8600
+CHAT_WORKERS = 4
+CHAT_API_TIMEOUT = 120  # seconds a client waits for the next streamed event
+CHAT_WORKER_DRAIN_TIMEOUT = 60  # seconds a stopping worker lets running turns finish
+
+# Evaluation: generated questions, per-question checkpoint and report
+EVAL_QUESTIONS_FILE = "data/eval/questions.json"
+EVAL_RESULTS_FILE = "data/eval/results.jsonl"
+EVAL_REPORT_FILE = "data/eval/report.csv"
+EVAL_WORKERS = 4
+
+# Tracing: metrics exported per process, and an optional Prometheus endpoint (0 disables it)
+METRICS_DIR = "data/metrics"
+METRICS_EXPORT_INTERVAL = 10  # seconds
+METRICS_PORT = 0
 
 # User data files
-SCORES_FILE = "data/user_storage/scores.json"
-USERS_FILE = "data/user_storage/users.yaml"
+SCORES_FILE = "data/user_storage/scores.json"  # legacy, imported into SCORES_DB
+SCORES_DB = "data/user_storage/scores.db"
+USERS_FILE = "data/user_storage/users.yaml"  # legacy, imported into USERS_DB
+USERS_DB = "data/user_storage/users.db"
+USER_CACHE_TTL_SECONDS = 5  # how long a process reuses a profile before reading other processes' updates
@@ -0,0 +1,211 @@
+# src/hierarchical_parser.py
+import re
+import zipfile
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from xml.etree import ElementTree
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.node_parser import NodeParser, SentenceSplitter
+from llama_index.core.readers.base import BaseReader
+from llama_index.core.schema import BaseNode, Document, NodeRelationship, TextNode
+from llama_index.core.utils import get_tokenizer
+from src.global_settings import HIERARCHY_CHUNK_SIZES
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_HEADING_STYLE = re.compile(r"^(?:heading\s*(\d)|title)$", re.IGNORECASE)
+_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+# DSM-5 criteria start a paragraph with a capital letter and a dot: "A. Five (or more) of ..."
+_CRITERION = re.compile(r"^\s*[A-Z]\.\s+\S")
+
+# (text, children) pairs; a leaf has no children
+Tree = Tuple[str, List["Tree"]]
+
+
+class DocxHeadingReader(BaseReader):
+    """
+    Reads a .docx as Markdown-style text, keeping the structure docx2txt drops:
+    paragraphs with a Title/Heading style or an outline level become "#"
+    headings of that level, and table rows become " | "-joined lines.
+    """
+
+    def load_data(self, file, extra_info: Optional[Dict] = None, **kwargs: Any) -> List[Document]:
+        with zipfile.ZipFile(file) as archive:
+            styles = self._heading_styles(archive)
+            body = ElementTree.fromstring(archive.read("word/document.xml")).find(f"{_W}body")
+        lines = []
+        for element in body:
+            if element.tag == f"{_W}p":
+                line = self._text(element).strip()
+                level = self._heading_level(element, styles)
+                if line and level:
+                    line = "#" * level + " " + line.replace("\n", " ")
+            elif element.tag == f"{_W}tbl":
+                line = "\n".join(
+                    " | ".join(self._text(cell).strip() for cell in row.iter(f"{_W}tc"))
+                    for row in element.iter(f"{_W}tr")
+                )
+            else:
+                continue
+            if line.strip():
+                lines.append(line)
+        return [Document(text="\n".join(lines), metadata=extra_info or {})]
+
+    @staticmethod
+    def _heading_styles(archive: zipfile.ZipFile) -> Dict[str, int]:
+        """Heading level of every paragraph style id, from its name ("heading 2") or its outline level."""
+        if "word/styles.xml" not in archive.namelist():
+            return {}
+        levels = {}
+        for style in ElementTree.fromstring(archive.read("word/styles.xml")).iter(f"{_W}style"):
+            style_id = style.get(f"{_W}styleId")
+            name = style.find(f"{_W}name")
+            match = _HEADING_STYLE.match(name.get(f"{_W}val", "")) if name is not None else None
+            outline = style.find(f"{_W}pPr/{_W}outlineLvl")
+            if match:
+                levels[style_id] = min(int(match.group(1) or 1), 6)
+            elif outline is not None and int(outline.get(f"{_W}val", 9)) < 9:
+                levels[style_id] = min(int(outline.get(f"{_W}val")) + 1, 6)
+        return levels
+
+    @staticmethod
+    def _heading_level(paragraph, styles: Dict[str, int]) -> int:
+        outline = paragraph.find(f"{_W}pPr/{_W}outlineLvl")
+        if outline is not None and int(outline.get(f"{_W}val", 9)) < 9:
+            return min(int(outline.get(f"{_W}val")) + 1, 6)
+        style = paragraph.find(f"{_W}pPr/{_W}pStyle")
+        return styles.get(style.get(f"{_W}val"), 0) if style is not None else 0
+
+    @staticmethod
+    def _text(element) -> str:
+        parts = []
+        for child in element.iter():
+            if child.tag == f"{_W}t" and child.text:
+                parts.append(child.text)
+            elif child.tag == f"{_W}tab":
+                parts.append("\t")
+            elif child.tag in (f"{_W}br", f"{_W}cr"):
+                parts.append("\n")
+            elif child.tag == f"{_W}p" and parts:
+                parts.append(" ")  # paragraphs inside a table cell
+        return "".join(parts)
+
+
+def iter_sections(text: str) -> Iterator[Tuple[str, str]]:
+    """Yields (heading path, body) for every Markdown heading with text under it."""
+    path: List[Tuple[int, str]] = []
+    body: List[str] = []
+
+    def section():
+        text = "\n".join(body).strip()
+        return (" > ".join(title for _, title in path), text) if text else None
+
+    for line in text.splitlines():
+        heading = _HEADING.match(line)
+        if not heading:
+            body.append(line)
+            continue
+        current = section()
+        if current:
+            yield current
+        level = len(heading.group(1))
+        path = [entry for entry in path if entry[0] < level] + [(level, heading.group(2))]
+        body = []
+    current = section()
+    if current:
+        yield current
+
+
+class HeadingHierarchyParser(NodeParser):
+    """
+    Splits documents along their heading structure into a node hierarchy:
+    sections (the text under one heading, e.g. the diagnostic criteria of a
+    disorder) → blocks (one lettered criterion, or a few paragraphs) → leaves
+    (sentence-aligned chunks). A node with a single child is collapsed into it,
+    so a short criterion is a leaf itself.
+
+    Every node carries its heading path in `metadata["section"]`. Parents and
+    children are linked, and so are consecutive siblings, for an
+    AutoMergingRetriever to return a whole criterion or section when enough
+    of its leaves match. Only the leaves are meant to be embedded and indexed.
+    """
+
+    chunk_sizes: List[int] = Field(
+        default_factory=lambda: list(HIERARCHY_CHUNK_SIZES),
+        description="Token limits of the section, block and leaf nodes."
+    )
+    chunk_overlap: int = Field(default=20, ge=0, description="Token overlap of consecutive leaves.")
+    include_prev_next_rel: bool = Field(
+        default=False, description="Siblings are linked by the parser; links across levels would be wrong."
+    )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "HeadingHierarchyParser"
+
+    def _parse_nodes(self, nodes: Sequence[BaseNode], show_progress: bool = False, **kwargs: Any) -> List[BaseNode]:
+        tokenizer = get_tokenizer()
+        count = lambda text: len(tokenizer(text))
+        section_size, block_size, leaf_size = self.chunk_sizes
+        block_splitter = SentenceSplitter(chunk_size=block_size, chunk_overlap=self.chunk_overlap)
+        leaf_splitter = SentenceSplitter(chunk_size=leaf_size, chunk_overlap=self.chunk_overlap)
+
+        parsed: List[BaseNode] = []
+        for document in nodes:
+            for path, body in iter_sections(document.get_content()):
+                blocks = self._blocks(body, block_size, count, block_splitter)
+                for part in self._pack(blocks, section_size, count):
+                    tree = ("\n".join(part), [
+                        (block, [(leaf, []) for leaf in leaf_splitter.split_text(block)]) for block in part
+                    ])
+                    self._emit(tree, document, path, None, parsed)
+        return parsed
+
+    def _blocks(self, body: str, block_size: int, count: Callable[[str], int], splitter: SentenceSplitter) -> List[str]:
+        """A block per lettered criterion (with its numbered items) and per run of plain paragraphs, within block_size."""
+        groups: List[List[str]] = [[]]
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            if _CRITERION.match(line) and groups[-1]:
+                groups.append([])
+            groups[-1].append(line)
+        blocks = []
+        for group in groups:
+            pieces = [piece for line in group for piece in (splitter.split_text(line) if count(line) > block_size else [line])]
+            blocks.extend("\n".join(chunk) for chunk in self._pack(pieces, block_size, count))
+        return blocks
+
+    @staticmethod
+    def _pack(pieces: List[str], limit: int, count: Callable[[str], int]) -> List[List[str]]:
+        """Greedily groups consecutive pieces into runs of at most `limit` tokens."""
+        runs, tokens = [], 0
+        for piece in pieces:
+            size = count(piece)
+            if not runs or tokens + size > limit:
+                runs.append([])
+                tokens = 0
+            runs[-1].append(piece)
+            tokens += size
+        return runs
+
+    def _emit(self, tree: Tree, document: BaseNode, path: str, parent: Optional[TextNode], parsed: List[BaseNode]) -> TextNode:
+        text, children = tree
+        while len(children) == 1:
+            text, children = children[0]
+        node = TextNode(
+            text=text,
+            metadata={"section": path} if path else {},
+            excluded_embed_metadata_keys=list(document.excluded_embed_metadata_keys),
+            excluded_llm_metadata_keys=list(document.excluded_llm_metadata_keys),
+            relationships={NodeRelationship.SOURCE: document.as_related_node_info()},
+        )
+        if parent is not None:
+            node.relationships[NodeRelationship.PARENT] = parent.as_related_node_info()
+        parsed.append(node)
+
+        child_nodes = [self._emit(child, document, path, node, parsed) for child in children]
+        if child_nodes:
+            node.relationships[NodeRelationship.CHILD] = [child.as_related_node_info() for child in child_nodes]
+        for previous, following in zip(child_nodes, child_nodes[1:]):
+            previous.relationships[NodeRelationship.NEXT] = following.as_related_node_info()
+            following.relationships[NodeRelationship.PREVIOUS] = previous.as_related_node_info()
+        return node
@@ -1,46 +1,72 @@
 # src/index_builder.py 
 from llama_index.core import VectorStoreIndex, load_index_from_storage # Corrected Load_index_from_storage capitalization
-from llama_index.core import StorageContext
+from llama_index.core.node_parser import get_leaf_nodes
 from src.global_settings import INDEX_STORAGE
+from src.vector_store import create_storage_context, reset_vector_store
 from loguru import logger 
+from src.tracing import traced
 # Note: Corrected the import capitalization from Load_index_from_storage to load_index_from_storage
 
-def build_indexes(nodes):
+@traced()
+def build_indexes(nodes, stale_ref_doc_ids=None, rebuild: bool = False):
     """
-    Builds or loads a vector store index and persists it to disk.
+    Updates the persisted vector store index with new nodes, or builds it from scratch.
+    Only leaf nodes are embedded into the vector store; parent nodes of a
+    hierarchical split are stored in the docstore alone, for auto-merging.
+    Leaves are kept in the docstore too, even with backends that store text
+    (Chroma), since the lexical index and hybrid retrieval read them from there.
+
+    Args:
+        nodes: Nodes of new or changed documents.
+        stale_ref_doc_ids (list): Documents whose nodes are deleted from the
+            docstore and vector store before the new nodes are inserted.
+        rebuild (bool): Ignore the stored index and build a new one from `nodes`.
     """
     vector_index = None
-    try:
-        # Try to load existing index
-        storage_context = StorageContext.from_defaults(
+    leaves = get_leaf_nodes(nodes)
+    parents = [node for node in nodes if node.child_nodes]
+    if not rebuild:
+        # Incremental update of the existing index
+        storage_context = create_storage_context(
             persist_dir = INDEX_STORAGE
         )
         vector_index = load_index_from_storage(
-           storage_context, index_id = "vector"
+           storage_context, index_id = "vector", store_nodes_override = True
         )
-
         logger.info("All indices loaded from storage.")
-    except Exception as e:
-        logger.warning(f"Error occurred while loading indices: {e}. Building new index.")
-        
-        # --- CORRECTION APPLIED HERE ---
-        # Changed 'from_dafaults()' to 'from_defaults()'
-        storage_context = StorageContext.from_defaults()
-        # --- END OF CORRECTION ---
-        
+
+        for ref_doc_id in stale_ref_doc_ids or []:
+            # Parent nodes are in the docstore only; drop them first, the index struct doesn't know them
+            ref_doc_info = storage_context.docstore.get_ref_doc_info(ref_doc_id)
+            for node_id in list(ref_doc_info.node_ids if ref_doc_info else []):
+                if node_id not in vector_index.index_struct.nodes_dict:
+                    storage_context.docstore.delete_document(node_id, raise_error = False)
+            vector_index.delete_ref_doc(ref_doc_id, delete_from_docstore = True)
+        if leaves:
+            vector_index.insert_nodes(leaves)
+        storage_context.docstore.add_documents(parents)
+        logger.info(f"Removed {len(stale_ref_doc_ids or [])} documents and inserted {len(nodes)} nodes.")
+    else:
+        logger.info("Building new index.")
+        # Start from an empty backend so a rebuild never duplicates vectors
+        reset_vector_store()
+        storage_context = create_storage_context()
+
         # Build new index
+        storage_context.docstore.add_documents(parents)
         vector_index = VectorStoreIndex(
-            nodes, storage_context = storage_context
+            leaves, storage_context = storage_context, store_nodes_override = True
         )
         vector_index.set_index_id("vector")
-        
-        # Persist new index
-        try:
-            storage_context.persist(
-                persist_dir = INDEX_STORAGE
-            )
-            logger.success("New indexes created and persisted.")
-        except Exception as persist_e:
-             logger.error(f"Failed to persist new indexes: {persist_e}")
-             
-    return vector_index
\ No newline at end of file
+
+    # Persist the index
+    try:
+        storage_context.persist(
+            persist_dir = INDEX_STORAGE
+        )
+        logger.success("Indexes persisted.")
+    except Exception as persist_e:
+         logger.error(f"Failed to persist indexes: {persist_e}")
+         raise
+
+    return vector_index
@@ -0,0 +1,93 @@
+# src/index_manifest.py
+import hashlib
+import json
+import os
+from typing import Dict, List, Sequence, Tuple
+from loguru import logger
+from src.global_settings import INDEX_MANIFEST, INDEX_STORAGE, VECTOR_STORE_BACKEND, CHUNKING_MODE
+
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a file's content, read in 1 MB blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def index_exists() -> bool:
+    """Whether a persisted index is present in INDEX_STORAGE."""
+    return os.path.exists(os.path.join(INDEX_STORAGE, "index_store.json"))
+
+
+def load_manifest() -> dict:
+    """
+    Loads the manifest of indexed files: {"backend": ..., "chunking": ..., "files": {path: {"hash", "ref_doc_ids"}}}.
+    An empty manifest is returned when there is no usable index, which forces a full build.
+    """
+    empty = {"backend": VECTOR_STORE_BACKEND, "chunking": CHUNKING_MODE, "files": {}}
+    if not index_exists() or not os.path.exists(INDEX_MANIFEST):
+        return empty
+    try:
+        with open(INDEX_MANIFEST, "r") as f:
+            manifest = json.load(f)
+    except json.JSONDecodeError as e:
+        logger.warning(f"Could not decode index manifest: {e}. Rebuilding from scratch.")
+        return empty
+    # The JSON vectors of "simple" are converted when the "binary" backend first loads them
+    if manifest.get("backend") != VECTOR_STORE_BACKEND and (manifest.get("backend"), VECTOR_STORE_BACKEND) != ("simple", "binary"):
+        logger.info("Vector store backend changed. Rebuilding from scratch.")
+        return empty
+    if manifest.get("chunking", "flat") != CHUNKING_MODE:
+        logger.info("Chunking mode changed. Rebuilding from scratch.")
+        return empty
+    return manifest
+
+
+def save_manifest(manifest: dict):
+    """Writes the manifest atomically next to the persisted index."""
+    tmp_path = INDEX_MANIFEST + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(tmp_path, INDEX_MANIFEST)
+
+
+def diff_files(manifest: dict, files: Sequence[str]) -> Tuple[List[str], List[str], Dict[str, str]]:
+    """
+    Compares the content hashes of `files` against the manifest.
+
+    Returns:
+        tuple: (new or changed files, files removed since the last build, hash of every current file)
+    """
+    hashes = {path: file_hash(path) for path in files}
+    indexed = manifest["files"]
+    changed = [path for path, digest in hashes.items() if indexed.get(path, {}).get("hash") != digest]
+    removed = [path for path in indexed if path not in hashes]
+    return changed, removed, hashes
+
+
+def stale_ref_doc_ids(manifest: dict, paths: Sequence[str]) -> List[str]:
+    """Document ids whose nodes must be deleted before the given files are re-indexed."""
+    return [
+        ref_doc_id
+        for path in paths
+        for ref_doc_id in manifest["files"].get(path, {}).get("ref_doc_ids", [])
+    ]
+
+
+def update_manifest(manifest: dict, nodes, changed: Sequence[str], removed: Sequence[str], hashes: Dict[str, str]) -> dict:
+    """Records the hash and document ids of re-indexed files and drops removed ones."""
+    ref_doc_ids: Dict[str, set] = {os.path.abspath(path): set() for path in changed}
+    for node in nodes:
+        file_path = node.metadata.get("file_path")
+        if file_path and os.path.abspath(file_path) in ref_doc_ids and node.ref_doc_id:
+            ref_doc_ids[os.path.abspath(file_path)].add(node.ref_doc_id)
+
+    files = {path: entry for path, entry in manifest["files"].items() if path not in removed}
+    for path in changed:
+        files[path] = {
+            "hash": hashes[path],
+            "ref_doc_ids": sorted(ref_doc_ids[os.path.abspath(path)]),
+        }
+    return {"backend": VECTOR_STORE_BACKEND, "chunking": CHUNKING_MODE, "files": files}
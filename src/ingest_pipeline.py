@@ -1,107 +1,178 @@
 # src/ingest_pipeline.py
 
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 from llama_index.core import SimpleDirectoryReader
-from llama_index.core.ingestion import IngestionPipeline, IngestionCache
-from llama_index.core.node_parser import TokenTextSplitter
+from llama_index.core.ingestion import IngestionPipeline
+from llama_index.core.node_parser import TokenTextSplitter, get_leaf_nodes
 from llama_index.core.extractors import SummaryExtractor
-from llama_index.embeddings.gemini import GeminiEmbedding
 from llama_index.core import Settings 
-
-from llama_index.llms.gemini import Gemini
-import google.generativeai as genai
-import os # Added for environment variable access
-import streamlit as st 
 from loguru import logger # Added for logging
-from src.global_settings import STORAGE_PATH,FILES_PATH,CACHE_FILE
-from src.prompts import CUSTORM_SUMMARY_EXTRACT_TEMPLATE
-
-
-def get_google_api_key():
-    """Retrieves the Google API key from environment variable or Streamlit secrets."""
-    # 1. Try to read from environment variable (preferred for standalone scripts)
-    key = os.getenv("GOOGLE_API_KEY")
-    if key:
-        return key
-
-    # 2. Try to read from Streamlit secrets (only works when run via 'streamlit run')
-    try:
-        # Check if Streamlit is running before trying to access st.secrets
-        if st._is_running_with_streamlit:
-            key = st.secrets.google.GOOGLE_API_KEY
-            return key
-    except Exception:
-        # st.secrets access failed, which is expected when running as a standalone script
-        pass 
-        
-    return None
-
-google_api_key = get_google_api_key()
-
-if not google_api_key:
-    logger.error("GOOGLE_API_KEY not found in environment or Streamlit secrets.")
-    # Raise an error to halt execution if the key is missing during ingestion.
-    raise EnvironmentError("GOOGLE_API_KEY must be set to run the ingestion pipeline.")
-
-# Configure the underlying Google GenAI client
-genai.configure(api_key=google_api_key)
-
-# Configure LlamaIndex Settings
-Settings.llm = Gemini(
-    model="gemini-2.0-flash", # Changed back to 1.5-flash for compatibility with public API unless 2.0 is confirmed available to you
-    temperature=0.2, 
-    api_key=google_api_key
+from src.global_settings import (
+    STORAGE_PATH, FILES_PATH, CACHE_FILE, INGEST_CACHE_MAX_MB, INGEST_WORKERS, EMBED_BATCH_SIZE,
+    INGEST_REQUESTS_PER_MINUTE, INGEST_TOKENS_PER_MINUTE, INGEST_MAX_RETRIES, CHUNKING_MODE,
+    SUMMARY_MODE, DEDUP_ENABLED
 )
-Settings.embed_model = GeminiEmbedding(
-    model_name="embedding-001",
-    api_key=google_api_key
-)
-
-
-def ingest_documents():
-    """Loads documents, creates ingestion pipeline, runs transformations, and returns nodes."""
-    
+from src.dedup import MinHashDeduplicator
+from src.hierarchical_parser import DocxHeadingReader, HeadingHierarchyParser
+from src.local_summary import TfidfSummaryExtractor
+from src.ingestion_cache import SQLiteKVStore
+from src.model_gateway import GatewayEmbedding, GatewayLLM
+from src.rate_limit import TokenBucket
+from src.throttled_transform import ThrottledTransform
+from src.prompts import CUSTORM_SUMMARY_EXTRACT_TEMPLATE
+from src.tracing import get_tracer, traced
+
+
+def throttle_kwargs(model, request_bucket: TokenBucket, token_bucket: TokenBucket) -> dict:
+    """
+    Rate limit and retries of a ThrottledTransform calling `model`. A model
+    wrapped by the model gateway is already limited and retried there, so the
+    transform only bounds concurrency; otherwise its calls would be limited
+    twice and every retry would be retried again.
+    """
+    if isinstance(model, (GatewayLLM, GatewayEmbedding)):
+        return {"max_retries": 0}
+    return {"request_bucket": request_bucket, "token_bucket": token_bucket, "max_retries": INGEST_MAX_RETRIES}
+
+
+def split_documents(documents, chunking_mode: str = CHUNKING_MODE):
+    """
+    Splits documents into chunks. Module-level so it can run in worker processes;
+    the splitter is built there because it does not survive pickling.
+
+    Args:
+        documents (list): Documents to split.
+        chunking_mode (str): "flat" token chunks, or "hierarchical" section,
+            block and leaf nodes linked as parents and children.
+    """
+    if chunking_mode == "hierarchical":
+        splitter = HeadingHierarchyParser()
+    else:
+        splitter = TokenTextSplitter(
+            chunk_size= 512,
+            chunk_overlap = 20
+        )
+    return splitter.get_nodes_from_documents(documents)
+
+
+@traced()
+def ingest_documents(
+    input_files=None,
+    llm=None,
+    embed_model=None,
+    num_workers: int = INGEST_WORKERS,
+    requests_per_minute: float = INGEST_REQUESTS_PER_MINUTE,
+    tokens_per_minute: float = INGEST_TOKENS_PER_MINUTE,
+    chunking_mode: str = CHUNKING_MODE,
+    summary_mode: str = SUMMARY_MODE,
+    dedup: bool = DEDUP_ENABLED,
+):
+    """
+    Loads documents, creates ingestion pipeline, runs transformations, and returns nodes.
+
+    Splitting runs in `num_workers` processes. Near-duplicate chunks are then
+    dropped, and LLM summary extraction and embedding run as async batches
+    with at most `num_workers` in flight, under the provider rate limits, with
+    retries and throughput logging. Models wrapped by the model gateway are
+    rate limited and retried by the gateway instead. The LLM calls and embeddings saved by
+    dedup and local summaries are logged and counted by the tracer.
+
+    In "hierarchical" mode .docx headings are kept, and only the leaf nodes are
+    summarized and embedded; they also carry their heading path. The parent
+    nodes are returned with them, for the docstore.
+
+    Args:
+        input_files (list): Files to ingest. Defaults to FILES_PATH.
+        llm: LLM for the summary extractor. Defaults to Settings.llm.
+        embed_model: Embedding model. Defaults to Settings.embed_model.
+        num_workers (int): Worker count for splitting and concurrent extraction.
+        requests_per_minute (float): Provider request limit. Defaults to INGEST_REQUESTS_PER_MINUTE.
+        tokens_per_minute (float): Provider input token limit. Defaults to INGEST_TOKENS_PER_MINUTE.
+        chunking_mode (str): "flat" or "hierarchical". Defaults to CHUNKING_MODE.
+        summary_mode (str): "llm", "local" (extractive TF-IDF) or "none". Defaults to SUMMARY_MODE.
+        dedup (bool): Drop near-duplicate chunks first. Defaults to DEDUP_ENABLED.
+    """
+    llm = llm or Settings.llm
+    embed_model = embed_model or Settings.embed_model
+
+    hierarchical = chunking_mode == "hierarchical"
     documents = SimpleDirectoryReader(
-        input_files = FILES_PATH,
+        input_files = input_files or FILES_PATH,
         filename_as_id = True, 
+        file_extractor = {".docx": DocxHeadingReader()} if hierarchical else None,
     ).load_data()
 
     for doc in documents:
         logger.info(f"Loaded document ID: {doc.id_}")
 
-    # --- CORRECTION START ---
-    # Initialize the variable before the try block to ensure it always has a value
-    cached_hashes = "" 
-    
-    try:
-        # If this succeeds, it will overwrite the initial "" value
-        cache_hashes = IngestionCache.from_persist_path(
-            CACHE_FILE
-        )
-        logger.info("Cache file found. Running using cache...")
-
-    except FileNotFoundError:
-        # This is the expected exception if the cache file doesn't exist.
-        logger.info("No cache file found. Running without cache...")
-    except Exception as e:
-        # Handle unexpected errors gracefully, but proceed without cache
-        logger.warning(f"Unexpected error loading cache: {e}. Running without cache.")
-        # cached_hashes remains ""
-        
-    # --- CORRECTION END ---
-    
-    pipeline = IngestionPipeline(
-        transformations = [
-            TokenTextSplitter(
-                chunk_size= 512,
-                chunk_overlap = 20
+    # On-disk, size-bounded cache, read lazily one entry at a time
+    kv_store = SQLiteKVStore(CACHE_FILE, max_bytes = INGEST_CACHE_MAX_MB * 1024 ** 2)
+
+    # Stage 1: CPU-bound splitting, one document per worker process
+    split = partial(split_documents, chunking_mode = chunking_mode)
+    if num_workers > 1 and len(documents) > 1:
+        with ProcessPoolExecutor(max_workers = num_workers) as pool:
+            nodes = [node for batch in pool.map(split, [[doc] for doc in documents]) for node in batch]
+    else:
+        nodes = split(documents)
+    # Parents go to the docstore as they are; only the leaves are summarized and embedded
+    leaves = get_leaf_nodes(nodes)
+    parents = [node for node in nodes if node.child_nodes]
+    logger.info(f"Split {len(documents)} documents into {len(leaves)} chunks and {len(parents)} parent nodes.")
+
+    # Stage 2: I/O-bound LLM summaries and embeddings, async under shared rate limits
+    request_bucket = TokenBucket(rate = requests_per_minute / 60, capacity = max(1, num_workers))
+    token_bucket = TokenBucket(rate = tokens_per_minute / 60, capacity = tokens_per_minute / 60)
+    if summary_mode == "llm":
+        summary_transforms = [
+            ThrottledTransform(
+                SummaryExtractor(
+                    llm = llm,
+                    summaries = ['self'],
+                    prompt_template = CUSTORM_SUMMARY_EXTRACT_TEMPLATE,
+                    show_progress = False
+                ),
+                batch_size = 1, # one LLM call per chunk
+                max_concurrency = num_workers,
+                cache = kv_store,
+                label = "summary",
+                **throttle_kwargs(llm, request_bucket, token_bucket),
+            ),
+        ]
+    elif summary_mode == "local":
+        summary_transforms = [TfidfSummaryExtractor()]
+    else:
+        summary_transforms = []
+    deduplicator = MinHashDeduplicator() if dedup else None
+    extract_pipeline = IngestionPipeline(
+        transformations = ([deduplicator] if deduplicator else []) + summary_transforms + [
+            ThrottledTransform(
+                embed_model,
+                batch_size = EMBED_BATCH_SIZE,
+                requests_per_node = False, # one batched request per EMBED_BATCH_SIZE nodes
+                max_concurrency = num_workers,
+                cache = kv_store,
+                label = "embedding",
+                **throttle_kwargs(embed_model, request_bucket, token_bucket),
             ),
-            SummaryExtractor(summaries = ['self'], prompt_template = CUSTORM_SUMMARY_EXTRACT_TEMPLATE),
         ],
-        cache = cached_hashes # 'cached_hashes' is guaranteed to have a value here
+        # Cached per chunk inside ThrottledTransform instead of per node list
+        disable_cache = True
+    )
+    nodes = parents + asyncio.run(extract_pipeline.arun(nodes = leaves))
+    logger.info(f"Ingestion cache stats: {kv_store.stats()}")
+
+    # Savings against one LLM summary and one embedding per chunk
+    dropped = deduplicator.dropped if deduplicator else 0
+    avoided_llm_calls = dropped if summary_mode == "llm" else len(leaves)
+    get_tracer().increment("ingest_avoided_total", "summary_llm_calls", avoided_llm_calls)
+    get_tracer().increment("ingest_avoided_total", "embeddings", dropped)
+    logger.info(
+        f"Avoided {avoided_llm_calls} summary LLM calls ({summary_mode} summaries, {dropped} duplicates) "
+        f"and {dropped} embeddings."
     )
-
-    nodes = pipeline.run(documents = documents)
-    pipeline.cache.persist(CACHE_FILE)
     logger.info(f"Ingestion pipeline finished. {len(nodes)} nodes created.")
 
     return nodes
\ No newline at end of file
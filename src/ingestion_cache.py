@@ -0,0 +1,121 @@
+# src/ingestion_cache.py
+import json
+import threading
+import time
+from typing import Dict, Optional
+from loguru import logger
+from llama_index.core.storage.kvstore.types import BaseKVStore, DEFAULT_COLLECTION
+from src.sqlite_utils import connect
+
+
+class SQLiteKVStore(BaseKVStore):
+    """
+    Size-bounded key/value store on SQLite used as the ingestion cache.
+
+    Entries are read one key at a time (nothing is loaded up front), the least
+    recently used entries are evicted once the stored values exceed `max_bytes`,
+    and hits/misses are counted so re-runs can be checked for skipped LLM calls.
+    """
+
+    def __init__(self, db_path: str, max_bytes: int):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = connect(self.db_path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS kv ("
+            " collection TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " accessed REAL NOT NULL,"
+            " PRIMARY KEY (collection, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_kv_accessed ON kv (accessed)")
+        self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM kv").fetchone()[0]
+
+    def put(self, key: str, val: dict, collection: str = DEFAULT_COLLECTION) -> None:
+        value = json.dumps(val, ensure_ascii=False)
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT size FROM kv WHERE collection = ? AND key = ?", (collection, key)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO kv (collection, key, value, size, accessed) VALUES (?, ?, ?, ?, ?)",
+                (collection, key, value, len(value), time.time()),
+            )
+            self._total_bytes += len(value) - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Deletes least recently used entries until the cache is at 90% of max_bytes."""
+        target = int(self.max_bytes * 0.9)
+        rows = self._conn.execute("SELECT collection, key, size FROM kv ORDER BY accessed").fetchall()
+        evicted = []
+        for collection, key, size in rows:
+            if self._total_bytes <= target:
+                break
+            evicted.append((collection, key))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM kv WHERE collection = ? AND key = ?", evicted)
+        self.evictions += len(evicted)
+        logger.info(f"Ingestion cache evicted {len(evicted)} entries.")
+
+    async def aput(self, key: str, val: dict, collection: str = DEFAULT_COLLECTION) -> None:
+        self.put(key, val, collection)
+
+    def get(self, key: str, collection: str = DEFAULT_COLLECTION) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM kv WHERE collection = ? AND key = ?", (collection, key)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE kv SET accessed = ? WHERE collection = ? AND key = ?", (time.time(), collection, key)
+            )
+        return json.loads(row[0])
+
+    async def aget(self, key: str, collection: str = DEFAULT_COLLECTION) -> Optional[dict]:
+        return self.get(key, collection)
+
+    def get_all(self, collection: str = DEFAULT_COLLECTION) -> Dict[str, dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT key, value FROM kv WHERE collection = ?", (collection,)
+            ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+    async def aget_all(self, collection: str = DEFAULT_COLLECTION) -> Dict[str, dict]:
+        return self.get_all(collection)
+
+    def delete(self, key: str, collection: str = DEFAULT_COLLECTION) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size FROM kv WHERE collection = ? AND key = ?", (collection, key)
+            ).fetchone()
+            if row is None:
+                return False
+            self._conn.execute("DELETE FROM kv WHERE collection = ? AND key = ?", (collection, key))
+            self._total_bytes -= row[0]
+        return True
+
+    async def adelete(self, key: str, collection: str = DEFAULT_COLLECTION) -> bool:
+        return self.delete(key, collection)
+
+    def stats(self) -> dict:
+        """Hit/miss counters of this process and the current cache size."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "size_mb": round(self._total_bytes / 1024 ** 2, 2),
+        }
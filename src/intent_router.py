@@ -0,0 +1,199 @@
+# src/intent_router.py
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from typing import Optional, Sequence, Tuple
+import numpy as np
+from loguru import logger
+from llama_index.core.llms import MessageRole
+from src.global_settings import ROUTER_MAX_WORDS, ROUTER_MIN_SIMILARITY, ROUTER_MARGIN
+from src.tracing import get_tracer
+
+SMALL_TALK = "small_talk"
+AGENT = "agent"
+
+# Labeled examples of the two intents; a message is compared to its nearest example of each.
+# No bare answers ("ok", "dạ", "mình ổn"): they may answer a screening question of the agent.
+SMALL_TALK_EXAMPLES = (
+    "xin chào", "chào bạn", "chào em", "chào buổi sáng", "chào buổi tối", "hello", "hi", "hey",
+    "good morning", "good evening", "how are you", "hôm nay bạn thế nào", "bạn là ai",
+    "bạn tên là gì", "who are you", "bạn có thể làm gì", "what can you do", "rất vui được gặp bạn",
+    "nice to meet you", "cảm ơn bạn", "cảm ơn nhiều", "thank you", "thanks", "haha", "hihi",
+    "tôi vừa đi làm về", "hôm nay trời đẹp quá",
+)
+AGENT_EXAMPLES = (
+    "dạo này tôi hay mất ngủ và lo lắng", "tôi cảm thấy buồn chán suốt hai tuần nay",
+    "tôi có bị trầm cảm không", "triệu chứng của rối loạn lo âu là gì",
+    "tiêu chuẩn dsm-5 của rối loạn hoảng sợ", "tôi thấy mệt mỏi, không muốn ăn uống gì",
+    "tôi hay cáu gắt và khó tập trung khi làm việc", "hãy đánh giá sức khỏe tâm thần của tôi",
+    "tôi muốn kết thúc cuộc trò chuyện", "tạm biệt nhé", "lưu điểm số của tôi",
+    "i can't sleep and i feel anxious all the time", "what are the symptoms of depression",
+    "do i have ptsd", "i keep having panic attacks at work", "i want to end the conversation",
+    "goodbye", "tôi không muốn gặp ai nữa", "tôi thấy mình vô dụng",
+)
+# Folded phrases that always need the agent: symptoms and diagnoses (the dsm5 tool), scores
+# (save_score), and ending the conversation, which triggers the assessment (Step 2 of the prompt)
+AGENT_PHRASES = (
+    "mat ngu", "kho ngu", "lo au", "lo lang", "tram cam", "buon", "met", "khoc", "co don", "so hai",
+    "hoang so", "cang thang", "ap luc", "that vong", "stress", "tu tu", "tu hai", "chet", "trieu chung",
+    "chan doan", "roi loan", "benh", "thuoc", "dsm", "diem", "danh gia", "tam biet", "ket thuc",
+    "sleep", "tired", "sad", "lonely", "cry", "anxi", "depress", "panic", "symptom", "diagnos",
+    "disorder", "suicid", "kill", "die", "hurt", "score", "bye",
+)
+# Folded whole words that always need the agent: negations, which turn any small-talk phrase into
+# a possible complaint ("không ổn", "not okay"), and words about how the user feels ("tệ", "khỏe")
+AGENT_WORDS = (
+    "khong", "ko", "k", "hong", "hok", "chua", "chang", "cha", "not", "no", "never", "nope", "cannot",
+    "te", "khoe", "chan", "kho chiu", "tuyet vong", "awful", "terrible", "bad", "worse", "worst",
+    "horrible", "upset", "sick", "unwell", "miserable", "hopeless",
+)
+_AGENT_PATTERN = re.compile(
+    r"\b(?:" + "|".join(map(re.escape, AGENT_PHRASES)) + r")"
+    r"|\b(?:" + "|".join(map(re.escape, AGENT_WORDS)) + r")\b"
+    r"|n't\b"
+)
+_WORD = re.compile(r"\w+")
+_FEATURES = 1 << 12
+
+
+def normalize(text: str) -> str:
+    """Lowercased text without Vietnamese diacritics, so messages typed without accents match."""
+    decomposed = unicodedata.normalize("NFD", text.lower().replace("đ", "d").replace("Đ", "d"))
+    return "".join(c for c in decomposed if unicodedata.category(c) != "Mn")
+
+
+def featurize(text: str) -> np.ndarray:
+    """
+    Normalized vector of the hashed words, word pairs and character trigrams of
+    a folded text. Trigrams make typos and missing accents close to the original.
+    """
+    words = _WORD.findall(normalize(text))
+    padded = f" {' '.join(words)} "
+    grams = words + [" ".join(pair) for pair in zip(words, words[1:])]
+    grams += [padded[i:i + 3] for i in range(len(padded) - 2)]
+    vector = np.zeros(_FEATURES, dtype=np.float32)
+    for gram in grams:
+        vector[zlib.crc32(gram.encode("utf-8")) % _FEATURES] += 1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class IntentRouter:
+    """
+    Local classifier sending each chat message either to a direct LLM reply
+    (SMALL_TALK) or to the ReAct agent (AGENT), without any model call.
+
+    A message is small talk only when all of these hold, so anything uncertain
+    goes to the agent:
+    - the assistant's previous reply was not a question, which the message
+      may answer ("dạ có" to a screening question)
+    - it has at most `max_words` words
+    - it contains none of AGENT_PHRASES and AGENT_WORDS (negations included)
+    - its nearest small-talk example is at least `min_similarity` close, and
+      closer by `margin` than its nearest agent example (cosine similarity of
+      hashed n-gram vectors)
+    """
+
+    def __init__(
+        self,
+        small_talk_examples: Sequence[str] = SMALL_TALK_EXAMPLES,
+        agent_examples: Sequence[str] = AGENT_EXAMPLES,
+        max_words: int = ROUTER_MAX_WORDS,
+        min_similarity: float = ROUTER_MIN_SIMILARITY,
+        margin: float = ROUTER_MARGIN,
+    ):
+        self.max_words = max_words
+        self.min_similarity = min_similarity
+        self.margin = margin
+        self._small_talk = np.stack([featurize(text) for text in small_talk_examples])
+        self._agent = np.stack([featurize(text) for text in agent_examples])
+
+    def classify(self, message: str, previous_reply: Optional[str] = None) -> Tuple[str, float]:
+        """
+        Returns the route of a message and its small-talk margin (negative for the agent).
+
+        Args:
+            message (str): The user's message.
+            previous_reply (str): The assistant's last reply in the conversation, if any.
+        """
+        if previous_reply and previous_reply.rstrip().endswith("?"):
+            return AGENT, -1.0
+        folded = normalize(message)
+        if len(_WORD.findall(folded)) > self.max_words or _AGENT_PATTERN.search(folded):
+            return AGENT, -1.0
+        vector = featurize(message)
+        small_talk = float((self._small_talk @ vector).max())
+        margin = small_talk - float((self._agent @ vector).max())
+        if small_talk >= self.min_similarity and margin >= self.margin:
+            return SMALL_TALK, margin
+        return AGENT, margin
+
+
+class RoutedAgent:
+    """
+    Chat agent answering small talk with one direct LLM call (a chat engine
+    over the system prompt and the user's memory) and every other message
+    with the ReAct agent and its dsm5/save_score tools. Both share the memory,
+    so the conversation continues the same way on either path.
+
+    Routes are counted in "router_turns_total" and classification time in
+    "router_classify_seconds".
+    """
+
+    def __init__(self, agent, small_talk_engine, router: Optional[IntentRouter] = None):
+        self.agent = agent
+        self.small_talk_engine = small_talk_engine
+        self.router = router or get_intent_router()
+
+    @property
+    def memory(self):
+        return self.agent.memory
+
+    def _previous_reply(self) -> Optional[str]:
+        history = self.memory.get_all()
+        if history and history[-1].role == MessageRole.ASSISTANT:
+            return history[-1].content
+        return None
+
+    def route(self, message: str) -> str:
+        start = time.perf_counter()
+        route, margin = self.router.classify(message, self._previous_reply())
+        tracer = get_tracer()
+        tracer.observe("router_classify_seconds", route, time.perf_counter() - start)
+        tracer.increment("router_turns_total", route)
+        logger.debug(f"Routed message to {route} (margin {margin:.2f}).")
+        return route
+
+    def _engine(self, message: str):
+        return self.small_talk_engine if self.route(message) == SMALL_TALK else self.agent
+
+    def chat(self, message: str):
+        return self._engine(message).chat(message)
+
+    async def achat(self, message: str):
+        return await self._engine(message).achat(message)
+
+    def stream_chat(self, message: str):
+        return self._engine(message).stream_chat(message)
+
+    async def astream_chat(self, message: str):
+        return await self._engine(message).astream_chat(message)
+
+    def reset(self):
+        self.agent.reset()
+
+
+_router: Optional[IntentRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_intent_router() -> IntentRouter:
+    """Returns the process-wide intent router, built from the examples on first use."""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = IntentRouter()
+    return _router
@@ -0,0 +1,155 @@
+# src/lexical_index.py
+import json
+import math
+import os
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, List, Tuple
+import numpy as np
+from loguru import logger
+from llama_index.core.schema import BaseNode, MetadataMode
+from src.global_settings import LEXICAL_INDEX_FILE
+
+# Diagnostic codes (F32.1, 296.23) are kept whole; everything else splits on word characters.
+_TOKEN = re.compile(r"[a-z]?\d+(?:\.\d+)+|\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it of on or that the to was were with "
+    "và của là có các những cho được trong với không một này để khi thì người".split()
+)
+
+
+class _FoldTable(dict):
+    """str.translate table mapping each character to its unaccented form, filled on first sight."""
+
+    def __missing__(self, code: int) -> str:
+        char = chr(code)
+        folded = {"đ": "d", "Đ": "D"}.get(char) or "".join(
+            c for c in unicodedata.normalize("NFD", char) if unicodedata.category(c) != "Mn"
+        )
+        self[code] = folded
+        return folded
+
+
+_FOLD_TABLE = _FoldTable()
+
+
+def _fold(text: str) -> str:
+    """Strips Vietnamese diacritics, so queries typed without accents still match."""
+    return text if text.isascii() else text.translate(_FOLD_TABLE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased Vietnamese/English terms of a text, with an accent-folded copy of accented terms."""
+    terms = []
+    for token in _TOKEN.findall(unicodedata.normalize("NFC", text.lower())):
+        if token in _STOPWORDS:
+            continue
+        terms.append(token)
+        folded = _fold(token)
+        if folded != token:
+            terms.append(folded)
+    return terms
+
+
+@lru_cache(maxsize=4096)
+def term_set(text: str) -> FrozenSet[str]:
+    """
+    Distinct terms of tokenize(text), folding the text once instead of every
+    token. Cached, since the same chunks come back for many queries.
+    """
+    text = unicodedata.normalize("NFC", text.lower())
+    return frozenset(_TOKEN.findall(text)).union(_TOKEN.findall(_fold(text))) - _STOPWORDS
+
+
+class LexicalIndex:
+    """
+    Compact BM25 inverted index over the index nodes.
+
+    Postings are stored as flat numpy arrays (CSR layout: one offset per term)
+    with the BM25 weight of every (term, node) pair precomputed at build time,
+    so a query is a handful of vectorized additions and one argpartition.
+    """
+
+    def __init__(self, vocabulary: Dict[str, int], offsets: np.ndarray, postings: np.ndarray,
+                 weights: np.ndarray, node_ids: List[str]):
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.postings = postings
+        self.weights = weights
+        self.node_ids = node_ids
+
+    @classmethod
+    def from_nodes(cls, nodes: Iterable[BaseNode], k1: float = 1.2, b: float = 0.75) -> "LexicalIndex":
+        """Builds the index from node text and embedded metadata (e.g. section titles)."""
+        node_ids, term_counts = [], []
+        for node in nodes:
+            node_ids.append(node.node_id)
+            term_counts.append(Counter(tokenize(node.get_content(metadata_mode=MetadataMode.EMBED))))
+        lengths = np.array([sum(counts.values()) for counts in term_counts], dtype=np.float32)
+        avg_length = float(lengths.mean()) if len(lengths) else 1.0
+
+        postings_by_term: Dict[str, List[Tuple[int, int]]] = {}
+        for doc, counts in enumerate(term_counts):
+            for term, tf in counts.items():
+                postings_by_term.setdefault(term, []).append((doc, tf))
+
+        vocabulary, offsets, postings, weights = {}, [0], [], []
+        n = len(node_ids)
+        for term_id, (term, entries) in enumerate(sorted(postings_by_term.items())):
+            vocabulary[term] = term_id
+            idf = math.log(1 + (n - len(entries) + 0.5) / (len(entries) + 0.5))
+            for doc, tf in entries:
+                norm = k1 * (1 - b + b * lengths[doc] / avg_length)
+                postings.append(doc)
+                weights.append(idf * tf * (k1 + 1) / (tf + norm))
+            offsets.append(len(postings))
+        logger.info(f"Lexical index built: {n} nodes, {len(vocabulary)} terms, {len(postings)} postings.")
+        return cls(
+            vocabulary,
+            np.asarray(offsets, dtype=np.int64),
+            np.asarray(postings, dtype=np.int32),
+            np.asarray(weights, dtype=np.float32),
+            node_ids,
+        )
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[str, float]]:
+        """Returns up to top_k (node_id, BM25 score) pairs, best first."""
+        scores = np.zeros(len(self.node_ids), dtype=np.float32)
+        matched = False
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            scores[self.postings[start:end]] += self.weights[start:end]
+            matched = True
+        if not matched:
+            return []
+        k = min(top_k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(self.node_ids[i], float(scores[i])) for i in best if scores[i] > 0]
+
+    def persist(self, path: str = LEXICAL_INDEX_FILE):
+        """Saves the arrays and the vocabulary in one uncompressed .npz file, written atomically."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(
+            tmp_path,
+            offsets=self.offsets,
+            postings=self.postings,
+            weights=self.weights,
+            meta=np.frombuffer(
+                json.dumps({"vocabulary": self.vocabulary, "node_ids": self.node_ids}).encode("utf-8"), dtype=np.uint8
+            ),
+        )
+        os.replace(tmp_path, path)
+        logger.success(f"Lexical index persisted to {path}.")
+
+    @classmethod
+    def load(cls, path: str = LEXICAL_INDEX_FILE) -> "LexicalIndex":
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode("utf-8"))
+            return cls(meta["vocabulary"], data["offsets"], data["postings"], data["weights"], meta["node_ids"])
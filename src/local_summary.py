@@ -0,0 +1,87 @@
+# src/local_summary.py
+import re
+from typing import Dict, List, Sequence
+import numpy as np
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.extractors import BaseExtractor
+from llama_index.core.schema import BaseNode, MetadataMode
+from src.global_settings import LOCAL_SUMMARY_SENTENCES
+from src.lexical_index import tokenize
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…;])\s+|\n+")
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+
+
+def score_sentences(sentences: Sequence[List[str]], owners: np.ndarray, num_nodes: int) -> np.ndarray:
+    """
+    Cosine similarity of every sentence to the chunk it belongs to, in TF-IDF
+    space, for all chunks at once.
+
+    Args:
+        sentences: Terms of every sentence.
+        owners (np.ndarray): Index of the chunk of every sentence.
+        num_nodes (int): Number of chunks; IDF is computed over them.
+
+    Returns:
+        np.ndarray: One score per sentence.
+    """
+    vocabulary: Dict[str, int] = {}
+    rows, cols = [], []
+    for row, terms in enumerate(sentences):
+        for term in terms:
+            rows.append(row)
+            cols.append(vocabulary.setdefault(term, len(vocabulary)))
+    if not rows:
+        return np.zeros(len(sentences), dtype=np.float64)
+    rows, cols = np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+
+    # One entry per distinct (sentence, term) with its count, and per distinct (chunk, term)
+    entries, tf = np.unique(rows * len(vocabulary) + cols, return_counts=True)
+    entry_rows, entry_terms = np.divmod(entries, len(vocabulary))
+    node_terms, node_index = np.unique(owners[entry_rows] * len(vocabulary) + entry_terms, return_inverse=True)
+    document_frequency = np.bincount(node_terms % len(vocabulary), minlength=len(vocabulary))
+    idf = np.log((1 + num_nodes) / (1 + document_frequency)) + 1
+
+    weights = tf * idf[entry_terms]
+    node_weights = np.bincount(node_index, weights=weights)
+    dot = np.bincount(entry_rows, weights=weights * node_weights[node_index], minlength=len(sentences))
+    sentence_norm = np.sqrt(np.bincount(entry_rows, weights=weights ** 2, minlength=len(sentences)))
+    node_norm = np.sqrt(np.bincount(node_terms // len(vocabulary), weights=node_weights ** 2, minlength=num_nodes))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scores = dot / (sentence_norm * node_norm[owners])
+    return np.nan_to_num(scores)
+
+
+class TfidfSummaryExtractor(BaseExtractor):
+    """
+    Extractive stand-in for SummaryExtractor that needs no LLM: the
+    `sentences` sentences of each chunk closest to the whole chunk in TF-IDF
+    space, in their original order, become its `section_summary`. Every chunk
+    of a run is scored in one vectorized pass.
+    """
+
+    sentences: int = Field(default=LOCAL_SUMMARY_SENTENCES, gt=0, description="Sentences kept per summary.")
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "TfidfSummaryExtractor"
+
+    async def aextract(self, nodes: Sequence[BaseNode]) -> List[Dict]:
+        node_sentences = [split_sentences(node.get_content(metadata_mode=MetadataMode.NONE)) for node in nodes]
+        owners = np.asarray([i for i, sentences in enumerate(node_sentences) for _ in sentences], dtype=np.int64)
+        flat = [sentence for sentences in node_sentences for sentence in sentences]
+        scores = score_sentences([tokenize(sentence) for sentence in flat], owners, len(nodes))
+
+        # Best sentences first within each chunk, then back to reading order
+        order = np.lexsort((-scores, owners))
+        starts = np.searchsorted(owners[order], np.arange(len(nodes)))
+        ends = np.append(starts[1:], len(order))
+        metadata_list: List[Dict] = []
+        for start, end in zip(starts, ends):
+            best = np.sort(order[start:min(end, start + self.sentences)])
+            summary = " ".join(flat[i] for i in best)
+            metadata_list.append({"section_summary": summary} if summary else {})
+        return metadata_list
@@ -0,0 +1,239 @@
+# src/mmap_store.py
+import json
+import os
+import shutil
+from typing import List, NamedTuple, Optional, Tuple
+import numpy as np
+from loguru import logger
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.schema import BaseNode, NodeWithScore, QueryBundle
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
+from src.binary_vector_store import BinaryVectorStore, cosine_scores, quantize, replace_dir, top_k
+from src.global_settings import INDEX_STORAGE, MMAP_STORE_DIR, SIMILARITY_TOP_K, VECTOR_STORE_DTYPE
+from src.resource_registry import storage_signature, version_hash
+
+FORMAT_VERSION = 2
+
+
+def store_path(persist_dir: str = INDEX_STORAGE) -> str:
+    """Directory of the memory-mapped export of the index persisted in persist_dir."""
+    return os.path.join(persist_dir, os.path.basename(MMAP_STORE_DIR))
+
+
+def source_version(persist_dir: str = INDEX_STORAGE) -> str:
+    """Version of the JSON stores in persist_dir, ignoring the export itself."""
+    name = os.path.basename(MMAP_STORE_DIR)
+    return version_hash(tuple(
+        entry for entry in storage_signature(persist_dir)
+        if entry[0].split(os.sep)[0] not in (name, name + ".tmp")
+    ))
+
+
+def _vectors(storage_context) -> Tuple[List[str], np.ndarray]:
+    """(node ids, embedding matrix) of every vector in the default vector store."""
+    vector_store = storage_context.vector_store
+    if isinstance(vector_store, BinaryVectorStore):
+        return vector_store.vectors()
+    data = getattr(vector_store, "data", None)
+    if data is None or not hasattr(data, "embedding_dict"):
+        raise ValueError("Only the binary and simple vector store backends can be exported to a memory-mapped store.")
+    ids = list(data.embedding_dict)
+    return ids, np.asarray([data.embedding_dict[node_id] for node_id in ids], dtype=np.float32)
+
+
+def export_mmap_store(storage_context, store_dir: str, source: str = "", dtype: str = VECTOR_STORE_DTYPE) -> dict:
+    """
+    Writes the embeddings and nodes of an index's storage context as flat binary files
+    that any number of processes can memory-map read-only:
+
+    - embeddings.npy (+ scales.npy for int8): L2-normalized matrix quantized to dtype, one row per vector
+    - rows.npy: node position of every row
+    - ids.npy / id_order.npy: sorted node ids and their node positions
+    - nodes.bin / offsets.npy: JSON of every docstore node (leaves and parents), concatenated
+    - meta.json: counts, dimension and the version of the JSON stores it was exported from
+
+    The files are written to a temporary directory that replaces store_dir,
+    so readers see either the old or the new export, never a mix.
+
+    Returns:
+        dict: The written meta.json.
+    """
+    vector_ids, vectors = _vectors(storage_context)
+    nodes: List[BaseNode] = list(storage_context.docstore.docs.values())
+    positions = {node.node_id: i for i, node in enumerate(nodes)}
+    kept = [row for row, node_id in enumerate(vector_ids) if node_id in positions]
+    row_ids = [vector_ids[row] for row in kept]
+    embeddings, scales = quantize(vectors[kept] if kept else np.zeros((0, 0), dtype=np.float32), dtype)
+
+    blobs = [json.dumps(doc_to_json(node), ensure_ascii=False).encode("utf-8") for node in nodes]
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    np.cumsum([len(blob) for blob in blobs], out=offsets[1:])
+    ids = np.asarray([node.node_id.encode("utf-8") for node in nodes], dtype=bytes)
+    id_order = np.argsort(ids, kind="stable")
+
+    tmp_dir = store_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    np.save(os.path.join(tmp_dir, "embeddings.npy"), embeddings)
+    if scales is not None:
+        np.save(os.path.join(tmp_dir, "scales.npy"), scales)
+    np.save(os.path.join(tmp_dir, "rows.npy"), np.asarray([positions[node_id] for node_id in row_ids], dtype=np.int64))
+    np.save(os.path.join(tmp_dir, "ids.npy"), ids[id_order])
+    np.save(os.path.join(tmp_dir, "id_order.npy"), id_order.astype(np.int64))
+    np.save(os.path.join(tmp_dir, "offsets.npy"), offsets)
+    with open(os.path.join(tmp_dir, "nodes.bin"), "wb") as f:
+        for blob in blobs:
+            f.write(blob)
+    meta = {
+        "format": FORMAT_VERSION,
+        "rows": len(row_ids),
+        "nodes": len(nodes),
+        "dim": int(embeddings.shape[1]) if len(row_ids) else 0,
+        "dtype": dtype,
+        "source": source,
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=4)
+
+    # Readers keep their mappings of the old files until they reload
+    replace_dir(tmp_dir, store_dir)
+    logger.success(f"Exported {meta['rows']} vectors and {meta['nodes']} nodes to {store_dir}.")
+    return meta
+
+
+def read_meta(store_dir: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(store_dir, "meta.json")) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def ensure_mmap_store(persist_dir: str = INDEX_STORAGE, dtype: str = VECTOR_STORE_DTYPE) -> bool:
+    """
+    Exports the index persisted in persist_dir unless an export of the same
+    version of the JSON stores already exists. The JSON stores are parsed
+    once here, so processes that only map the export never parse them.
+
+    Returns:
+        bool: Whether a new export was written.
+    """
+    from src.vector_store import create_storage_context
+
+    source = source_version(persist_dir)
+    meta = read_meta(store_path(persist_dir))
+    if meta is not None and meta.get("format") == FORMAT_VERSION and (meta.get("source"), meta.get("dtype")) == (source, dtype):
+        return False
+    export_mmap_store(create_storage_context(persist_dir=persist_dir), store_path(persist_dir), source=source, dtype=dtype)
+    return True
+
+
+class MmapDocstore:
+    """
+    Read-only docstore over the exported nodes. A node is decoded from the
+    mapped JSON when it is requested; nothing is parsed up front.
+    """
+
+    def __init__(self, store_dir: str):
+        self._ids = np.load(os.path.join(store_dir, "ids.npy"), mmap_mode="r")
+        self._id_order = np.load(os.path.join(store_dir, "id_order.npy"), mmap_mode="r")
+        self._offsets = np.load(os.path.join(store_dir, "offsets.npy"), mmap_mode="r")
+        size = int(self._offsets[-1]) if len(self._offsets) else 0
+        self._blob = np.memmap(os.path.join(store_dir, "nodes.bin"), dtype=np.uint8, mode="r") if size else b""
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def node_at(self, position: int) -> BaseNode:
+        start, end = int(self._offsets[position]), int(self._offsets[position + 1])
+        return json_to_doc(json.loads(bytes(self._blob[start:end])))
+
+    def position(self, node_id: str) -> Optional[int]:
+        key = node_id.encode("utf-8")
+        i = int(np.searchsorted(self._ids, key))
+        if i < len(self._ids) and self._ids[i] == key:
+            return int(self._id_order[i])
+        return None
+
+    def get_document(self, doc_id: str, raise_error: bool = True) -> Optional[BaseNode]:
+        position = self.position(doc_id)
+        if position is None:
+            if raise_error:
+                raise ValueError(f"doc_id {doc_id} not found.")
+            return None
+        return self.node_at(position)
+
+    def get_node(self, node_id: str, raise_error: bool = True) -> Optional[BaseNode]:
+        return self.get_document(node_id, raise_error=raise_error)
+
+    def get_nodes(self, node_ids: List[str], raise_error: bool = True) -> List[BaseNode]:
+        return [self.get_document(node_id, raise_error=raise_error) for node_id in node_ids]
+
+    def document_exists(self, doc_id: str) -> bool:
+        return self.position(doc_id) is not None
+
+
+class ReadOnlyStorage(NamedTuple):
+    """The part of a StorageContext the auto-merging retriever uses."""
+    docstore: MmapDocstore
+
+
+class MmapVectorRetriever(BaseRetriever):
+    """Exact cosine top-k over the mapped embedding matrix, one matrix-vector product per query."""
+
+    def __init__(self, index: "MmapIndex", embed_model, similarity_top_k: int = SIMILARITY_TOP_K, **kwargs):
+        self._index = index
+        self._embed_model = embed_model
+        self._similarity_top_k = similarity_top_k
+        super().__init__(**kwargs)
+
+    def _search(self, embedding: List[float]) -> List[NodeWithScore]:
+        return [
+            NodeWithScore(node=self._index.docstore.node_at(position), score=score)
+            for position, score in self._index.search(embedding, self._similarity_top_k)
+        ]
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        if query_bundle.embedding is None and len(query_bundle.embedding_strs) > 0:
+            query_bundle.embedding = self._embed_model.get_agg_embedding_from_queries(query_bundle.embedding_strs)
+        return self._search(query_bundle.embedding)
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        if query_bundle.embedding is None and len(query_bundle.embedding_strs) > 0:
+            query_bundle.embedding = await self._embed_model.aget_agg_embedding_from_queries(
+                query_bundle.embedding_strs
+            )
+        return self._search(query_bundle.embedding)
+
+
+class MmapIndex:
+    """
+    Read-only stand-in for the loaded VectorStoreIndex, backed by an export
+    of export_mmap_store. The arrays are memory-mapped, so every process
+    serving the same export shares one copy in the OS page cache instead of
+    parsing the JSON stores into its own Python objects. Provides what
+    src.retrieval uses of an index: as_retriever, docstore and storage_context.
+    """
+
+    def __init__(self, store_dir: str, embed_model=None):
+        meta = read_meta(store_dir)
+        if meta is None or meta.get("format") != FORMAT_VERSION:
+            raise FileNotFoundError(f"No memory-mapped index at {store_dir}. Run build_data.py to export it.")
+        self.store_dir = store_dir
+        self.meta = meta
+        self.embed_model = embed_model
+        self.embeddings = np.load(os.path.join(store_dir, "embeddings.npy"), mmap_mode="r")
+        self.scales = np.load(os.path.join(store_dir, "scales.npy"), mmap_mode="r") if meta["dtype"] == "int8" else None
+        self.rows = np.load(os.path.join(store_dir, "rows.npy"), mmap_mode="r")
+        self.docstore = MmapDocstore(store_dir)
+        self.storage_context = ReadOnlyStorage(self.docstore)
+
+    def search(self, embedding: List[float], k: int) -> List[Tuple[int, float]]:
+        """(node position, cosine similarity) of the k rows closest to embedding, best first."""
+        if not len(self.rows):
+            return []
+        scores = cosine_scores(self.embeddings, self.scales, embedding)
+        return [(int(self.rows[i]), float(scores[i])) for i in top_k(scores, k)]
+
+    def as_retriever(self, similarity_top_k: int = SIMILARITY_TOP_K, **kwargs) -> MmapVectorRetriever:
+        return MmapVectorRetriever(self, self.embed_model, similarity_top_k=similarity_top_k, **kwargs)
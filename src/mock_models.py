@@ -0,0 +1,180 @@
+# src/mock_models.py
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Any, List, Optional, Sequence
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.base.llms.types import (
+    ChatMessage, ChatResponse, ChatResponseAsyncGen, ChatResponseGen,
+    CompletionResponse, CompletionResponseAsyncGen, CompletionResponseGen, LLMMetadata, MessageRole,
+)
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.llms.callbacks import llm_chat_callback, llm_completion_callback
+from llama_index.core.llms.custom import CustomLLM
+
+_WORD = re.compile(r"\w+")
+
+
+class MockLLM(CustomLLM):
+    """
+    Deterministic local stand-in for the Gemini LLM, used by benchmarks.
+
+    The answer is a fixed-length sample of words from the prompt, seeded by the
+    prompt hash, so the same prompt always gives the same text. Every call waits
+    `latency` seconds, and streamed calls wait `token_latency` per word.
+
+    With `tool_name` set, ReAct agent prompts first get an action calling that
+    tool with the user message, then a final answer after the observation, so an
+    agent turn goes through retrieval like it does with the real model.
+    """
+
+    latency: float = Field(default=0.0, description="Seconds before the first token of every call.")
+    token_latency: float = Field(default=0.0, description="Seconds between streamed words.")
+    max_tokens: int = Field(default=48, description="Number of words in an answer.")
+    tool_name: Optional[str] = Field(default=None, description="Tool a ReAct agent is told to call once per turn.")
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MockLLM"
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return LLMMetadata(context_window=32768, num_output=self.max_tokens, model_name="mock-llm")
+
+    def _answer(self, prompt: str) -> str:
+        words = _WORD.findall(prompt) or ["ok"]
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        return " ".join(rng.choice(words) for _ in range(self.max_tokens))
+
+    def _chat_text(self, messages: Sequence[ChatMessage]) -> str:
+        prompt = self.messages_to_prompt(messages)
+        is_react = messages and messages[0].role == MessageRole.SYSTEM and "Action Input:" in (messages[0].content or "")
+        if not is_react:
+            return self._answer(prompt)
+        last = messages[-1]
+        if self.tool_name and last.role == MessageRole.USER and not (last.content or "").startswith("Observation:"):
+            return (
+                "Thought: I need to use a tool to help me answer the question.\n"
+                f"Action: {self.tool_name}\n"
+                f"Action Input: {json.dumps({'input': last.content}, ensure_ascii=False)}"
+            )
+        return f"Thought: I can answer without using any more tools.\nAnswer: {self._answer(prompt)}"
+
+    @staticmethod
+    def _chunks(text: str) -> List[str]:
+        return re.findall(r"\S+\s*", text)
+
+    def _stream(self, text: str) -> CompletionResponseGen:
+        time.sleep(self.latency)
+        content = ""
+        for chunk in self._chunks(text):
+            time.sleep(self.token_latency)
+            content += chunk
+            yield CompletionResponse(text=content, delta=chunk)
+
+    async def _astream(self, text: str) -> CompletionResponseAsyncGen:
+        await asyncio.sleep(self.latency)
+        content = ""
+        for chunk in self._chunks(text):
+            await asyncio.sleep(self.token_latency)
+            content += chunk
+            yield CompletionResponse(text=content, delta=chunk)
+
+    @llm_completion_callback()
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        time.sleep(self.latency)
+        return CompletionResponse(text=self._answer(prompt))
+
+    @llm_completion_callback()
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        return self._stream(self._answer(prompt))
+
+    @llm_completion_callback()
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        await asyncio.sleep(self.latency)
+        return CompletionResponse(text=self._answer(prompt))
+
+    @llm_completion_callback()
+    async def astream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseAsyncGen:
+        return self._astream(self._answer(prompt))
+
+    @llm_chat_callback()
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        time.sleep(self.latency)
+        return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=self._chat_text(messages)))
+
+    @llm_chat_callback()
+    def stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseGen:
+        def gen() -> ChatResponseGen:
+            for response in self._stream(self._chat_text(messages)):
+                yield ChatResponse(
+                    message=ChatMessage(role=MessageRole.ASSISTANT, content=response.text), delta=response.delta
+                )
+        return gen()
+
+    @llm_chat_callback()
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        await asyncio.sleep(self.latency)
+        return ChatResponse(message=ChatMessage(role=MessageRole.ASSISTANT, content=self._chat_text(messages)))
+
+    @llm_chat_callback()
+    async def astream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseAsyncGen:
+        async def gen() -> ChatResponseAsyncGen:
+            async for response in self._astream(self._chat_text(messages)):
+                yield ChatResponse(
+                    message=ChatMessage(role=MessageRole.ASSISTANT, content=response.text), delta=response.delta
+                )
+        return gen()
+
+
+class MockEmbedding(BaseEmbedding):
+    """
+    Deterministic local stand-in for the Gemini embedding model, used by benchmarks.
+
+    Words are hashed into `dim` signed buckets (feature hashing) and the vector
+    is normalized, so texts sharing words are close and retrieval behaves
+    sensibly. Every request, a single text or a whole batch, waits `latency` seconds.
+    """
+
+    dim: int = Field(default=256, description="Embedding dimension.")
+    latency: float = Field(default=0.0, description="Seconds per embedding request.")
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "MockEmbedding"
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for word in _WORD.findall(text.lower()):
+            h = int.from_bytes(hashlib.md5(word.encode("utf-8")).digest()[:8], "little")
+            vector[h % self.dim] += 1.0 if h >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        time.sleep(self.latency)
+        return self._embed(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return self._embed(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return self._embed(text)
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return self._embed(text)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency)
+        return [self._embed(text) for text in texts]
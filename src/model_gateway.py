@@ -0,0 +1,493 @@
+# src/model_gateway.py
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+from loguru import logger
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.base.llms.types import (
+    ChatMessage, ChatResponse, ChatResponseAsyncGen, ChatResponseGen,
+    CompletionResponse, CompletionResponseAsyncGen, CompletionResponseGen, LLMMetadata,
+)
+from llama_index.core.bridge.pydantic import Field, PrivateAttr, SerializeAsAny
+from llama_index.core.llms.llm import LLM
+from src.async_runner import get_event_loop
+from src.global_settings import (
+    GATEWAY_REQUESTS_PER_MINUTE, GATEWAY_TOKENS_PER_MINUTE, GATEWAY_CHAT_RESERVE,
+    GATEWAY_BATCH_WINDOW_MS, GATEWAY_MAX_BATCH_SIZE, GATEWAY_MAX_RETRIES
+)
+from src.rate_limit import PriorityTokenBucket, aretry_with_backoff, estimate_tokens, retry_with_backoff
+from src.tracing import get_tracer
+
+T = TypeVar("T")
+
+# Priority levels of the shared rate limit, most urgent first
+PRIORITIES = {"chat": 0, "ingest": 1}
+
+
+def _on_event_loop() -> bool:
+    """Whether the caller runs on the background loop, where it must not block waiting for it."""
+    try:
+        return asyncio.get_running_loop() is get_event_loop()
+    except RuntimeError:
+        return False
+
+
+class _QueryBatcher:
+    """
+    Collects the query embeddings of one model requested within the batch
+    window and sends them as one batched request on the background loop.
+    """
+
+    def __init__(self, gateway: "ModelGateway", embed_model: BaseEmbedding, priority: str):
+        self.gateway = gateway
+        self.embed_model = embed_model
+        self.priority = priority
+        self._pending: List[Tuple[str, float, Future]] = []  # (query, queued at, future)
+        self._generation = 0  # increases whenever a batch is taken, so stale timers do nothing
+        self._lock = threading.Lock()
+
+    def submit(self, query: str, future: Future):
+        loop = get_event_loop()
+        with self._lock:
+            self._pending.append((query, time.perf_counter(), future))
+            if len(self._pending) >= self.gateway.max_batch_size:
+                batch = self._take()
+            else:
+                batch = None
+                if len(self._pending) == 1:
+                    loop.call_soon_threadsafe(
+                        loop.call_later, self.gateway.batch_window, self._flush, self._generation
+                    )
+        if batch:
+            asyncio.run_coroutine_threadsafe(self._send(batch), loop)
+
+    def _take(self) -> List[Tuple[str, float, Future]]:
+        batch, self._pending = self._pending, []
+        self._generation += 1
+        return batch
+
+    def _flush(self, generation: int):
+        with self._lock:
+            if generation != self._generation or not self._pending:
+                return
+            batch = self._take()
+        asyncio.ensure_future(self._send(batch))
+
+    async def _send(self, batch: List[Tuple[str, float, Future]]):
+        queries = [query for query, _, _ in batch]
+        get_tracer().observe("gateway_batch_size", "query_embedding", len(queries))
+        try:
+            embeddings = await self.gateway.asend(
+                lambda: self.embed_model._aget_text_embeddings(queries),
+                tokens=sum(estimate_tokens(query) for query in queries),
+                priority=self.priority,
+                kind="embedding",
+                queued_at=[queued_at for _, queued_at, _ in batch],
+            )
+        except Exception as e:
+            for query, _, future in batch:
+                self.gateway.settle(("query", id(self.embed_model), query), future, error=e)
+            return
+        for (query, _, future), embedding in zip(batch, embeddings):
+            self.gateway.settle(("query", id(self.embed_model), query), future, result=embedding)
+
+
+class ModelGateway:
+    """
+    Process-wide gateway that every LLM and embedding call goes through.
+
+    - One token-bucket limit on requests and tokens is shared by all sessions,
+      with chat calls served ahead of ingestion (see PRIORITIES).
+    - Identical requests in flight at the same time are sent once and share the result.
+    - Query embeddings requested within `batch_window` seconds of each other are
+      sent as one batched request.
+    - Failed requests are retried with jittered backoff.
+    - Sync calls made on the background loop (the async paths of the app
+      don't make any) are sent from a gateway thread with the same rate limit
+      and retries, at chat priority, since every session on the loop waits for
+      them. They don't join identical requests in flight, whose owner may need
+      the loop.
+
+    Queueing delay ("gateway_queue_delay_seconds", per priority) and batch
+    size ("gateway_batch_size") are recorded by the tracer.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float = GATEWAY_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = GATEWAY_TOKENS_PER_MINUTE,
+        chat_reserve: float = GATEWAY_CHAT_RESERVE,
+        batch_window_ms: float = GATEWAY_BATCH_WINDOW_MS,
+        max_batch_size: int = GATEWAY_MAX_BATCH_SIZE,
+        max_retries: int = GATEWAY_MAX_RETRIES,
+    ):
+        """
+        Args:
+            requests_per_minute (float): Provider requests allowed per minute.
+            tokens_per_minute (float): Estimated input tokens allowed per minute.
+            chat_reserve (float): Share of the request burst ingestion leaves for chat.
+            batch_window_ms (float): How long a query embedding waits for others to batch with.
+            max_batch_size (int): Query embeddings per batched request.
+            max_retries (int): Retries of a failed request.
+        """
+        request_capacity = max(1.0, requests_per_minute / 60)
+        self._requests = PriorityTokenBucket(
+            requests_per_minute / 60, request_capacity, reserve=chat_reserve * request_capacity
+        )
+        self._tokens = PriorityTokenBucket(tokens_per_minute / 60, tokens_per_minute / 60)
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.max_retries = max_retries
+        self._inflight: Dict[Any, Future] = {}
+        self._batchers: Dict[Tuple[int, str], _QueryBatcher] = {}
+        self._wrappers: Dict[Tuple[int, str], Any] = {}
+        self._sync_pool: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    # Wrapped clients
+
+    def llm(self, llm: LLM, priority: str = "chat") -> "GatewayLLM":
+        """Returns the LLM routed through the gateway at the given priority, one wrapper per client."""
+        return self._wrap(llm, priority, GatewayLLM)
+
+    def embed_model(self, embed_model: BaseEmbedding, priority: str = "chat") -> "GatewayEmbedding":
+        """Returns the embedding model routed through the gateway at the given priority."""
+        return self._wrap(embed_model, priority, GatewayEmbedding)
+
+    def _wrap(self, client, priority: str, wrapper_cls):
+        if isinstance(client, (GatewayLLM, GatewayEmbedding)):
+            return client
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'. Known: {sorted(PRIORITIES)}.")
+        # The wrapper keeps the client alive, so its id is not reused while cached
+        key = (id(client), priority)
+        with self._lock:
+            wrapper = self._wrappers.get(key)
+            if wrapper is None:
+                wrapper = self._wrappers[key] = wrapper_cls(client, gateway=self, priority=priority)
+        return wrapper
+
+    # Deduplication
+
+    def claim(self, key) -> Tuple[Future, bool]:
+        """
+        Returns the future of the request with this key and whether the caller
+        owns it (must send the request) or joins an identical one in flight.
+        A None key is never shared.
+        """
+        if key is None:
+            return Future(), True
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                get_tracer().increment("gateway_deduplicated_total", str(key[0]))
+                return future, False
+            future = self._inflight[key] = Future()
+            return future, True
+
+    def settle(self, key, future: Future, result=None, error: Optional[BaseException] = None):
+        """Releases the key and hands the outcome to every caller of the request."""
+        if key is not None:
+            with self._lock:
+                self._inflight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    # Sending
+
+    def _observe_queue_delay(self, priority: str, kind: str, queued_at: Sequence[float]):
+        now = time.perf_counter()
+        tracer = get_tracer()
+        for start in queued_at:
+            tracer.observe("gateway_queue_delay_seconds", priority, now - start)
+        tracer.increment("gateway_requests_total", kind)
+
+    def send(self, fn: Callable[[], T], tokens: int, priority: str, kind: str) -> T:
+        """Sends a request under the rate limit, retrying failures with backoff."""
+        level = PRIORITIES[priority]
+        if _on_event_loop():
+            # Off the loop, so the client may run its own loop; at chat priority, since
+            # coroutines waiting for the rate limit can't take their turn meanwhile
+            return self._get_sync_pool().submit(self._send, fn, tokens, 0, priority, kind).result()
+        return self._send(fn, tokens, level, priority, kind)
+
+    def _get_sync_pool(self) -> ThreadPoolExecutor:
+        if self._sync_pool is None:
+            with self._lock:
+                if self._sync_pool is None:
+                    self._sync_pool = ThreadPoolExecutor(thread_name_prefix="gateway-sync")
+        return self._sync_pool
+
+    def _send(self, fn: Callable[[], T], tokens: int, level: int, priority: str, kind: str) -> T:
+        queued_at = [time.perf_counter()]
+
+        def attempt() -> T:
+            self._requests.acquire(1, level)
+            self._tokens.acquire(tokens, level)
+            if queued_at:
+                self._observe_queue_delay(priority, kind, queued_at)
+                queued_at.clear()
+            return fn()
+
+        return retry_with_backoff(attempt, max_retries=self.max_retries)
+
+    async def asend(
+        self, fn: Callable[[], Awaitable[T]], tokens: int, priority: str, kind: str,
+        queued_at: Optional[List[float]] = None,
+    ) -> T:
+        """Async version of send. queued_at holds when each caller of a batch was queued."""
+        level = PRIORITIES[priority]
+        queued_at = list(queued_at or [time.perf_counter()])
+
+        async def attempt() -> T:
+            await self._requests.aacquire(1, level)
+            await self._tokens.aacquire(tokens, level)
+            if queued_at:
+                self._observe_queue_delay(priority, kind, queued_at)
+                queued_at.clear()
+            return await fn()
+
+        return await aretry_with_backoff(attempt, max_retries=self.max_retries)
+
+    def call(self, fn: Callable[[], T], key, tokens: int, priority: str, kind: str) -> T:
+        """Sends a request, or waits for an identical one in flight."""
+        if _on_event_loop():
+            key = None  # waiting on another request's future here could deadlock the loop
+        future, owner = self.claim(key)
+        if not owner:
+            return future.result()
+        try:
+            result = self.send(fn, tokens, priority, kind)
+        except Exception as e:
+            self.settle(key, future, error=e)
+            raise
+        self.settle(key, future, result=result)
+        return result
+
+    async def acall(self, fn: Callable[[], Awaitable[T]], key, tokens: int, priority: str, kind: str) -> T:
+        """Async version of call."""
+        future, owner = self.claim(key)
+        if not owner:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await self.asend(fn, tokens, priority, kind)
+        except Exception as e:
+            self.settle(key, future, error=e)
+            raise
+        self.settle(key, future, result=result)
+        return result
+
+    # Query embeddings
+
+    def _query_future(self, embed_model: BaseEmbedding, query: str, priority: str) -> Future:
+        future, owner = self.claim(("query", id(embed_model), query))
+        if owner:
+            key = (id(embed_model), priority)
+            batcher = self._batchers.get(key)
+            if batcher is None:
+                with self._lock:
+                    batcher = self._batchers.setdefault(key, _QueryBatcher(self, embed_model, priority))
+            batcher.submit(query, future)
+        return future
+
+    def embed_query(self, embed_model: BaseEmbedding, query: str, priority: str = "chat") -> Embedding:
+        """Embeds a query as part of the next micro-batch of this model."""
+        if _on_event_loop():
+            # Waiting for the batch would block the loop that sends it; send this one alone
+            return self.call(
+                lambda: embed_model._get_query_embedding(query), None, estimate_tokens(query), priority, "embedding"
+            )
+        return self._query_future(embed_model, query, priority).result()
+
+    async def aembed_query(self, embed_model: BaseEmbedding, query: str, priority: str = "chat") -> Embedding:
+        """Async version of embed_query."""
+        return await asyncio.wrap_future(self._query_future(embed_model, query, priority))
+
+
+def _messages_tokens(messages: Sequence[ChatMessage]) -> int:
+    return sum(estimate_tokens(message.content or "") for message in messages)
+
+
+class GatewayLLM(LLM):
+    """
+    LLM whose calls go through the model gateway. Prompt formatting and
+    callbacks are the wrapped LLM's, so it can stand in for it anywhere.
+    Identical non-streaming calls in flight at the same time are sent once.
+    """
+
+    llm: SerializeAsAny[LLM] = Field(description="The wrapped provider LLM.")
+    priority: str = Field(default="chat", description="Rate limit priority, see PRIORITIES.")
+    _gateway: ModelGateway = PrivateAttr()
+
+    def __init__(self, llm: LLM, gateway: ModelGateway, priority: str = "chat", **kwargs: Any):
+        super().__init__(
+            llm=llm,
+            priority=priority,
+            callback_manager=llm.callback_manager,
+            system_prompt=llm.system_prompt,
+            messages_to_prompt=llm.messages_to_prompt,
+            completion_to_prompt=llm.completion_to_prompt,
+            **kwargs,
+        )
+        self._gateway = gateway
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "GatewayLLM"
+
+    def to_dict(self, **kwargs: Any) -> Dict[str, Any]:
+        # Same results as the wrapped LLM, so caches keyed by its configuration stay valid
+        return self.llm.to_dict(**kwargs)
+
+    @property
+    def metadata(self) -> LLMMetadata:
+        return self.llm.metadata
+
+    def _key(self, kind: str, request: Any, kwargs: Dict[str, Any]) -> Tuple:
+        return (kind, id(self.llm), repr(request), repr(sorted(kwargs.items())))
+
+    def chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return self._gateway.call(
+            lambda: self.llm.chat(messages, **kwargs), self._key("chat", messages, kwargs),
+            _messages_tokens(messages), self.priority, "llm",
+        )
+
+    def complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return self._gateway.call(
+            lambda: self.llm.complete(prompt, formatted=formatted, **kwargs),
+            self._key("complete", (prompt, formatted), kwargs), estimate_tokens(prompt), self.priority, "llm",
+        )
+
+    def stream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseGen:
+        return self._gateway.call(
+            lambda: self.llm.stream_chat(messages, **kwargs), None, _messages_tokens(messages), self.priority, "llm"
+        )
+
+    def stream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseGen:
+        return self._gateway.call(
+            lambda: self.llm.stream_complete(prompt, formatted=formatted, **kwargs), None,
+            estimate_tokens(prompt), self.priority, "llm",
+        )
+
+    async def achat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponse:
+        return await self._gateway.acall(
+            lambda: self.llm.achat(messages, **kwargs), self._key("chat", messages, kwargs),
+            _messages_tokens(messages), self.priority, "llm",
+        )
+
+    async def acomplete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponse:
+        return await self._gateway.acall(
+            lambda: self.llm.acomplete(prompt, formatted=formatted, **kwargs),
+            self._key("complete", (prompt, formatted), kwargs), estimate_tokens(prompt), self.priority, "llm",
+        )
+
+    async def astream_chat(self, messages: Sequence[ChatMessage], **kwargs: Any) -> ChatResponseAsyncGen:
+        return await self._gateway.acall(
+            lambda: self.llm.astream_chat(messages, **kwargs), None, _messages_tokens(messages), self.priority, "llm"
+        )
+
+    async def astream_complete(self, prompt: str, formatted: bool = False, **kwargs: Any) -> CompletionResponseAsyncGen:
+        return await self._gateway.acall(
+            lambda: self.llm.astream_complete(prompt, formatted=formatted, **kwargs), None,
+            estimate_tokens(prompt), self.priority, "llm",
+        )
+
+
+class GatewayEmbedding(BaseEmbedding):
+    """
+    Embedding model whose requests go through the model gateway. Query
+    embeddings are micro-batched with those of other sessions, which assumes
+    the wrapped model embeds queries and texts alike (true for Gemini and the
+    mock); set batch_queries to False otherwise.
+    """
+
+    embed_model: SerializeAsAny[BaseEmbedding] = Field(description="The wrapped provider embedding model.")
+    priority: str = Field(default="chat", description="Rate limit priority, see PRIORITIES.")
+    batch_queries: bool = Field(default=True, description="Send concurrent query embeddings as one batch.")
+    _gateway: ModelGateway = PrivateAttr()
+
+    def __init__(self, embed_model: BaseEmbedding, gateway: ModelGateway, priority: str = "chat", **kwargs: Any):
+        super().__init__(
+            embed_model=embed_model,
+            priority=priority,
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            callback_manager=embed_model.callback_manager,
+            **kwargs,
+        )
+        self._gateway = gateway
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "GatewayEmbedding"
+
+    def to_dict(self, **kwargs: Any) -> Dict[str, Any]:
+        # Same vectors as the wrapped model, so the ingestion cache keyed by its configuration stays valid
+        return self.embed_model.to_dict(**kwargs)
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        if self.batch_queries:
+            return self._gateway.embed_query(self.embed_model, query, self.priority)
+        return self._gateway.call(
+            lambda: self.embed_model._get_query_embedding(query), ("query", id(self.embed_model), query),
+            estimate_tokens(query), self.priority, "embedding",
+        )
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        if self.batch_queries:
+            return await self._gateway.aembed_query(self.embed_model, query, self.priority)
+        return await self._gateway.acall(
+            lambda: self.embed_model._aget_query_embedding(query), ("query", id(self.embed_model), query),
+            estimate_tokens(query), self.priority, "embedding",
+        )
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._gateway.call(
+            lambda: self.embed_model._get_text_embedding(text), ("text", id(self.embed_model), text),
+            estimate_tokens(text), self.priority, "embedding",
+        )
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return await self._gateway.acall(
+            lambda: self.embed_model._aget_text_embedding(text), ("text", id(self.embed_model), text),
+            estimate_tokens(text), self.priority, "embedding",
+        )
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        # Already a batch: rate limited and retried as one request
+        return self._gateway.send(
+            lambda: self.embed_model._get_text_embeddings(texts),
+            sum(estimate_tokens(text) for text in texts), self.priority, "embedding",
+        )
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return await self._gateway.asend(
+            lambda: self.embed_model._aget_text_embeddings(texts),
+            sum(estimate_tokens(text) for text in texts), self.priority, "embedding",
+        )
+
+
+_gateway: Optional[ModelGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> ModelGateway:
+    """Returns the process-wide model gateway."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = ModelGateway()
+                logger.info("Started model gateway.")
+    return _gateway
+
+
+def set_gateway(gateway: ModelGateway):
+    """Replaces the process-wide gateway, e.g. with other limits in a worker process."""
+    global _gateway
+    with _gateway_lock:
+        _gateway = gateway
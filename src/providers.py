@@ -0,0 +1,152 @@
+# src/providers.py
+import os
+import sys
+import threading
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+from loguru import logger
+from src.global_settings import (
+    LLM_PROVIDER, CHAT_LLM_MODEL, INGEST_LLM_MODEL, EMBED_MODEL, EMBED_BATCH_SIZE, GATEWAY_ENABLED
+)
+
+
+class Provider(NamedTuple):
+    """
+    Factories of one model provider. Each factory imports its SDK when called,
+    so registering a provider costs nothing at import time.
+    """
+    llm: Callable[[str, Optional[str]], Any]  # (model, api_key) -> LLM
+    embedding: Callable[[str, Optional[str]], Any]  # (model, api_key) -> embedding model
+    api_key: Optional[Callable[[], Optional[str]]] = None  # looks up the key when none is passed
+
+
+class MissingAPIKeyError(EnvironmentError):
+    """Raised when a provider needs an API key and none is configured."""
+
+
+def get_google_api_key() -> Optional[str]:
+    """
+    Retrieves the Google API key from the environment, or from the Streamlit
+    secrets when running inside the Streamlit app. Streamlit is never imported here.
+    """
+    key = os.getenv("GOOGLE_API_KEY")
+    if key:
+        return key
+    st = sys.modules.get("streamlit")
+    if st is not None:
+        try:
+            return st.secrets.google.GOOGLE_API_KEY
+        except Exception:
+            # No secrets file, or not running with `streamlit run`
+            pass
+    return None
+
+
+def _gemini_llm(model: str, api_key: Optional[str]):
+    import google.generativeai as genai
+    from llama_index.llms.gemini import Gemini
+
+    genai.configure(api_key=api_key)
+    return Gemini(model=model, temperature=0.2, api_key=api_key)
+
+
+def _gemini_embedding(model: str, api_key: Optional[str]):
+    import google.generativeai as genai
+    from llama_index.embeddings.gemini import GeminiEmbedding
+
+    genai.configure(api_key=api_key)
+    return GeminiEmbedding(model_name=model, api_key=api_key, embed_batch_size=EMBED_BATCH_SIZE)
+
+
+def _mock_llm(model: str, api_key: Optional[str]):
+    from src.mock_models import MockLLM
+    return MockLLM()
+
+
+def _mock_embedding(model: str, api_key: Optional[str]):
+    from src.mock_models import MockEmbedding
+    return MockEmbedding()
+
+
+PROVIDERS: Dict[str, Provider] = {
+    "gemini": Provider(_gemini_llm, _gemini_embedding, api_key=get_google_api_key),
+    "mock": Provider(_mock_llm, _mock_embedding),
+}
+
+_clients: Dict[Tuple, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def register_provider(name: str, llm: Callable, embedding: Callable, api_key: Optional[Callable] = None):
+    """Adds or replaces a provider. The factories should import their SDK inside the call."""
+    PROVIDERS[name] = Provider(llm, embedding, api_key)
+
+
+def _get_client(kind: str, provider: str, model: str, api_key: Optional[str]):
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown model provider '{provider}'. Registered: {sorted(PROVIDERS)}.")
+    spec = PROVIDERS[provider]
+    if api_key is None and spec.api_key is not None:
+        api_key = spec.api_key()
+        if not api_key:
+            raise MissingAPIKeyError(f"No API key found for the '{provider}' provider.")
+
+    key = (kind, provider, model, api_key)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = (spec.llm if kind == "llm" else spec.embedding)(model, api_key)
+                _clients[key] = client
+                logger.info(f"Created {provider} {kind} client for '{model}'.")
+    return client
+
+
+def get_llm(
+    model: str = CHAT_LLM_MODEL, provider: str = LLM_PROVIDER, api_key: Optional[str] = None, priority: str = "chat"
+):
+    """
+    Returns the LLM client of a provider, imported and constructed on first
+    use and shared afterwards. With GATEWAY_ENABLED, its calls go through the
+    process-wide model gateway (src.model_gateway).
+
+    Args:
+        model (str): Model name. Defaults to CHAT_LLM_MODEL.
+        provider (str): Registered provider name. Defaults to LLM_PROVIDER.
+        api_key (str): API key. Looked up by the provider when omitted.
+        priority (str): Gateway priority, "chat" or "ingest".
+
+    Raises:
+        EnvironmentError: When the provider needs an API key and none is found.
+    """
+    client = _get_client("llm", provider, model, api_key)
+    if GATEWAY_ENABLED:
+        from src.model_gateway import get_gateway
+        client = get_gateway().llm(client, priority)
+    return client
+
+
+def get_embed_model(
+    model: str = EMBED_MODEL, provider: str = LLM_PROVIDER, api_key: Optional[str] = None, priority: str = "chat"
+):
+    """Returns the embedding client of a provider, like get_llm."""
+    client = _get_client("embedding", provider, model, api_key)
+    if GATEWAY_ENABLED:
+        from src.model_gateway import get_gateway
+        client = get_gateway().embed_model(client, priority)
+    return client
+
+
+def configure_settings(provider: str = LLM_PROVIDER, api_key: Optional[str] = None):
+    """
+    Sets the global LlamaIndex LLM and embedding model for ingestion scripts,
+    at the gateway's ingestion priority. Called explicitly by scripts;
+    importing this module has no side effects.
+
+    Raises:
+        EnvironmentError: When the provider needs an API key and none is found.
+    """
+    from llama_index.core import Settings
+
+    Settings.llm = get_llm(INGEST_LLM_MODEL, provider, api_key, priority="ingest")
+    Settings.embed_model = get_embed_model(EMBED_MODEL, provider, api_key, priority="ingest")
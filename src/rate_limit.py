@@ -0,0 +1,145 @@
+# src/rate_limit.py
+import asyncio
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, TypeVar
+from loguru import logger
+
+T = TypeVar("T")
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. `rate` tokens are added per second up to `capacity`;
+    callers block (or await) until enough tokens are available.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        """Takes the tokens and returns how long the caller must wait for them."""
+        # Requests larger than the bucket would never fit; let them through at full capacity.
+        tokens = min(tokens, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens: float = 1) -> None:
+        """Blocks until `tokens` are available."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, tokens: float = 1) -> None:
+        """Async version of acquire that does not block the event loop."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class PriorityTokenBucket(TokenBucket):
+    """
+    Token bucket shared by callers of different priorities, 0 being the most
+    urgent. A caller only takes tokens while no more urgent caller is waiting,
+    and callers below priority 0 leave `reserve` tokens in the bucket, so a
+    burst of background work can't hold up interactive calls.
+    """
+
+    def __init__(self, rate: float, capacity: float, reserve: float = 0.0):
+        super().__init__(rate, capacity)
+        self.reserve = min(reserve, capacity)
+        self._waiting: Dict[int, int] = {}  # priority -> callers waiting for tokens
+
+    def _try_take(self, tokens: float, priority: int) -> float:
+        """Takes the tokens and returns 0, or returns how long to wait before trying again."""
+        floor = self.reserve if priority else 0.0
+        tokens = min(tokens, self.capacity - floor) if self.capacity > floor else 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            urgent_waiting = any(count for level, count in self._waiting.items() if level < priority)
+            if not urgent_waiting and self._tokens - tokens >= floor:
+                self._tokens -= tokens
+                return 0.0
+            if urgent_waiting:
+                # Check again once the more urgent caller could have been served
+                return max(max(tokens, 1.0) / self.rate, 0.001)
+            return max((tokens + floor - self._tokens) / self.rate, 0.001)
+
+    def _set_waiting(self, priority: int, delta: int):
+        with self._lock:
+            self._waiting[priority] = self._waiting.get(priority, 0) + delta
+
+    def acquire(self, tokens: float = 1, priority: int = 0) -> None:
+        """Blocks until `tokens` are available to a caller of this priority."""
+        wait = self._try_take(tokens, priority)
+        if not wait:
+            return
+        self._set_waiting(priority, 1)
+        try:
+            while wait:
+                time.sleep(wait)
+                wait = self._try_take(tokens, priority)
+        finally:
+            self._set_waiting(priority, -1)
+
+    async def aacquire(self, tokens: float = 1, priority: int = 0) -> None:
+        """Async version of acquire that does not block the event loop."""
+        wait = self._try_take(tokens, priority)
+        if not wait:
+            return
+        self._set_waiting(priority, 1)
+        try:
+            while wait:
+                await asyncio.sleep(wait)
+                wait = self._try_take(tokens, priority)
+        finally:
+            self._set_waiting(priority, -1)
+
+
+def backoff_delay(attempt: int, base_delay: float = 1.0, max_delay: float = 60.0) -> float:
+    """Exponential backoff with full jitter for the given attempt (0-based)."""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def retry_with_backoff(fn: Callable[[], T], max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0) -> T:
+    """Calls fn, retrying failures with jittered exponential backoff."""
+    for attempt in range(max_retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            logger.warning(f"Call failed ({e}). Retrying in {delay:.1f}s ({attempt + 1}/{max_retries}).")
+            time.sleep(delay)
+
+
+async def aretry_with_backoff(fn: Callable[[], Awaitable[T]], max_retries: int = 5, base_delay: float = 1.0, max_delay: float = 60.0) -> T:
+    """Async version of retry_with_backoff; fn must return a new awaitable per call."""
+    for attempt in range(max_retries + 1):
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt, base_delay, max_delay)
+            logger.warning(f"Call failed ({e}). Retrying in {delay:.1f}s ({attempt + 1}/{max_retries}).")
+            await asyncio.sleep(delay)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token) used for rate limiting."""
+    return max(1, len(text) // 4)
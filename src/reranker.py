@@ -0,0 +1,96 @@
+# src/reranker.py
+import os
+from typing import List, Optional, Sequence
+import numpy as np
+from loguru import logger
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import MetadataMode, NodeWithScore, QueryBundle
+from src.global_settings import RERANKER_MODEL_PATH, SIMILARITY_TOP_K
+from src.lexical_index import term_set, tokenize
+
+
+class LexicalOverlapScorer:
+    """Scores a text by the share of distinct query terms it contains. No model, microseconds per text."""
+
+    name = "lexical-overlap"
+
+    def score(self, query: str, texts: Sequence[str]) -> np.ndarray:
+        terms = set(tokenize(query))
+        if not terms:
+            return np.zeros(len(texts), dtype=np.float32)
+        return np.array([len(terms & term_set(text)) / len(terms) for text in texts], dtype=np.float32)
+
+
+class CrossEncoderScorer:
+    """
+    Local `transformers` cross-encoder (e.g. a ms-marco MiniLM reranker saved
+    with save_pretrained). All (query, text) pairs are scored in one batched
+    forward pass on the CPU.
+    """
+
+    def __init__(self, model_path: str, max_length: int = 512):
+        # Imported lazily: torch and transformers are only needed when a model is on disk.
+        import torch
+        from transformers import AutoModelForSequenceClassification, AutoTokenizer
+
+        self.name = f"cross-encoder:{os.path.basename(os.path.normpath(model_path))}"
+        self._torch = torch
+        self._tokenizer = AutoTokenizer.from_pretrained(model_path)
+        self._model = AutoModelForSequenceClassification.from_pretrained(model_path).eval()
+        self._max_length = max_length
+
+    def score(self, query: str, texts: Sequence[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros(0, dtype=np.float32)
+        inputs = self._tokenizer(
+            [query] * len(texts), list(texts),
+            padding=True, truncation=True, max_length=self._max_length, return_tensors="pt"
+        )
+        with self._torch.no_grad():
+            logits = self._model(**inputs).logits
+        # Single-logit models give a relevance score; two-label models give [irrelevant, relevant]
+        return logits[:, -1].float().numpy()
+
+
+def get_scorer(model_path: str = RERANKER_MODEL_PATH):
+    """The cross-encoder if one is saved at model_path and transformers is installed, else lexical overlap."""
+    if os.path.isdir(model_path):
+        try:
+            scorer = CrossEncoderScorer(model_path)
+            logger.info(f"Reranking with {scorer.name}.")
+            return scorer
+        except ImportError as e:
+            logger.warning(f"Cross-encoder at {model_path} needs transformers and torch ({e}); using lexical overlap.")
+    return LexicalOverlapScorer()
+
+
+class RerankPostprocessor(BaseNodePostprocessor):
+    """
+    Reranks the retrieved candidates in one batched scorer call and keeps the
+    best `top_n`, so recall comes from a wide candidate set while synthesis
+    still only sees a few nodes.
+    """
+
+    top_n: int = Field(default=SIMILARITY_TOP_K, gt=0)
+    _scorer = PrivateAttr()
+
+    def __init__(self, scorer=None, **kwargs):
+        super().__init__(**kwargs)
+        self._scorer = scorer or get_scorer()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "RerankPostprocessor"
+
+    def _postprocess_nodes(
+        self, nodes: List[NodeWithScore], query_bundle: Optional[QueryBundle] = None
+    ) -> List[NodeWithScore]:
+        if query_bundle is None or len(nodes) <= 1:
+            return nodes[:self.top_n]
+        scores = self._scorer.score(
+            query_bundle.query_str, [node.node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        )
+        # Stable sort: equal scores keep the retriever's order
+        order = sorted(range(len(nodes)), key=lambda i: -scores[i])[:self.top_n]
+        return [NodeWithScore(node=nodes[i].node, score=float(scores[i])) for i in order]
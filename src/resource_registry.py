@@ -0,0 +1,151 @@
+# src/resource_registry.py
+import hashlib
+import os
+import threading
+from typing import Any, NamedTuple, Optional, Tuple
+from loguru import logger
+from llama_index.core import load_index_from_storage, Settings
+from src.global_settings import INDEX_STORAGE
+from src.providers import get_embed_model, get_llm
+from src.tracing import span
+from src.semantic_cache import SemanticCache, SemanticCacheQueryEngine
+from src.retrieval import build_query_engine
+from src.vector_store import create_storage_context
+
+
+class SharedResources(NamedTuple):
+    """Snapshot of the process-wide objects shared by every chat session."""
+    llm: Any
+    index: Any
+    query_engine: Any
+    version: Tuple
+
+
+def storage_signature(persist_dir: str = INDEX_STORAGE) -> Tuple:
+    """
+    Returns a cheap fingerprint of the persisted index: (name, size, mtime) of
+    every file under persist_dir. Only stats the files, nothing is parsed.
+    """
+    entries = []
+    for root, _, files in os.walk(persist_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((os.path.relpath(path, persist_dir), stat.st_size, stat.st_mtime_ns))
+    return tuple(sorted(entries))
+
+
+def version_hash(version: Tuple) -> str:
+    """Short stable id of a storage signature."""
+    return hashlib.sha256(repr(version).encode("utf-8")).hexdigest()[:16]
+
+
+class ResourceRegistry:
+    """
+    Thread-safe, lazily-initialized holder for the expensive chat resources.
+
+    One LLM client, one loaded index and one query engine live per process;
+    Streamlit sessions only build their own memory and agent wrapper around them.
+    The index is reloaded automatically when the files under persist_dir change.
+    Models passed in (e.g. the local stand-ins of src.mock_models) replace the
+    provider clients, which are otherwise created by src.providers on first use.
+    With index_format="mmap" the index is mapped from its src.mmap_store export
+    instead of being parsed from the JSON stores. Without semantic_cache the
+    query engine always runs retrieval and synthesis (evaluation needs this).
+    """
+
+    def __init__(
+        self, persist_dir: str = INDEX_STORAGE, llm=None, embed_model=None, index_format: str = "json",
+        semantic_cache: bool = True
+    ):
+        self.persist_dir = persist_dir
+        self.index_format = index_format
+        self.semantic_cache = semantic_cache
+        self._lock = threading.Lock()
+        self._llm = llm
+        self._embed_model = embed_model
+        self._resources: Optional[SharedResources] = None
+
+    def _get_models(self, api_key: Optional[str]):
+        if self._llm is None:
+            self._llm = get_llm(api_key=api_key)
+            self._embed_model = get_embed_model(api_key=api_key)
+            Settings.llm = self._llm
+            Settings.embed_model = self._embed_model
+            logger.info("Shared LLM and embedding clients created.")
+        return self._llm, self._embed_model
+
+    def _load(self, llm, embed_model, version: Tuple) -> SharedResources:
+        if self.index_format == "mmap":
+            # Imported here: src.mmap_store builds on this module
+            from src.mmap_store import MmapIndex, store_path
+            index = MmapIndex(store_path(self.persist_dir), embed_model=embed_model)
+        else:
+            # Only the docstore/index store JSON is parsed; with the Chroma backend
+            # the vectors stay on disk in the HNSW collection.
+            storage_context = create_storage_context(persist_dir=self.persist_dir)
+            index = load_index_from_storage(
+                storage_context, index_id="vector", embed_model=embed_model
+            )
+        # Hybrid vector + BM25 retrieval when the lexical index is present
+        query_engine = build_query_engine(index, llm, self.persist_dir)
+        if self.semantic_cache:
+            # Near-identical questions are answered from the cache; a new index version invalidates it
+            query_engine = SemanticCacheQueryEngine(
+                query_engine,
+                embed_model=embed_model,
+                cache=SemanticCache(index_version=version_hash(version))
+            )
+        logger.info(f"Index loaded from storage ({len(version)} files).")
+        return SharedResources(llm=llm, index=index, query_engine=query_engine, version=version)
+
+    def get(self, api_key: Optional[str] = None) -> SharedResources:
+        """
+        Returns the shared resources, loading them on first use and reloading
+        them if the persisted index changed on disk since the last load.
+        """
+        version = storage_signature(self.persist_dir)
+        resources = self._resources
+        if resources is not None and resources.version == version:
+            return resources
+
+        with self._lock:
+            # Another thread may have (re)loaded while we waited for the lock.
+            resources = self._resources
+            if resources is not None and resources.version == version:
+                return resources
+            if resources is not None:
+                logger.info("Index files changed on disk. Reloading shared index.")
+            llm, embed_model = self._get_models(api_key)
+            with span("load_index"):
+                self._resources = self._load(llm, embed_model, version)
+            return self._resources
+
+    def semantic_cache_metrics(self) -> dict:
+        """Hit rate and latency saved by the dsm5 semantic cache (empty before the first load)."""
+        resources = self._resources
+        if resources is None or not isinstance(resources.query_engine, SemanticCacheQueryEngine):
+            return {}
+        return resources.query_engine.cache.metrics()
+
+    def invalidate(self):
+        """Drops the loaded index so the next call to get() reloads it."""
+        with self._lock:
+            self._resources = None
+
+
+_registry = ResourceRegistry()
+
+
+def get_registry() -> ResourceRegistry:
+    """Returns the process-wide resource registry."""
+    return _registry
+
+
+def set_registry(registry: ResourceRegistry):
+    """Replaces the process-wide resource registry, e.g. with one over the mmap export in chat workers."""
+    global _registry
+    _registry = registry
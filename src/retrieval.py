@@ -0,0 +1,112 @@
+# src/retrieval.py
+import os
+from typing import Dict, List, Optional
+from loguru import logger
+from llama_index.core.base.base_retriever import BaseRetriever
+from llama_index.core.query_engine import RetrieverQueryEngine
+from llama_index.core.retrievers import AutoMergingRetriever
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from src.global_settings import (
+    INDEX_STORAGE, LEXICAL_INDEX_FILE, SIMILARITY_TOP_K, HYBRID_CANDIDATES, RRF_K,
+    RERANK_ENABLED, RERANK_CANDIDATES, CHUNKING_MODE, AUTO_MERGE_RATIO, AUTO_MERGE_LEAF_TOP_K
+)
+from src.lexical_index import LexicalIndex
+from src.reranker import RerankPostprocessor
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Fuses vector hits with BM25 hits of the lexical index by reciprocal rank
+    fusion: a node scores sum(1 / (rrf_k + rank)) over the lists it appears in.
+    Exact terms and diagnostic codes that embeddings miss are found lexically.
+    """
+
+    def __init__(self, vector_retriever: BaseRetriever, lexical_index: LexicalIndex, docstore,
+                 lexical_top_k: int = HYBRID_CANDIDATES, top_k: int = SIMILARITY_TOP_K, rrf_k: int = RRF_K):
+        super().__init__(callback_manager=vector_retriever.callback_manager)
+        self._vector_retriever = vector_retriever
+        self._lexical_index = lexical_index
+        self._docstore = docstore
+        self._lexical_top_k = lexical_top_k
+        self._top_k = top_k
+        self._rrf_k = rrf_k
+
+    def _fuse(self, vector_hits: List[NodeWithScore], query_bundle: QueryBundle) -> List[NodeWithScore]:
+        lexical_hits = self._lexical_index.search(query_bundle.query_str, self._lexical_top_k)
+        scores: Dict[str, float] = {}
+        nodes = {}
+        for rank, hit in enumerate(vector_hits):
+            scores[hit.node.node_id] = scores.get(hit.node.node_id, 0.0) + 1 / (self._rrf_k + rank + 1)
+            nodes[hit.node.node_id] = hit.node
+        for rank, (node_id, _) in enumerate(lexical_hits):
+            scores[node_id] = scores.get(node_id, 0.0) + 1 / (self._rrf_k + rank + 1)
+        best = sorted(scores, key=scores.get, reverse=True)[:self._top_k]
+        missing = [node_id for node_id in best if node_id not in nodes]
+        if missing:
+            found = [node for node in self._docstore.get_nodes(missing, raise_error=False) if node is not None]
+            nodes.update({node.node_id: node for node in found})
+            if len(found) < len(missing):
+                # Chroma indexes built before leaves were kept in the docstore have only parents there
+                logger.warning(f"{len(missing) - len(found)} lexical hits are not in the docstore; rebuild the index.")
+        return [NodeWithScore(node=nodes[node_id], score=scores[node_id]) for node_id in best if node_id in nodes]
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return self._fuse(self._vector_retriever.retrieve(query_bundle), query_bundle)
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        return self._fuse(await self._vector_retriever.aretrieve(query_bundle), query_bundle)
+
+
+class MergingRetriever(AutoMergingRetriever):
+    """
+    AutoMergingRetriever over any base retriever (it only calls retrieve) whose
+    async path awaits the base retriever instead of running it synchronously.
+    """
+
+    async def _aretrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        nodes, changed = self._try_merging(await self._vector_retriever.aretrieve(query_bundle))
+        while changed:
+            nodes, changed = self._try_merging(nodes)
+        nodes.sort(key=lambda node: node.get_score(), reverse=True)
+        return nodes
+
+
+def build_retriever(index, persist_dir: str = INDEX_STORAGE, top_k: int = SIMILARITY_TOP_K,
+                    auto_merge: bool = CHUNKING_MODE == "hierarchical") -> BaseRetriever:
+    """
+    The dsm5 retriever returning top_k nodes: hybrid vector + BM25 when the
+    lexical index was built with the vector index, vector-only otherwise.
+    With auto_merge, leaves whose siblings were mostly retrieved too are
+    replaced by their parent node, so fewer but complete blocks are returned.
+    """
+    lexical_path = os.path.join(persist_dir, os.path.basename(LEXICAL_INDEX_FILE))
+    if not os.path.exists(lexical_path):
+        logger.warning(f"No lexical index at {lexical_path}; using vector retrieval only. Run build_data.py to build it.")
+        retriever = index.as_retriever(similarity_top_k=top_k)
+    else:
+        retriever = HybridRetriever(
+            index.as_retriever(similarity_top_k=max(HYBRID_CANDIDATES, top_k)),
+            LexicalIndex.load(lexical_path),
+            index.docstore,
+            lexical_top_k=max(HYBRID_CANDIDATES, top_k),
+            top_k=top_k,
+        )
+    if not auto_merge:
+        return retriever
+    return MergingRetriever(retriever, index.storage_context, simple_ratio_thresh=AUTO_MERGE_RATIO)
+
+
+def build_query_engine(index, llm, persist_dir: str = INDEX_STORAGE, rerank: bool = RERANK_ENABLED) -> RetrieverQueryEngine:
+    """
+    Composes the dsm5 query engine over the loaded index. With rerank,
+    RERANK_CANDIDATES nodes are retrieved and the reranker keeps SIMILARITY_TOP_K.
+    With hierarchical chunking, AUTO_MERGE_LEAF_TOP_K leaves are retrieved and merged.
+    """
+    if not rerank:
+        top_k = AUTO_MERGE_LEAF_TOP_K if CHUNKING_MODE == "hierarchical" else SIMILARITY_TOP_K
+        return RetrieverQueryEngine.from_args(build_retriever(index, persist_dir, top_k=top_k), llm=llm)
+    return RetrieverQueryEngine.from_args(
+        build_retriever(index, persist_dir, top_k=RERANK_CANDIDATES),
+        llm=llm,
+        node_postprocessors=[RerankPostprocessor(top_n=SIMILARITY_TOP_K)],
+    )
@@ -0,0 +1,147 @@
+# src/score_ledger.py
+import json
+import os
+import threading
+from typing import List, Optional
+from loguru import logger
+from src.global_settings import SCORES_DB, SCORES_FILE
+from src.background_writer import BackgroundWriter
+from src.sqlite_utils import connect
+
+
+class ScoreLedger:
+    """
+    Append-only ledger of mental health scores stored in SQLite.
+
+    Every append is one locked INSERT, so concurrent agents can't lose entries,
+    and the (username, time) index keeps "last N scores for a user" queries
+    from scanning the whole ledger.
+    """
+
+    def __init__(self, db_path: str = SCORES_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = connect(db_path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " username TEXT NOT NULL,"
+            " time TEXT NOT NULL,"
+            " score TEXT,"
+            " content TEXT,"
+            " total_guess TEXT)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_scores_user_time ON scores (username, time)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY)"
+        )
+        # A single writer thread keeps appends ordered, batched and off the chat turn.
+        self._writer = BackgroundWriter(self._conn, self._lock, name="score-ledger-writer")
+
+    def append(self, username: str, time: str, score: str, content: str, total_guess: str) -> None:
+        """Atomically appends one score entry."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO scores (username, time, score, content, total_guess) VALUES (?, ?, ?, ?, ?)",
+                (username, time, score, content, total_guess),
+            )
+
+    def submit(self, username: str, time: str, score: str, content: str, total_guess: str) -> None:
+        """Queues an append on the writer thread and returns immediately."""
+        self._writer.submit([(
+            "INSERT INTO scores (username, time, score, content, total_guess) VALUES (?, ?, ?, ?, ?)",
+            (username, time, score, content, total_guess),
+        )])
+
+    def last_scores(self, username: str, n: int = 10) -> List[dict]:
+        """Returns the n most recent entries of a user, newest first, including queued ones."""
+        self._writer.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT username, time, score, content, total_guess FROM scores"
+                " WHERE username = ? ORDER BY time DESC, id DESC LIMIT ?",
+                (username, n),
+            ).fetchall()
+        return [
+            {"usename": row[0], "Time": row[1], "Score": row[2], "Content": row[3], "Total guess": row[4]}
+            for row in rows
+        ]
+
+    def import_json(self, json_path: str = SCORES_FILE) -> int:
+        """
+        Bulk-imports the legacy scores.json list once, in a single transaction.
+        The migration mark is checked again inside the transaction, so when
+        several processes start at once only one of them imports the file.
+
+        Returns:
+            int: Number of imported entries.
+        """
+        with self._lock:
+            done = self._conn.execute(
+                "SELECT 1 FROM migrations WHERE name = ?", (json_path,)
+            ).fetchone()
+        if done or not os.path.exists(json_path) or os.path.getsize(json_path) == 0:
+            return 0
+
+        try:
+            with open(json_path, "r") as f:
+                data: list = json.load(f)
+        except json.JSONDecodeError as e:
+            logger.error(f"Error loading scores file: {e}. Skipping import.")
+            return 0
+
+        rows = [
+            (entry.get("usename"), entry.get("Time"), entry.get("Score"),
+             entry.get("Content"), entry.get("Total guess"))
+            for entry in data
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._conn.execute("SELECT 1 FROM migrations WHERE name = ?", (json_path,)).fetchone():
+                    self._conn.execute("ROLLBACK")
+                    return 0  # imported by another process since the first check
+                self._conn.executemany(
+                    "INSERT INTO scores (username, time, score, content, total_guess) VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute("INSERT INTO migrations (name) VALUES (?)", (json_path,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        logger.success(f"Imported {len(rows)} score entries from {json_path}.")
+        return len(rows)
+
+    def close(self):
+        """Waits for queued appends and closes the database."""
+        self._writer.close()
+        with self._lock:
+            self._conn.close()
+
+
+_ledger: Optional[ScoreLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_score_ledger() -> ScoreLedger:
+    """Returns the process-wide score ledger, importing SCORES_FILE on first use."""
+    global _ledger
+    if _ledger is None:
+        with _ledger_lock:
+            if _ledger is None:
+                ledger = ScoreLedger()
+                ledger.import_json(SCORES_FILE)
+                _ledger = ledger
+    return _ledger
+
+
+def close_score_ledger():
+    """Flushes and closes the process-wide score ledger, if it was opened."""
+    global _ledger
+    with _ledger_lock:
+        if _ledger is not None:
+            _ledger.close()
+            _ledger = None
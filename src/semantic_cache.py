@@ -0,0 +1,204 @@
+# src/semantic_cache.py
+import json
+import threading
+import time
+from typing import List, Optional
+import numpy as np
+from loguru import logger
+from llama_index.core.base.base_query_engine import BaseQueryEngine
+from llama_index.core.base.response.schema import RESPONSE_TYPE, Response
+from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.constants import DATA_KEY
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
+from src.global_settings import (
+    SEMANTIC_CACHE_DB, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TTL_SECONDS, SEMANTIC_CACHE_MAX_ENTRIES
+)
+from src.sqlite_utils import connect
+
+
+def _serialize_sources(source_nodes: List[NodeWithScore]) -> str:
+    sources = []
+    for node_with_score in source_nodes:
+        node_json = doc_to_json(node_with_score.node)
+        node_json[DATA_KEY]["embedding"] = None
+        sources.append({"node": node_json, "score": node_with_score.score})
+    return json.dumps(sources, ensure_ascii=False)
+
+
+def _deserialize_sources(payload: str) -> List[NodeWithScore]:
+    return [
+        NodeWithScore(node=json_to_doc(source["node"]), score=source["score"])
+        for source in json.loads(payload)
+    ]
+
+
+class SemanticCache:
+    """
+    Persistent cache of query engine answers looked up by query embedding similarity.
+
+    Entries are stored in SQLite and mirrored in an in-memory matrix of
+    normalized embeddings, so a lookup is one matrix-vector product. Entries
+    expire after `ttl_seconds`, the least recently used ones are evicted past
+    `max_entries`, and entries built against another index version are dropped.
+    """
+
+    def __init__(
+        self,
+        index_version: str,
+        db_path: str = SEMANTIC_CACHE_DB,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        ttl_seconds: float = SEMANTIC_CACHE_TTL_SECONDS,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+    ):
+        self.index_version = index_version
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lookup_seconds = 0.0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+        self._conn = connect(db_path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " index_version TEXT NOT NULL,"
+            " query TEXT NOT NULL,"
+            " embedding BLOB NOT NULL,"
+            " response TEXT,"
+            " sources TEXT NOT NULL,"
+            " compute_seconds REAL NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        # Answers computed against an older index are stale
+        deleted = self._conn.execute(
+            "DELETE FROM entries WHERE index_version != ? OR created < ?",
+            (index_version, time.time() - ttl_seconds),
+        ).rowcount
+        if deleted:
+            logger.info(f"Semantic cache dropped {deleted} stale entries.")
+        rows = self._conn.execute("SELECT id, embedding FROM entries").fetchall()
+        self._ids: List[int] = [row[0] for row in rows]
+        self._matrix = (
+            np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+            if rows else None
+        )
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def lookup(self, embedding: List[float]) -> Optional[Response]:
+        """Returns the stored response of the most similar cached query above the threshold."""
+        start = time.perf_counter()
+        with self._lock:
+            match = self._best_match(self._normalize(embedding))
+            if match is not None:
+                row = self._conn.execute(
+                    "SELECT response, sources, compute_seconds, created FROM entries WHERE id = ?", (match,)
+                ).fetchone()
+                if row is None or time.time() - row[3] > self.ttl_seconds:
+                    self._remove([match])
+                    row = None
+                else:
+                    self._conn.execute("UPDATE entries SET accessed = ? WHERE id = ?", (time.time(), match))
+            else:
+                row = None
+            elapsed = time.perf_counter() - start
+            self.lookup_seconds += elapsed
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.saved_seconds += max(0.0, row[2] - elapsed)
+        return Response(response=row[0], source_nodes=_deserialize_sources(row[1]), metadata={"semantic_cache": True})
+
+    def _best_match(self, query: np.ndarray) -> Optional[int]:
+        if self._matrix is None:
+            return None
+        scores = self._matrix @ query
+        best = int(np.argmax(scores))
+        return self._ids[best] if scores[best] >= self.threshold else None
+
+    def _remove(self, ids: List[int]):
+        self._conn.executemany("DELETE FROM entries WHERE id = ?", [(entry_id,) for entry_id in ids])
+        removed = set(ids)
+        keep = [i for i, entry_id in enumerate(self._ids) if entry_id not in removed]
+        self._ids = [self._ids[i] for i in keep]
+        self._matrix = self._matrix[keep] if keep else None
+
+    def store(self, query: str, embedding: List[float], response: Response, compute_seconds: float):
+        """Stores an answer, evicting least recently used entries past max_entries."""
+        vector = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO entries (index_version, query, embedding, response, sources, compute_seconds, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (self.index_version, query, vector.tobytes(), response.response,
+                 _serialize_sources(response.source_nodes), compute_seconds, now, now),
+            )
+            self._ids.append(cursor.lastrowid)
+            self._matrix = vector[None, :] if self._matrix is None else np.vstack([self._matrix, vector])
+            overflow = len(self._ids) - self.max_entries
+            if overflow > 0:
+                evicted = [row[0] for row in self._conn.execute(
+                    "SELECT id FROM entries ORDER BY accessed LIMIT ?", (overflow,)
+                ).fetchall()]
+                self._remove(evicted)
+
+    def metrics(self) -> dict:
+        """Hit rate, lookup overhead and time saved by serving cached answers."""
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._ids),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "avg_lookup_ms": round(1000 * self.lookup_seconds / lookups, 3) if lookups else 0.0,
+            "latency_saved_s": round(self.saved_seconds, 2),
+        }
+
+
+class SemanticCacheQueryEngine(BaseQueryEngine):
+    """
+    Query engine wrapper that answers from the semantic cache when a similar
+    question was already asked, and otherwise queries the wrapped engine and
+    stores its answer. The query embedding is reused by the wrapped retriever.
+    """
+
+    def __init__(self, query_engine: BaseQueryEngine, embed_model, cache: SemanticCache):
+        super().__init__(callback_manager=query_engine.callback_manager)
+        self._query_engine = query_engine
+        self._embed_model = embed_model
+        self.cache = cache
+
+    def _get_prompt_modules(self):
+        return {"query_engine": self._query_engine}
+
+    def _query(self, query_bundle: QueryBundle) -> RESPONSE_TYPE:
+        if query_bundle.embedding is None:
+            query_bundle.embedding = self._embed_model.get_query_embedding(query_bundle.query_str)
+        cached = self.cache.lookup(query_bundle.embedding)
+        if cached is not None:
+            logger.info(f"Semantic cache hit for query: {query_bundle.query_str}")
+            return cached
+        start = time.perf_counter()
+        response = self._query_engine.query(query_bundle)
+        self.cache.store(query_bundle.query_str, query_bundle.embedding, response, time.perf_counter() - start)
+        return response
+
+    async def _aquery(self, query_bundle: QueryBundle) -> RESPONSE_TYPE:
+        if query_bundle.embedding is None:
+            query_bundle.embedding = await self._embed_model.aget_query_embedding(query_bundle.query_str)
+        cached = self.cache.lookup(query_bundle.embedding)
+        if cached is not None:
+            logger.info(f"Semantic cache hit for query: {query_bundle.query_str}")
+            return cached
+        start = time.perf_counter()
+        response = await self._query_engine.aquery(query_bundle)
+        self.cache.store(query_bundle.query_str, query_bundle.embedding, response, time.perf_counter() - start)
+        return response
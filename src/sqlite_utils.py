@@ -0,0 +1,19 @@
+# src/sqlite_utils.py
+import os
+import sqlite3
+
+
+def connect(db_path: str) -> sqlite3.Connection:
+    """
+    Opens a SQLite connection tuned for many small concurrent writes:
+    WAL journal, relaxed fsync and a busy timeout instead of immediate lock errors.
+    The connection may be shared between threads; callers serialize access with a lock.
+    """
+    dirpath = os.path.dirname(db_path)
+    if dirpath:
+        os.makedirs(dirpath, exist_ok=True)
+    conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
@@ -0,0 +1,249 @@
+# src/summary_memory.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+from loguru import logger
+from llama_index.core.bridge.pydantic import Field, PrivateAttr
+from llama_index.core.llms import ChatMessage, LLM, MessageRole
+from llama_index.core.memory.types import BaseChatStoreMemory
+from llama_index.core.prompts import PromptTemplate
+from llama_index.core.storage.chat_store.base import BaseChatStore
+from llama_index.core.utils import get_tokenizer
+from src.global_settings import (
+    MEMORY_TOKEN_LIMIT,
+    MEMORY_SUMMARY_TOKENS,
+    MEMORY_SUMMARY_TRIGGER_TOKENS,
+    MEMORY_RECENT_TOKENS,
+)
+from src.prompts import CUSTORM_MEMORY_SUMMARY_TEMPLATE
+from src.tracing import traced
+
+SUMMARY_KEY_SUFFIX = "::summary"
+
+_summarizer: Optional[ThreadPoolExecutor] = None
+_summarizer_lock = threading.Lock()
+
+
+def _get_summarizer() -> ThreadPoolExecutor:
+    """The single background thread on which every memory of the process runs its compactions."""
+    global _summarizer
+    if _summarizer is None:
+        with _summarizer_lock:
+            if _summarizer is None:
+                _summarizer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-summary")
+    return _summarizer
+
+
+class RollingSummaryMemory(BaseChatStoreMemory):
+    """
+    Chat memory that keeps prompt size bounded for long-term users.
+
+    The full history stays in the chat store (the chat page still shows it),
+    but only the most recent messages fitting `token_limit` are sent to the
+    LLM, preceded by a running summary of everything older. Token counts are
+    cached per message, so a turn only tokenizes new messages. Once the
+    unsummarized history exceeds `summary_trigger_tokens`, the older turns
+    (all but the last `recent_tokens`) are folded into the summary by the LLM
+    on a background thread shared by all memories, with at most one pending
+    compaction per memory. The summary is stored in the chat store under
+    `<chat_store_key>::summary`, together with the number of messages it covers.
+
+    `summary_trigger_tokens + summary_tokens` must not exceed `token_limit`,
+    so the unsummarized history always fits next to the summary. If it still
+    doesn't (compaction lagging behind, a longer summary), get() returns all
+    of it over the limit and starts a compaction, rather than drop messages.
+    get() runs on the event loop and never calls the LLM itself.
+    """
+
+    token_limit: int = Field(default=MEMORY_TOKEN_LIMIT, gt=0)
+    summary_tokens: int = Field(default=MEMORY_SUMMARY_TOKENS, gt=0)
+    summary_trigger_tokens: int = Field(default=MEMORY_SUMMARY_TRIGGER_TOKENS, gt=0)
+    recent_tokens: int = Field(default=MEMORY_RECENT_TOKENS, gt=0)
+    llm: Optional[Any] = Field(default=None, exclude=True, description="LLM writing the summary; None disables it.")
+    _tokenizer: Callable[[str], List] = PrivateAttr()
+    _token_counts: List[int] = PrivateAttr(default_factory=list)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _compacting: bool = PrivateAttr(default=False)
+    _compact_lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        if self.summary_trigger_tokens + self.summary_tokens > self.token_limit:
+            raise ValueError(
+                f"summary_trigger_tokens ({self.summary_trigger_tokens}) + summary_tokens ({self.summary_tokens}) "
+                f"must not exceed token_limit ({self.token_limit}), or unsummarized messages fall out of the window."
+            )
+        if self.recent_tokens >= self.summary_trigger_tokens:
+            raise ValueError(
+                f"recent_tokens ({self.recent_tokens}) must be below summary_trigger_tokens ({self.summary_trigger_tokens})."
+            )
+        self._tokenizer = get_tokenizer()
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "RollingSummaryMemory"
+
+    @classmethod
+    def from_defaults(
+        cls,
+        chat_store: BaseChatStore,
+        chat_store_key: str,
+        llm: Optional[LLM] = None,
+        **kwargs: Any,
+    ) -> "RollingSummaryMemory":
+        """Create a rolling summary memory over one user's history in the chat store."""
+        return cls(chat_store=chat_store, chat_store_key=chat_store_key, llm=llm, **kwargs)
+
+    @property
+    def summary_key(self) -> str:
+        return self.chat_store_key + SUMMARY_KEY_SUFFIX
+
+    def _count(self, message: ChatMessage) -> int:
+        return len(self._tokenizer(str(message.content or ""))) + 4  # role and separators
+
+    def _history(self) -> Tuple[List[ChatMessage], List[int]]:
+        """The stored history and its per-message token counts, tokenizing only new messages."""
+        history = self.chat_store.get_messages(self.chat_store_key)
+        with self._lock:
+            if len(history) < len(self._token_counts):
+                self._token_counts = []  # history was rewritten outside this memory
+            self._token_counts.extend(self._count(message) for message in history[len(self._token_counts):])
+            return history, list(self._token_counts)
+
+    def _summary(self) -> Tuple[Optional[ChatMessage], int]:
+        """The stored summary message and the number of history messages it covers."""
+        stored = self.chat_store.get_messages(self.summary_key)
+        if not stored:
+            return None, 0
+        return stored[-1], stored[-1].additional_kwargs.get("covered_messages", 0)
+
+    def get(self, input: Optional[str] = None, initial_token_count: int = 0, **kwargs: Any) -> List[ChatMessage]:
+        """The running summary followed by the most recent messages that fit the token limit."""
+        history, summary, covered, start = self._window(initial_token_count)
+        if start > covered and self.llm is not None:
+            # Unsummarized messages don't fit: keep them until they are folded into the summary
+            start = covered
+            self._maybe_compact(force=True)
+        # The window can't start with an assistant reply or a tool result
+        while start < len(history) and history[start].role in (MessageRole.ASSISTANT, MessageRole.TOOL):
+            start += 1
+
+        messages = history[start:]
+        if summary is not None:
+            messages = [ChatMessage(role=MessageRole.SYSTEM, content=summary.content)] + messages
+        return messages
+
+    def _window(self, initial_token_count: int) -> Tuple[List[ChatMessage], Optional[ChatMessage], int, int]:
+        """The history, the summary, the messages it covers and the start of the recent messages fitting the limit."""
+        history, counts = self._history()
+        summary, covered = self._summary()
+        budget = self.token_limit - initial_token_count
+        if summary is not None:
+            budget -= summary.additional_kwargs.get("tokens", 0)
+
+        start, used = len(history), 0
+        while start > covered and used + counts[start - 1] <= budget:
+            start -= 1
+            used += counts[start]
+        return history, summary, covered, start
+
+    def put(self, message: ChatMessage) -> None:
+        """Stores a message and starts a compaction if the unsummarized history got too long."""
+        super().put(message)
+        self._maybe_compact()
+
+    def set(self, messages: List[ChatMessage]) -> None:
+        """
+        Replaces the history. The agent ends every turn with set(stored history
+        + new messages); then only the new messages are appended, and the
+        summary and cached token counts are kept. They are dropped only when
+        the history was actually rewritten.
+        """
+        stored = self.chat_store.get_messages(self.chat_store_key)
+        if len(messages) >= len(stored) and all(
+            new is old or new == old for new, old in zip(messages, stored)
+        ):
+            for message in messages[len(stored):]:
+                self.chat_store.add_message(self.chat_store_key, message)
+            self._maybe_compact()
+            return
+        super().set(messages)
+        self.chat_store.delete_messages(self.summary_key)
+        with self._lock:
+            self._token_counts = []
+
+    def reset(self) -> None:
+        super().reset()
+        self.chat_store.delete_messages(self.summary_key)
+        with self._lock:
+            self._token_counts = []
+
+    def _unsummarized_tokens(self) -> int:
+        _, counts = self._history()
+        _, covered = self._summary()
+        return sum(counts[covered:])
+
+    def _maybe_compact(self, force: bool = False):
+        if self.llm is None or (not force and self._unsummarized_tokens() <= self.summary_trigger_tokens):
+            return
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+        _get_summarizer().submit(self._compact_in_background, force)
+
+    def _compact_in_background(self, force: bool = False):
+        try:
+            self.compact(force)
+        except Exception as e:
+            logger.error(f"Failed to summarize chat history of '{self.chat_store_key}': {e}")
+        finally:
+            with self._lock:
+                self._compacting = False
+
+    @traced("memory_compact")
+    def compact(self, force: bool = False) -> bool:
+        """
+        Folds the older unsummarized turns into the running summary.
+
+        Args:
+            force (bool): Compact even if the unsummarized history is below the trigger.
+
+        Returns:
+            bool: Whether a new summary was stored.
+        """
+        with self._compact_lock:
+            return self._compact(force)
+
+    def _compact(self, force: bool) -> bool:
+        history, counts = self._history()
+        summary, covered = self._summary()
+        if not force and sum(counts[covered:]) <= self.summary_trigger_tokens:
+            return False
+
+        # Keep the last recent_tokens verbatim and cut at the start of a user turn
+        cut, kept = len(history), 0
+        while cut > covered and kept + counts[cut - 1] <= self.recent_tokens:
+            cut -= 1
+            kept += counts[cut]
+        while cut < len(history) and history[cut].role != MessageRole.USER:
+            cut += 1
+        if cut <= covered:
+            return False
+
+        conversation = "\n".join(f"{message.role.value}: {message.content}" for message in history[covered:cut])
+        text = self.llm.complete(
+            PromptTemplate(CUSTORM_MEMORY_SUMMARY_TEMPLATE).format(
+                summary=summary.content if summary is not None else "(chưa có)",
+                conversation=conversation,
+                max_words=self.summary_tokens // 2,
+            )
+        ).text.strip()
+        new_summary = ChatMessage(
+            role=MessageRole.SYSTEM,
+            content=text,
+            additional_kwargs={"covered_messages": cut, "tokens": self._count(ChatMessage(content=text))},
+        )
+        self.chat_store.set_messages(self.summary_key, [new_summary])
+        logger.info(f"Summarized {cut - covered} messages of '{self.chat_store_key}' ({cut} covered in total).")
+        return True
@@ -0,0 +1,163 @@
+# src/throttled_transform.py
+import asyncio
+import time
+from hashlib import sha256
+from typing import Any, List, Optional, Sequence
+from loguru import logger
+from llama_index.core.bridge.pydantic import PrivateAttr, SerializeAsAny
+from llama_index.core.ingestion.pipeline import remove_unstable_values
+from llama_index.core.schema import BaseNode, MetadataMode, TransformComponent
+from llama_index.core.storage.kvstore.types import BaseKVStore
+from src.rate_limit import TokenBucket, aretry_with_backoff, estimate_tokens
+
+# Node attributes an extractor or embedding model may change; these are what the cache stores.
+CACHED_FIELDS = (
+    "metadata", "embedding", "text_template",
+    "excluded_embed_metadata_keys", "excluded_llm_metadata_keys",
+)
+
+
+class ThroughputReporter:
+    """Logs nodes/s and tokens/s of a long running stage at most every `interval` seconds."""
+
+    def __init__(self, label: str, total: int, interval: float = 5.0):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.nodes = 0
+        self.tokens = 0
+        self._start = time.perf_counter()
+        self._last_report = self._start
+
+    def update(self, nodes: int, tokens: int):
+        self.nodes += nodes
+        self.tokens += tokens
+        now = time.perf_counter()
+        if now - self._last_report >= self.interval:
+            self._last_report = now
+            self._log(now)
+
+    def finish(self):
+        self._log(time.perf_counter())
+
+    def _log(self, now: float):
+        elapsed = max(now - self._start, 1e-9)
+        logger.info(
+            f"[{self.label}] {self.nodes}/{self.total} nodes, "
+            f"{self.nodes / elapsed:.1f} nodes/s, {self.tokens / elapsed:.0f} tokens/s"
+        )
+
+
+class ThrottledTransform(TransformComponent):
+    """
+    Runs a wrapped transformation (an extractor or an embedding model) over
+    batches of nodes concurrently, under a shared request/token rate limit,
+    retrying failed batches with jittered backoff and reporting throughput.
+
+    With a cache, results are stored per chunk, keyed by the transformation and
+    the chunk content, so only new or changed chunks reach the provider. The
+    wrapped transformation must map each input node to one output node
+    (extractors and embedding models do).
+    """
+
+    transform: SerializeAsAny[TransformComponent]
+    batch_size: int = 1
+    max_concurrency: int = 4
+    max_retries: int = 5
+    requests_per_node: bool = True
+    label: str = "transform"
+    _request_bucket: Optional[TokenBucket] = PrivateAttr(default=None)
+    _token_bucket: Optional[TokenBucket] = PrivateAttr(default=None)
+    _cache: Optional[BaseKVStore] = PrivateAttr(default=None)
+
+    def __init__(
+        self,
+        transform: TransformComponent,
+        request_bucket: Optional[TokenBucket] = None,
+        token_bucket: Optional[TokenBucket] = None,
+        cache: Optional[BaseKVStore] = None,
+        **kwargs: Any,
+    ):
+        """
+        Args:
+            transform (TransformComponent): The transformation to run per batch.
+            request_bucket (TokenBucket): Limits provider requests. One request is
+                counted per node when requests_per_node is set (one LLM call per chunk),
+                otherwise one per batch (a batched embedding call).
+            token_bucket (TokenBucket): Limits estimated input tokens.
+            cache (BaseKVStore): Per-chunk result cache; the collection is the label.
+        """
+        super().__init__(transform=transform, **kwargs)
+        self._request_bucket = request_bucket
+        self._token_bucket = token_bucket
+        self._cache = cache
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "ThrottledTransform"
+
+    def __call__(self, nodes: Sequence[BaseNode], **kwargs: Any) -> List[BaseNode]:
+        return asyncio.run(self.acall(nodes, **kwargs))
+
+    async def _run_batch(self, batch: List[BaseNode], **kwargs: Any) -> List[BaseNode]:
+        if self._request_bucket is not None:
+            await self._request_bucket.aacquire(len(batch) if self.requests_per_node else 1)
+        if self._token_bucket is not None:
+            await self._token_bucket.aacquire(sum(estimate_tokens(node.get_content()) for node in batch))
+        return list(await aretry_with_backoff(
+            lambda: self.transform.acall(batch, **kwargs), max_retries=self.max_retries
+        ))
+
+    def _cache_keys(self, nodes: List[BaseNode]) -> List[str]:
+        """Content addresses: transformation config + the chunk text and metadata it sees."""
+        transform_string = remove_unstable_values(str(self.transform.to_dict()))
+        return [
+            sha256(
+                (
+                    transform_string
+                    + node.get_content(metadata_mode=MetadataMode.LLM)
+                    + node.get_content(metadata_mode=MetadataMode.EMBED)
+                ).encode("utf-8")
+            ).hexdigest()
+            for node in nodes
+        ]
+
+    async def acall(self, nodes: Sequence[BaseNode], **kwargs: Any) -> List[BaseNode]:
+        nodes = list(nodes)
+        pending = nodes
+        keys: List[Optional[str]] = [None] * len(nodes)
+        if self._cache is not None:
+            keys = self._cache_keys(nodes)
+            pending = []
+            for node, key in zip(nodes, keys):
+                cached = self._cache.get(key, collection=self.label)
+                if cached is None:
+                    pending.append(node)
+                else:
+                    for field, value in cached.items():
+                        setattr(node, field, value)
+            logger.info(f"[{self.label}] cache: {len(nodes) - len(pending)} hits, {len(pending)} misses")
+        key_by_id = {node.node_id: key for node, key in zip(nodes, keys)}
+
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        reporter = ThroughputReporter(self.label, len(pending))
+
+        async def worker(batch: List[BaseNode]) -> List[BaseNode]:
+            async with semaphore:
+                result = await self._run_batch(batch, **kwargs)
+            if self._cache is not None:
+                for source, node in zip(batch, result):
+                    self._cache.put(
+                        key_by_id[source.node_id],
+                        {field: getattr(node, field) for field in CACHED_FIELDS if hasattr(node, field)},
+                        collection=self.label,
+                    )
+            reporter.update(len(batch), sum(estimate_tokens(node.get_content()) for node in batch))
+            return result
+
+        results = await asyncio.gather(*[worker(batch) for batch in batches])
+        reporter.finish()
+        # Computed results replace their inputs; cached nodes were updated in place.
+        computed = {source.node_id: node for batch, result in zip(batches, results) for source, node in zip(batch, result)}
+        return [computed.get(node.node_id, node) for node in nodes]
@@ -0,0 +1,350 @@
+# src/tracing.py
+import asyncio
+import atexit
+import contextvars
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from loguru import logger
+import llama_index.core
+from llama_index.core.callbacks import CBEventType
+from llama_index.core.callbacks.base_handler import BaseCallbackHandler
+from llama_index.core.callbacks.token_counting import TokenCounter, get_llm_token_counts
+from src.global_settings import METRICS_DIR, METRICS_EXPORT_INTERVAL, METRICS_PORT
+
+# Upper bounds (seconds) of the duration histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, float("inf"))
+
+# Spans open in the current thread or task, innermost last
+_active_spans: contextvars.ContextVar[Tuple["Span", ...]] = contextvars.ContextVar("active_spans", default=())
+
+
+class Histogram:
+    """Per-bucket counts of durations, with Prometheus-style quantile estimates."""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q: float) -> float:
+        """Linear interpolation inside the bucket holding the q-th observation."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = BUCKETS[i - 1] if i else 0.0
+                upper = BUCKETS[i] if BUCKETS[i] != float("inf") else lower
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return BUCKETS[-2]
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "mean": round(self.sum / self.count, 6) if self.count else 0.0,
+            "p50": round(self.quantile(0.5), 6),
+            "p95": round(self.quantile(0.95), 6),
+            "p99": round(self.quantile(0.99), 6),
+            "buckets": dict(zip(map(str, BUCKETS), self.counts)),
+        }
+
+
+class Span:
+    """One timed stage. LLM calls and tokens of nested LlamaIndex events are added to every open span."""
+
+    def __init__(self, name: str, parent: Optional[str]):
+        self.name = name
+        self.parent = parent
+        self.start = time.time()
+        self.duration = 0.0
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "parent": self.parent,
+            "start": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.start)),
+            "duration_s": round(self.duration, 4),
+            "llm_calls": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "error": self.error,
+        }
+
+
+class Tracer:
+    """
+    Process-wide collector of spans, duration histograms and counters.
+
+    Spans come from the `traced` decorator and `span` context manager; the
+    LlamaIndex events (retrieval, LLM calls, tool calls, agent steps) come from
+    TracingCallbackHandler once init_tracing() installed it. After that call,
+    aggregates are exported to `metrics_file` in METRICS_DIR as JSON at most
+    every METRICS_EXPORT_INTERVAL seconds and at exit, and in Prometheus text
+    format by prometheus_text() and the optional METRICS_PORT endpoint.
+    """
+
+    def __init__(self, recent_spans: int = 200):
+        self._lock = threading.Lock()
+        self.histograms: Dict[Tuple[str, str], Histogram] = {}
+        self.counters: Dict[Tuple[str, str], float] = {}
+        self.recent: deque = deque(maxlen=recent_spans)
+        self._last_export = time.monotonic()
+        self.metrics_file: Optional[str] = None
+
+    def observe(self, metric: str, label: str, value: float):
+        with self._lock:
+            self.histograms.setdefault((metric, label), Histogram()).observe(value)
+
+    def increment(self, metric: str, label: str, value: float = 1):
+        with self._lock:
+            self.counters[(metric, label)] = self.counters.get((metric, label), 0) + value
+
+    def finish_span(self, span: Span):
+        self.observe("span_duration_seconds", span.name, span.duration)
+        with self._lock:
+            self.recent.append(span.to_dict())
+        if self.metrics_file and time.monotonic() - self._last_export >= METRICS_EXPORT_INTERVAL:
+            self.export()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "histograms": [
+                    {"metric": metric, "label": label, **histogram.to_dict()}
+                    for (metric, label), histogram in sorted(self.histograms.items())
+                ],
+                "counters": [
+                    {"metric": metric, "label": label, "value": value}
+                    for (metric, label), value in sorted(self.counters.items())
+                ],
+                "recent_spans": list(self.recent),
+            }
+
+    def export(self):
+        """
+        Writes the snapshot atomically to this process's metrics file. Nothing
+        is written before init_tracing() named the file or while nothing was recorded.
+        """
+        self._last_export = time.monotonic()
+        with self._lock:
+            if not self.metrics_file or not (self.histograms or self.counters or self.recent):
+                return
+        try:
+            os.makedirs(os.path.dirname(self.metrics_file) or ".", exist_ok=True)
+            tmp_path = f"{self.metrics_file}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"exported": time.time(), **self.snapshot()}, f, indent=4)
+            os.replace(tmp_path, self.metrics_file)
+        except OSError as e:
+            logger.warning(f"Could not export metrics: {e}")
+
+    def prometheus_text(self) -> str:
+        """Histograms and counters in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for metric in sorted({metric for metric, _ in self.histograms}):
+                lines.append(f"# TYPE rag_{metric} histogram")
+                for (name, label), histogram in sorted(self.histograms.items()):
+                    if name != metric:
+                        continue
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS, histogram.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        lines.append(f'rag_{metric}_bucket{{name="{label}",le="{le}"}} {cumulative}')
+                    lines.append(f'rag_{metric}_sum{{name="{label}"}} {histogram.sum}')
+                    lines.append(f'rag_{metric}_count{{name="{label}"}} {histogram.count}')
+            for metric in sorted({metric for metric, _ in self.counters}):
+                lines.append(f"# TYPE rag_{metric} counter")
+                for (name, label), value in sorted(self.counters.items()):
+                    if name == metric:
+                        lines.append(f'rag_{metric}{{name="{label}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    LlamaIndex callback handler timing every event (retrieve, llm, synthesize,
+    function_call, agent_step, ...) and counting LLM calls and tokens.
+    """
+
+    def __init__(self, tracer: Tracer):
+        super().__init__(event_starts_to_ignore=[], event_ends_to_ignore=[])
+        self._tracer = tracer
+        self._starts: Dict[str, float] = {}
+        self._counter = TokenCounter()
+
+    def on_event_start(self, event_type, payload=None, event_id: str = "", parent_id: str = "", **kwargs: Any) -> str:
+        self._starts[event_id] = time.perf_counter()
+        return event_id
+
+    def on_event_end(self, event_type, payload=None, event_id: str = "", **kwargs: Any) -> None:
+        start = self._starts.pop(event_id, None)
+        if start is not None:
+            self._tracer.observe("llamaindex_event_seconds", event_type.value, time.perf_counter() - start)
+        if event_type != CBEventType.LLM or payload is None:
+            return
+        counts = get_llm_token_counts(self._counter, payload, event_id)
+        self._tracer.increment("llm_calls_total", "llm")
+        self._tracer.increment("llm_tokens_total", "prompt", counts.prompt_token_count)
+        self._tracer.increment("llm_tokens_total", "completion", counts.completion_token_count)
+        for span in _active_spans.get():
+            span.llm_calls += 1
+            span.prompt_tokens += counts.prompt_token_count
+            span.completion_tokens += counts.completion_token_count
+
+    def start_trace(self, trace_id: Optional[str] = None) -> None:
+        pass
+
+    def end_trace(self, trace_id: Optional[str] = None, trace_map: Optional[Dict[str, List[str]]] = None) -> None:
+        pass
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        body = get_tracer().prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+_tracing_initialized = False
+
+
+def get_tracer() -> Tracer:
+    """
+    Returns the process-wide tracer. It only collects in memory: LlamaIndex
+    events, the metrics file and the endpoint are hooked up by init_tracing().
+    """
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer()
+    return _tracer
+
+
+def init_tracing(role: Optional[str] = None) -> Tracer:
+    """
+    Turns tracing on for this process; called once by each entry point (the
+    app pages, build_data, evaluate, the chat workers, the benchmarks), never
+    on import. The tracer's callback handler becomes LlamaIndex's global
+    handler, so every callback manager created afterwards (LLM, retriever,
+    query engine, agent) reports to it. Metrics are exported at exit and served
+    on METRICS_PORT if set. Later calls return the same tracer.
+
+    Args:
+        role: Name of the metrics file in METRICS_DIR, e.g. "chat_worker_0".
+            Defaults to the script name and pid, so concurrent runs of one
+            script do not overwrite each other.
+
+    Returns:
+        The process-wide tracer.
+    """
+    global _tracing_initialized
+    tracer = get_tracer()
+    with _tracer_lock:
+        if not _tracing_initialized:
+            _tracing_initialized = True
+            script = os.path.splitext(os.path.basename(sys.argv[0] or "python"))[0]
+            tracer.metrics_file = os.path.join(METRICS_DIR, f"{role or f'{script}-{os.getpid()}'}.json")
+            llama_index.core.global_handler = TracingCallbackHandler(tracer)
+            atexit.register(tracer.export)
+            if METRICS_PORT:
+                try:
+                    server = ThreadingHTTPServer(("0.0.0.0", METRICS_PORT), _MetricsRequestHandler)
+                    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+                    logger.info(f"Serving Prometheus metrics on :{METRICS_PORT}/metrics.")
+                except OSError as e:
+                    logger.warning(f"Could not start metrics endpoint on port {METRICS_PORT}: {e}")
+    return tracer
+
+
+@contextmanager
+def span(name: str):
+    """Times the enclosed block as a span nested in the currently open ones."""
+    tracer = get_tracer()
+    active = _active_spans.get()
+    current = Span(name, parent=active[-1].name if active else None)
+    token = _active_spans.set(active + (current,))
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        raise
+    finally:
+        current.duration = time.perf_counter() - start
+        _active_spans.reset(token)
+        tracer.finish_span(current)
+
+
+def traced(name: Optional[str] = None):
+    """
+    Decorator recording every call of a sync or async function as a span.
+    The tracer is looked up on each call, so decorating has no side effects.
+    """
+
+    def decorator(fn):
+        span_name = name or fn.__name__
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def load_exported_metrics() -> Dict[str, dict]:
+    """Metrics files exported by every process (app, build_data, evaluate...), by process name."""
+    exported = {}
+    if not os.path.isdir(METRICS_DIR):
+        return exported
+    for filename in sorted(os.listdir(METRICS_DIR)):
+        if filename.endswith(".json"):
+            try:
+                with open(os.path.join(METRICS_DIR, filename), "r") as f:
+                    exported[filename[:-len(".json")]] = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Could not read metrics file {filename}: {e}")
+    return exported
@@ -0,0 +1,159 @@
+# src/user_store.py
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from loguru import logger
+from src.global_settings import USERS_DB, USERS_FILE, USER_CACHE_TTL_SECONDS
+from src.sqlite_utils import connect
+
+
+class UserStore:
+    """
+    User profiles stored in SQLite, keyed by username.
+
+    A lookup is one primary-key read, served from an in-process cache for
+    `cache_ttl` seconds after that, so an update made by another process is
+    seen within that time. Sign-ups are a single INSERT OR IGNORE, so two concurrent
+    sign-ups of the same name can't overwrite each other: the first one wins
+    and the second one logs into it.
+    """
+
+    def __init__(self, db_path: str = USERS_DB, cache_ttl: float = USER_CACHE_TTL_SECONDS):
+        self.db_path = db_path
+        self.cache_ttl = cache_ttl
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[dict, float]] = {}  # username -> (profile, read at)
+        self._conn = connect(db_path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS users ("
+            " username TEXT PRIMARY KEY,"
+            " info TEXT,"
+            " created TEXT NOT NULL,"
+            " updated TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS migrations (name TEXT PRIMARY KEY)"
+        )
+
+    def get(self, username: str) -> Optional[dict]:
+        """Returns the profile of a user ({"info": ...}), or None if the user doesn't exist."""
+        cached = self._cache.get(username)
+        if cached is not None and time.monotonic() - cached[1] < self.cache_ttl:
+            return cached[0]
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT info FROM users WHERE username = ?", (username,)
+            ).fetchone()
+            if row is None:
+                self._cache.pop(username, None)
+                return None  # not cached: the user may sign up from another process
+            user = {"info": row[0]}
+            self._cache[username] = (user, time.monotonic())
+        return user
+
+    def get_or_create(self, username: str, info: str) -> Tuple[dict, bool]:
+        """
+        Returns the profile of a user, creating it with `info` if it doesn't exist yet.
+
+        Returns:
+            tuple: (profile, whether it was created by this call)
+        """
+        user = self.get(username)
+        if user is not None:
+            return user, False
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            created = self._conn.execute(
+                "INSERT OR IGNORE INTO users (username, info, created, updated) VALUES (?, ?, ?, ?)",
+                (username, info, now, now),
+            ).rowcount == 1
+        if created:
+            logger.info(f"New user created: {username}")
+            user = {"info": info}
+            with self._lock:
+                self._cache[username] = (user, time.monotonic())
+            return user, True
+        # Lost a race against a concurrent sign-up of the same name
+        return self.get(username), False
+
+    def update_info(self, username: str, info: str) -> bool:
+        """Atomically replaces the info of an existing user. Returns whether the user exists."""
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE users SET info = ?, updated = ? WHERE username = ?", (info, now, username)
+            ).rowcount == 1
+            if updated:
+                self._cache[username] = ({"info": info}, time.monotonic())
+        return updated
+
+    def import_yaml(self, yaml_path: str = USERS_FILE) -> int:
+        """
+        Imports the legacy users.yaml ({username: {"info": ...}}) once, in a
+        single transaction. Users already in the store are kept as they are.
+        The migration mark is checked again inside the transaction, so when
+        several processes start at once only one of them imports the file.
+
+        Returns:
+            int: Number of imported users.
+        """
+        with self._lock:
+            done = self._conn.execute(
+                "SELECT 1 FROM migrations WHERE name = ?", (yaml_path,)
+            ).fetchone()
+        if done or not os.path.exists(yaml_path) or os.path.getsize(yaml_path) == 0:
+            return 0
+
+        # Imported here: only the one-time migration needs a YAML parser
+        import yaml
+        try:
+            with open(yaml_path, "r") as f:
+                data: dict = yaml.safe_load(f) or {}
+        except yaml.YAMLError as e:
+            logger.error(f"Error loading users file: {e}. Skipping import.")
+            return 0
+
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = [
+            (str(username), (entry or {}).get("info", ""), now, now)
+            for username, entry in data.items()
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._conn.execute("SELECT 1 FROM migrations WHERE name = ?", (yaml_path,)).fetchone():
+                    self._conn.execute("ROLLBACK")
+                    return 0  # imported by another process since the first check
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO users (username, info, created, updated) VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._conn.execute("INSERT INTO migrations (name) VALUES (?)", (yaml_path,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        logger.success(f"Imported {len(rows)} users from {yaml_path}.")
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store: Optional[UserStore] = None
+_store_lock = threading.Lock()
+
+
+def get_user_store() -> UserStore:
+    """Returns the process-wide user store, importing USERS_FILE on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = UserStore()
+                store.import_yaml(USERS_FILE)
+                _store = store
+    return _store
@@ -0,0 +1,61 @@
+# src/vector_store.py
+from typing import Optional
+from loguru import logger
+from llama_index.core import StorageContext
+from src.global_settings import VECTOR_STORE_BACKEND, VECTOR_STORE_DTYPE, CHROMA_PATH, CHROMA_COLLECTION
+from src.binary_vector_store import BinaryVectorStore, load_binary_vector_store
+
+
+def get_vector_store(backend: str = VECTOR_STORE_BACKEND):
+    """
+    Returns the configured vector store, or None for the default in-memory
+    SimpleVectorStore (which LlamaIndex creates and persists as JSON itself).
+
+    The "chroma" backend keeps vectors in a persistent local HNSW collection,
+    so queries don't scan every node and loading does not read the vectors into Python.
+    The "binary" backend returns a new, empty BinaryVectorStore; persisted ones
+    are loaded by create_storage_context.
+    """
+    if backend == "simple":
+        return None
+    if backend == "binary":
+        return BinaryVectorStore(dtype=VECTOR_STORE_DTYPE)
+    if backend == "chroma":
+        # Imported lazily: chromadb is heavy and only needed for this backend.
+        import chromadb
+        from llama_index.vector_stores.chroma import ChromaVectorStore
+
+        client = chromadb.PersistentClient(path=CHROMA_PATH)
+        collection = client.get_or_create_collection(
+            CHROMA_COLLECTION, metadata={"hnsw:space": "cosine"}
+        )
+        logger.info(f"Using Chroma collection '{CHROMA_COLLECTION}' at {CHROMA_PATH}.")
+        return ChromaVectorStore(chroma_collection=collection)
+    raise ValueError(f"Unknown vector store backend: {backend}")
+
+
+def reset_vector_store(backend: str = VECTOR_STORE_BACKEND):
+    """Drops all stored vectors of the backend before a full rebuild."""
+    if backend == "chroma":
+        import chromadb
+
+        client = chromadb.PersistentClient(path=CHROMA_PATH)
+        if CHROMA_COLLECTION in [collection.name for collection in client.list_collections()]:
+            client.delete_collection(CHROMA_COLLECTION)
+            logger.info(f"Deleted Chroma collection '{CHROMA_COLLECTION}'.")
+
+
+def create_storage_context(persist_dir: Optional[str] = None, backend: str = VECTOR_STORE_BACKEND) -> StorageContext:
+    """
+    Builds a StorageContext for the configured backend. With persist_dir the
+    docstore and index store are loaded from disk; the vectors stay in the backend,
+    or are memory-mapped from persist_dir with the "binary" backend.
+    """
+    if backend == "binary" and persist_dir is not None:
+        return StorageContext.from_defaults(
+            persist_dir=persist_dir, vector_store=load_binary_vector_store(persist_dir, VECTOR_STORE_DTYPE)
+        )
+    vector_store = get_vector_store(backend)
+    if vector_store is None:
+        return StorageContext.from_defaults(persist_dir=persist_dir)
+    return StorageContext.from_defaults(persist_dir=persist_dir, vector_store=vector_store)